@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""Benchmark the check and booking flows against the local TEVIS stand-in.
+
+Each flow runs in a worker process pointed at ``tevis_stub`` (both as the
+TEVIS site and as the Matrix homeserver). ``cold`` starts a fresh worker per
+iteration, so interpreter start-up, imports and browser launch are included;
+``warm`` keeps one worker alive and times repeated calls after a warm-up.
+Reported per flow/mode: latency percentiles, pages loaded per iteration and
+the peak RSS of the worker's process tree (including Chromium).
+
+Example:
+    python benchmarks/run_benchmarks.py --flows check-http,check-browser \\
+        --days 20 --slots-per-day 8 --latency-ms 50 --iterations 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(ROOT))
+
+from tevis_stub import (  # noqa: E402
+    DEFAULT_ANLIEGEN,
+    DEFAULT_STANDORT,
+    STATS_PATH,
+    add_config_arguments,
+    config_from_args,
+    start_server,
+)
+
+FLOWS = ("check-http", "check-browser", "run-once", "race-book")
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+# -- worker side ------------------------------------------------------------------
+
+def _stub_stats(base_url: str, reset: bool = False) -> dict:
+    url = base_url.rstrip("/") + STATS_PATH + ("?reset=1" if reset else "")
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def _flow_callable(flow: str):
+    if flow == "race-book":
+        from src.booking.race import race_to_book
+
+        return race_to_book
+
+    if flow == "run-once":
+        from src.main import run_once
+
+        return run_once
+
+    from src.booking.slots import check_availability
+
+    return check_availability
+
+
+def _worker(flow: str, iterations: int, think_time: float) -> None:
+    """Run ``flow`` repeatedly and print one result line per iteration."""
+    base_url = os.environ["TERMIN_URL"]
+    func = _flow_callable(flow)
+    for index in range(iterations):
+        if index and think_time:
+            time.sleep(think_time)
+        if flow == "race-book":
+            # Every iteration books once; drop the lock so the next one is not skipped
+            Path(os.environ["BOOK_ONCE_LOCK"]).unlink(missing_ok=True)
+        _stub_stats(base_url, reset=True)
+        started = time.perf_counter()
+        try:
+            result = func()
+            error = ""
+        except Exception as exc:  # the flows log and swallow most errors themselves
+            result = None
+            error = str(exc)
+        elapsed = time.perf_counter() - started
+        stats = _stub_stats(base_url, reset=True)
+        record = {
+            "seconds": elapsed,
+            "pages": stats["pages"],
+            "requests": stats["requests"],
+            "result": len(result) if isinstance(result, list) else result,
+            "error": error,
+        }
+        if flow == "race-book":
+            from src.booking.race import last_timings
+
+            record["detect_to_submit_ms"] = last_timings.get("detect_to_submit_ms")
+        print(RESULT_PREFIX + json.dumps(record), flush=True)
+
+
+# -- runner side ------------------------------------------------------------------
+
+def _tree_rss_kb(root_pid: int) -> int:
+    """Sum VmRSS over ``root_pid`` and its descendants (Linux /proc only)."""
+    children: dict[int, list[int]] = {}
+    rss: dict[int, int] = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            status = (entry / "status").read_text()
+        except OSError:
+            continue
+        fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+        pid = int(entry.name)
+        children.setdefault(int(fields.get("PPid", "0").strip() or 0), []).append(pid)
+        value = fields.get("VmRSS", "0 kB").split()[0]
+        rss[pid] = int(value) if value.isdigit() else 0
+
+    total, pending = 0, [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+class RssSampler:
+    """Poll the summed RSS of a process tree until stopped."""
+
+    def __init__(self, pid: int, interval: float = 0.05) -> None:
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.peak_kb = max(self.peak_kb, _tree_rss_kb(self.pid))
+            except OSError:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _worker_env(flow: str, base_url: str, workdir: Path, session_resume: bool) -> dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "TERMIN_URL": base_url,
+            "ANLIEGEN_TEXT": DEFAULT_ANLIEGEN,
+            "STANDORT_TEXT": DEFAULT_STANDORT,
+            "MATRIX_HOMESERVER": base_url.rstrip("/"),
+            "MATRIX_ACCESS_TOKEN": "benchmark",
+            "MATRIX_ROOM_ID": "!benchmark:localhost",
+            "MONITOR_ENGINE": "http" if flow == "check-http" else "browser",
+            "SEND_MONITOR_SCREENSHOT": "false",
+            "SESSION_RESUME": "true" if session_resume else "false",
+            # Keep every runtime file of the worker out of the repository root.
+            "STORAGE_STATE": str(workdir / "state.json"),
+            "SESSION_RESUME_FILE": str(workdir / "session_resume.json"),
+            "BOOK_ONCE_LOCK": str(workdir / "booked.lock"),
+            "MONITOR_STATE_FILE": str(workdir / "monitor_state.json"),
+            "METRICS_STATE_FILE": str(workdir / "metrics_state.json"),
+            "OUTBOX_DIR": str(workdir / "outbox"),
+            "FORENSICS_DIR": str(workdir / "forensics"),
+            "EVENTS_FILE": str(workdir / "events.jsonl"),
+            "METRICS_TEXTFILE": "",
+            "METRICS_PORT": "0",
+        }
+    )
+    if flow == "race-book":
+        env.update({"AUTO_BOOK": "true", "RACE_POLL_SECONDS": "2", "RACE_MAX_MINUTES": "1"})
+    return env
+
+
+def _spawn(flow: str, iterations: int, think_time: float, env: dict, verbose: bool):
+    cmd = [
+        sys.executable,
+        str(Path(__file__).resolve()),
+        "--worker",
+        flow,
+        "--iterations",
+        str(iterations),
+        "--think-time",
+        str(think_time),
+    ]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    records = []
+    with RssSampler(proc.pid) as sampler:
+        for line in proc.stdout:
+            if line.startswith(RESULT_PREFIX):
+                records.append(json.loads(line[len(RESULT_PREFIX):]))
+            elif verbose:
+                print("    " + line.rstrip())
+        proc.wait()
+    return records, time.perf_counter() - started, sampler.peak_kb, proc.returncode
+
+
+def run_flow(flow: str, mode: str, args, base_url: str, workdir: Path) -> dict:
+    env = _worker_env(flow, base_url, workdir, args.session_resume)
+    latencies: list[float] = []
+    pages: list[int] = []
+    results = []
+    submit_ms: list[float] = []
+    peak_kb = 0
+    failures = 0
+
+    if mode == "cold":
+        for index in range(args.iterations):
+            if index and args.think_time:
+                time.sleep(args.think_time)
+            records, wall, peak, code = _spawn(flow, 1, 0, env, args.verbose)
+            peak_kb = max(peak_kb, peak)
+            if code != 0 or not records:
+                failures += 1
+                continue
+            latencies.append(wall)
+            pages.append(records[0]["pages"])
+            results.append(records[0]["result"])
+            if records[0].get("detect_to_submit_ms") is not None:
+                submit_ms.append(records[0]["detect_to_submit_ms"])
+    else:
+        total = args.warmup + args.iterations
+        records, _, peak_kb, code = _spawn(flow, total, args.think_time, env, args.verbose)
+        if code != 0:
+            failures += 1
+        for record in records[args.warmup:]:
+            latencies.append(record["seconds"])
+            pages.append(record["pages"])
+            results.append(record["result"])
+            if record.get("detect_to_submit_ms") is not None:
+                submit_ms.append(record["detect_to_submit_ms"])
+
+    return {
+        "flow": flow,
+        "mode": mode,
+        "runs": len(latencies),
+        "failures": failures,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies) if latencies else math.nan,
+        "pages": (sum(pages) / len(pages)) if pages else math.nan,
+        "peak_rss_mb": peak_kb / 1024,
+        "submit_p50_ms": percentile(submit_ms, 50),
+        "results": results,
+    }
+
+
+def print_table(rows: list[dict]) -> None:
+    header = f"{'flow':<14} {'mode':<5} {'runs':>4} {'p50 s':>7} {'p90 s':>7} {'p99 s':>7} {'max s':>7} {'pages':>6} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['flow']:<14} {row['mode']:<5} {row['runs']:>4} "
+            f"{row['p50']:>7.3f} {row['p90']:>7.3f} {row['p99']:>7.3f} {row['max']:>7.3f} "
+            f"{row['pages']:>6.1f} {row['peak_rss_mb']:>8.1f}"
+            + (f"  detection-to-submit p50 {row['submit_p50_ms']:.0f} ms" if not math.isnan(row["submit_p50_ms"]) else "")
+            + (f"  ({row['failures']} failed)" if row["failures"] else "")
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the monitor and booking flows offline")
+    parser.add_argument("--flows", default="check-http,check-browser", help=f"Comma-separated subset of {', '.join(FLOWS)}")
+    parser.add_argument("--modes", default="cold,warm", help="Comma-separated subset of cold, warm")
+    parser.add_argument("--iterations", type=int, default=5, help="Measured iterations per flow and mode")
+    parser.add_argument("--warmup", type=int, default=1, help="Discarded iterations before warm measurements")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds to pause between iterations")
+    parser.add_argument("--session-resume", action="store_true", help="Let workers resume from the saved session")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Echo worker log output")
+    parser.add_argument("--worker", choices=FLOWS, help=argparse.SUPPRESS)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args.worker, args.iterations, args.think_time)
+        return
+
+    flows = [flow.strip() for flow in args.flows.split(",") if flow.strip()]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [flow for flow in flows if flow not in FLOWS] + [mode for mode in modes if mode not in ("cold", "warm")]
+    if unknown:
+        parser.error(f"Unknown flow or mode: {', '.join(unknown)}")
+
+    server = start_server(config_from_args(args))
+    print(
+        f"TEVIS stand-in at {server.base_url} (days={args.days}, slots/day={args.slots_per_day}, "
+        f"latency={args.latency_ms} ms, think-time={args.think_time} s)"
+    )
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="termin-bench-") as tmp:
+            for flow in flows:
+                for mode in modes:
+                    workdir = Path(tmp) / f"{flow}-{mode}"
+                    workdir.mkdir()
+                    print(f"Running {flow} ({mode})...", flush=True)
+                    rows.append(run_flow(flow, mode, args, server.base_url, workdir))
+    finally:
+        server.shutdown()
+
+    print()
+    print_table(rows)
+    if args.json_path:
+        payload = {"parameters": {k: v for k, v in vars(args).items() if k != "worker"}, "results": rows}
+        Path(args.json_path).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
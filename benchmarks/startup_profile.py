@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Profile the import cost of the entry points and enforce a start-up budget.
+
+Each target is imported in a fresh interpreter under ``python -X importtime``;
+the fastest of ``--runs`` runs is kept. The report lists the total import
+time per target and the top-level packages that dominate it, and fails when
+a target exceeds ``--budget-ms``, regresses by more than
+``--max-regression-pct`` against a ``--baseline`` written with ``--json``, or
+loads a module it must not (e.g. Playwright on the gate-only paths).
+
+Example:
+    python benchmarks/startup_profile.py --budget-ms 150
+    python benchmarks/startup_profile.py --json startup.json
+    python benchmarks/startup_profile.py --baseline startup.json --max-regression-pct 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# target name -> (module to import, modules that must stay unloaded)
+TARGETS = {
+    "main": ("src.main", ("playwright", "requests", "http.server")),
+    "summarize_logs": ("summarize_logs", ("playwright", "requests")),
+    "summarize_history": ("summarize_history", ("playwright", "requests", "numpy")),
+}
+IMPORTTIME_PREFIX = "import time:"
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Return (module, self_us, cumulative_us) for every line of ``-X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith(IMPORTTIME_PREFIX):
+            continue
+        parts = line[len(IMPORTTIME_PREFIX):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return rows
+
+
+def profile_once(module: str) -> dict:
+    code = f"import sys; sys.path.insert(0, {str(ROOT)!r}); import {module}"
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        error = [line for line in proc.stderr.splitlines() if not line.startswith(IMPORTTIME_PREFIX)]
+        raise RuntimeError(f"importing {module} failed: {error[-1] if error else proc.returncode}")
+
+    rows = _parse_importtime(proc.stderr)
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    return {
+        "import_ms": sum(self_us for _, self_us, _ in rows) / 1000,
+        "wall_ms": wall_ms,
+        "modules": {name for name, _, _ in rows},
+        "packages": {name: us / 1000 for name, us in by_package.items()},
+    }
+
+
+def profile_target(name: str, runs: int) -> dict:
+    module, forbidden = TARGETS[name]
+    best = min((profile_once(module) for _ in range(runs)), key=lambda r: r["import_ms"])
+    loaded = sorted(mod for mod in forbidden if mod in best["modules"])
+    return {
+        "target": name,
+        "module": module,
+        "import_ms": round(best["import_ms"], 1),
+        "wall_ms": round(best["wall_ms"], 1),
+        "packages": {k: round(v, 1) for k, v in sorted(best["packages"].items(), key=lambda kv: -kv[1])},
+        "forbidden_loaded": loaded,
+    }
+
+
+def check(results: list[dict], budget_ms: float, baseline: dict, max_regression_pct: float) -> list[str]:
+    problems = []
+    for result in results:
+        name = result["target"]
+        if budget_ms and result["import_ms"] > budget_ms:
+            problems.append(f"{name}: {result['import_ms']:.1f} ms import time exceeds the {budget_ms:.0f} ms budget")
+        if result["forbidden_loaded"]:
+            problems.append(f"{name}: loads {', '.join(result['forbidden_loaded'])} at import")
+        previous = baseline.get(name)
+        if previous and previous.get("import_ms"):
+            growth = (result["import_ms"] / previous["import_ms"] - 1) * 100
+            if growth > max_regression_pct:
+                problems.append(
+                    f"{name}: import time grew {growth:.0f}% over the baseline "
+                    f"({previous['import_ms']:.1f} -> {result['import_ms']:.1f} ms)"
+                )
+    return problems
+
+
+def print_report(results: list[dict], top: int) -> None:
+    for result in results:
+        print(
+            f"{result['target']} ({result['module']}): {result['import_ms']:.1f} ms importing, "
+            f"{result['wall_ms']:.1f} ms wall incl. interpreter start"
+        )
+        for package, ms in list(result["packages"].items())[:top]:
+            share = ms / result["import_ms"] * 100 if result["import_ms"] else 0.0
+            print(f"  {package:<28} {ms:8.1f} ms  {share:5.1f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Break down entry-point import time and enforce a budget")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target; the fastest run is kept")
+    parser.add_argument("--top", type=int, default=10, help="Packages to list per target")
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="Fail when a target's import time exceeds this")
+    parser.add_argument("--baseline", help="JSON written by an earlier --json run to compare against")
+    parser.add_argument("--max-regression-pct", type=float, default=20.0, help="Allowed growth over the baseline")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.targets.split(",") if name.strip()]
+    unknown = [name for name in names if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+
+    results = [profile_target(name, max(1, args.runs)) for name in names]
+    print_report(results, args.top)
+
+    baseline = {}
+    if args.baseline:
+        baseline = {row["target"]: row for row in json.loads(Path(args.baseline).read_text(encoding="utf-8"))}
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    problems = check(results, args.budget_ms, baseline, args.max_regression_pct)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
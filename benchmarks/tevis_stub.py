@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""Local stand-in for the TEVIS booking site (and the Matrix API) for benchmarks.
+
+Serves the same page shapes the bot walks through: a cookie banner and
+department button, the ``input[data-tevis-cncname]`` catalog with an
+optional Hinweis modal, the ``select_location`` form, a ``#sugg_accordion``
+calendar of configurable size, and the personal-data/booking pages. Like
+TEVIS, the calendar markup is sent un-initialised and a page script adds the
+ids and ``aria-controls`` that jQuery UI would, so the browserless flow sees
+what it sees on the real site. Matrix
+``send``/``upload`` calls are accepted and counted so notification paths can
+run without a homeserver.
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import secrets
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_ANLIEGEN = "RWTH Mitarbeitende & Forschende bzw. PhD"
+DEFAULT_STANDORT = "Aachen Arkaden"
+SESSION_COOKIE = "tvo_session"
+# Counter endpoint for benchmark workers; ``?reset=1`` zeroes the counters after reading.
+STATS_PATH = "/_stub/stats"
+
+
+class StubConfig:
+    """Knobs that shape the stand-in site."""
+
+    def __init__(
+        self,
+        days: int = 0,
+        slots_per_day: int = 0,
+        latency_ms: int = 0,
+        catalog_size: int = 30,
+        hinweis_modal: bool = True,
+        cookie_banner: bool = True,
+        initialised_accordion: bool = False,
+        anliegen: str = DEFAULT_ANLIEGEN,
+        standort: str = DEFAULT_STANDORT,
+    ) -> None:
+        self.days = days
+        self.slots_per_day = slots_per_day
+        self.latency_ms = latency_ms
+        self.catalog_size = max(1, catalog_size)
+        self.hinweis_modal = hinweis_modal
+        self.cookie_banner = cookie_banner
+        self.initialised_accordion = initialised_accordion
+        self.anliegen = anliegen
+        self.standort = standort
+
+
+class StubStats:
+    """Request counters, resettable between benchmark iterations."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pages = 0
+        self.requests = 0
+        self.matrix_messages = 0
+        self.matrix_uploads = 0
+        self.bookings = 0
+
+    def reset(self) -> None:
+        with self.lock:
+            self.pages = self.requests = 0
+            self.matrix_messages = self.matrix_uploads = self.bookings = 0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "pages": self.pages,
+                "requests": self.requests,
+                "matrix_messages": self.matrix_messages,
+                "matrix_uploads": self.matrix_uploads,
+                "bookings": self.bookings,
+            }
+
+
+# What jQuery UI's accordion() adds on the client: panel ids, aria-controls and the widget class
+ACCORDION_INIT_SCRIPT = (
+    "<script>(function () {"
+    "var accordion = document.getElementById('sugg_accordion');"
+    "accordion.querySelectorAll(':scope > h3').forEach(function (header, idx) {"
+    "var panel = header.nextElementSibling;"
+    "panel.id = panel.id || 'panel-' + idx;"
+    "header.id = header.id || 'ui-id-' + idx;"
+    "header.setAttribute('aria-controls', panel.id);"
+    "});"
+    "accordion.classList.add('ui-accordion');"
+    "})();</script>"
+)
+
+
+def _layout(title: str, body: str) -> str:
+    return (
+        "<!DOCTYPE html><html lang=\"de\"><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(title)}</title>"
+        "<style>.modal{display:none;position:fixed;inset:0;background:rgba(0,0,0,.4)}"
+        ".modal.in{display:block}.modal-dialog{background:#fff;margin:10% auto;width:300px;padding:1em}"
+        "</style></head><body>"
+        f"{body}</body></html>"
+    )
+
+
+def _cookie_banner() -> str:
+    return (
+        "<div id=\"cookie_banner\"><p>Diese Seite verwendet Cookies.</p>"
+        "<button type=\"button\" onclick=\"this.parentNode.remove()\">Einverstanden</button></div>"
+    )
+
+
+def _catalog_names(config: StubConfig) -> list[str]:
+    names = [f"Anliegen Nr. {idx:03d}" for idx in range(config.catalog_size - 1)]
+    names.insert(len(names) // 2, config.anliegen)
+    return names
+
+
+def _calendar_rows(config: StubConfig) -> list[tuple[str, list[str]]]:
+    start = date.today() + timedelta(days=1)
+    rows = []
+    for day in range(config.days):
+        current = start + timedelta(days=day)
+        times = [f"{8 + slot // 4:02d}:{(slot % 4) * 15:02d}" for slot in range(config.slots_per_day)]
+        rows.append((current.strftime("%A, %d.%m.%Y"), times))
+    return rows
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: StubConfig):
+        super().__init__(address, StubHandler)
+        self.config = config
+        self.stats = StubStats()
+        self.sessions: dict[str, dict] = {}
+        self.sessions_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+    protocol_version = "HTTP/1.1"
+
+    # -- plumbing -----------------------------------------------------------------
+    def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+        pass
+
+    def _delay(self) -> None:
+        if self.server.config.latency_ms:
+            time.sleep(self.server.config.latency_ms / 1000)
+
+    def _read_form(self) -> dict[str, list[str]]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8") if length else ""
+        form = parse_qs(raw, keep_blank_values=True)
+        query = parse_qs(urlparse(self.path).query, keep_blank_values=True)
+        for key, values in query.items():
+            form.setdefault(key, values)
+        return form
+
+    def _session(self, create: bool = False) -> tuple[str | None, dict | None]:
+        cookies = {}
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name:
+                cookies[name] = value
+        sid = cookies.get(SESSION_COOKIE)
+        with self.server.sessions_lock:
+            if sid and sid in self.server.sessions:
+                return sid, self.server.sessions[sid]
+            if not create:
+                return None, None
+            sid = secrets.token_hex(8)
+            self.server.sessions[sid] = {}
+            return sid, self.server.sessions[sid]
+
+    def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8",
+              cookie: str | None = None, page: bool = True) -> None:
+        payload = body.encode("utf-8")
+        if urlparse(self.path).path != STATS_PATH:
+            with self.server.stats.lock:
+                self.server.stats.requests += 1
+                if page:
+                    self.server.stats.pages += 1
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Cache-Control", "no-store")
+        if cookie:
+            self.send_header("Set-Cookie", f"{SESSION_COOKIE}={cookie}; Path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error_page(self) -> None:
+        self._send(200, _layout("Fehler", "<h1>Fehlermeldung: Ungültiger Aufruf</h1>"))
+
+    # -- routing --------------------------------------------------------------------
+    def do_GET(self):  # noqa: N802 - http.server naming
+        self._delay()
+        path = urlparse(self.path).path
+        if path == "/":
+            return self._start_page()
+        if path == "/select2":
+            return self._anliegen_page()
+        if path == "/location":
+            return self._location_page(form=None)
+        if path == "/suggest":
+            return self._calendar_page(form=None)
+        if path == "/favicon.ico":
+            return self._send(404, "", page=False)
+        if path == STATS_PATH:
+            snapshot = self.server.stats.snapshot()
+            if "reset=1" in urlparse(self.path).query:
+                self.server.stats.reset()
+            return self._send(200, json.dumps(snapshot), "application/json", page=False)
+        return self._send(404, _layout("Nicht gefunden", "<p>404</p>"))
+
+    def do_POST(self):  # noqa: N802
+        self._delay()
+        path = urlparse(self.path).path
+        if path == "/location":
+            return self._location_page(form=self._read_form())
+        if path == "/suggest":
+            return self._calendar_page(form=self._read_form())
+        if path == "/personal":
+            return self._personal_page(self._read_form())
+        if path == "/confirm":
+            return self._confirm_page(self._read_form())
+        if path.startswith("/_matrix/media/"):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            with self.server.stats.lock:
+                self.server.stats.matrix_uploads += 1
+            return self._send(200, json.dumps({"content_uri": f"mxc://stub/{secrets.token_hex(6)}"}),
+                              "application/json", page=False)
+        return self._send(404, _layout("Nicht gefunden", "<p>404</p>"))
+
+    def do_PUT(self):  # noqa: N802
+        self._delay()
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if "/_matrix/client/" in self.path:
+            with self.server.stats.lock:
+                self.server.stats.matrix_messages += 1
+            return self._send(200, json.dumps({"event_id": f"${secrets.token_hex(6)}"}),
+                              "application/json", page=False)
+        return self._send(404, "", page=False)
+
+    # -- pages ----------------------------------------------------------------------
+    def _start_page(self) -> None:
+        sid, _ = self._session(create=True)
+        config = self.server.config
+        body = (
+            (_cookie_banner() if config.cookie_banner else "")
+            + "<h1>Terminvereinbarung</h1>"
+            "<form method=\"get\" action=\"select2\">"
+            "<button class=\"select_mdt_btn\" type=\"submit\" name=\"mdt\" value=\"1\">"
+            "Ausländer- und Staatsangehörigkeitsbehörde</button></form>"
+        )
+        self._send(200, _layout("Start", body), cookie=sid)
+
+    def _anliegen_page(self) -> None:
+        sid, session = self._session()
+        if session is None:
+            return self._error_page()
+        config = self.server.config
+        rows = "".join(
+            f"<li><label for=\"cnc-{idx}\">{html.escape(name)}</label>"
+            f"<input type=\"number\" id=\"cnc-{idx}\" name=\"cnc-{idx}\" value=\"0\" min=\"0\" max=\"1\" "
+            f"data-tevis-cncname=\"{html.escape(name)}\"></li>"
+            for idx, name in enumerate(_catalog_names(config))
+        )
+        modal = ""
+        script = ""
+        if config.hinweis_modal:
+            modal = (
+                "<div class=\"modal\" id=\"hinweis\" role=\"dialog\"><div class=\"modal-dialog\">"
+                "<p>Hinweis: Bitte bringen Sie alle Unterlagen mit.</p>"
+                "<button type=\"button\" id=\"OKButton\" "
+                "onclick=\"document.getElementById('anliegen_form').submit()\">OK</button>"
+                "</div></div>"
+            )
+            script = (
+                "<script>document.getElementById('anliegen_form').addEventListener('submit', function (e) {"
+                "e.preventDefault(); document.getElementById('hinweis').classList.add('in');});</script>"
+            )
+        body = (
+            "<h1>Auswahl des Anliegens</h1>"
+            "<form id=\"anliegen_form\" method=\"post\" action=\"location\"><ul>"
+            f"{rows}</ul>"
+            "<button id=\"WeiterButton\" type=\"submit\" name=\"select_cnc\" value=\"Weiter\">Weiter</button>"
+            f"</form>{modal}{script}"
+        )
+        self._send(200, _layout("Anliegen", body))
+
+    def _location_page(self, form: dict | None) -> None:
+        _, session = self._session()
+        if session is None:
+            return self._error_page()
+        config = self.server.config
+        if form is not None:
+            names = _catalog_names(config)
+            chosen = [
+                names[int(key.split("-", 1)[1])]
+                for key, values in form.items()
+                if key.startswith("cnc-") and values and values[0] == "1"
+            ]
+            if not chosen:
+                return self._error_page()
+            session["anliegen"] = chosen
+        elif not session.get("anliegen"):
+            return self._error_page()
+        body = (
+            "<h1>Standortauswahl</h1>"
+            "<form method=\"post\" action=\"suggest\">"
+            f"<p>{html.escape(config.standort)}</p>"
+            "<input type=\"hidden\" name=\"loc\" value=\"1\">"
+            "<input type=\"submit\" name=\"select_location\" value=\"Standort auswählen\">"
+            "</form>"
+        )
+        self._send(200, _layout("Standort", body))
+
+    def _calendar_page(self, form: dict | None) -> None:
+        _, session = self._session()
+        if session is None or not session.get("anliegen"):
+            return self._error_page()
+        if form is not None:
+            session["location"] = (form.get("loc") or ["1"])[0]
+        elif not session.get("location"):
+            return self._error_page()
+
+        rows = _calendar_rows(self.server.config)
+        if not rows:
+            body = "<h1>Terminvorschläge</h1><p>Kein freier Termin verfügbar.</p>"
+            return self._send(200, _layout("Termine", body))
+
+        initialised = self.server.config.initialised_accordion
+        parts = []
+        for idx, (label, times) in enumerate(rows):
+            buttons = "".join(
+                f"<button class=\"suggest_btn\" type=\"submit\" name=\"slot\" "
+                f"value=\"{html.escape(label)} {slot}\" title=\"{slot}\">{slot}</button>"
+                for slot in times
+            )
+            header = f" id=\"ui-id-{idx}\" aria-controls=\"panel-{idx}\"" if initialised else ""
+            panel = f" id=\"panel-{idx}\"" if initialised else ""
+            parts.append(
+                f"<h3{header}>{html.escape(label)}</h3>"
+                f"<div{panel}><form method=\"post\" action=\"personal\">{buttons}</form></div>"
+            )
+        widget = " class=\"ui-accordion\"" if initialised else ""
+        body = (
+            "<h1>Terminvorschläge</h1>"
+            f"<div id=\"sugg_accordion\"{widget}>{''.join(parts)}</div>"
+        )
+        if not initialised:
+            body += ACCORDION_INIT_SCRIPT
+        self._send(200, _layout("Termine", body))
+
+    def _personal_page(self, form: dict) -> None:
+        _, session = self._session()
+        if session is None or not form.get("slot"):
+            return self._error_page()
+        session["slot"] = form["slot"][0]
+        body = (
+            f"<h1>Persönliche Daten</h1><p>Termin: {html.escape(session['slot'])}</p>"
+            "<form method=\"post\" action=\"confirm\">"
+            "<input name=\"vorname\" placeholder=\"Vorname\">"
+            "<input name=\"nachname\" placeholder=\"Nachname\">"
+            "<input name=\"email\" type=\"email\">"
+            "<input name=\"telefon\">"
+            "<input name=\"geburtsdatum\">"
+            "<button type=\"submit\">Buchen</button></form>"
+        )
+        self._send(200, _layout("Daten", body))
+
+    def _confirm_page(self, form: dict) -> None:
+        _, session = self._session()
+        if session is None or not session.get("slot"):
+            return self._error_page()
+        with self.server.stats.lock:
+            self.server.stats.bookings += 1
+        body = f"<h1>Termin bestätigt</h1><p>{html.escape(session['slot'])}</p>"
+        self._send(200, _layout("Bestätigung", body))
+
+
+def start_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Start the stand-in on a background thread and return it."""
+    server = StubServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--days", type=int, default=0, help="Calendar days with free slots (0 = no slots)")
+    parser.add_argument("--slots-per-day", type=int, default=0, help="Free slots per calendar day")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Artificial delay per response")
+    parser.add_argument("--catalog-size", type=int, default=30, help="Number of Anliegen options listed")
+    parser.add_argument("--no-modal", action="store_true", help="Skip the Hinweis modal after Weiter")
+    parser.add_argument("--no-cookie-banner", action="store_true", help="Do not render the cookie banner")
+    parser.add_argument(
+        "--initialised-accordion",
+        action="store_true",
+        help="Send the calendar with the aria-controls/ui-accordion markup already in place",
+    )
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        days=args.days,
+        slots_per_day=args.slots_per_day,
+        latency_ms=args.latency_ms,
+        catalog_size=args.catalog_size,
+        hinweis_modal=not args.no_modal,
+        cookie_banner=not args.no_cookie_banner,
+        initialised_accordion=args.initialised_accordion,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve TEVIS-shaped pages for offline benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server = StubServer(("127.0.0.1", args.port), config_from_args(args))
+    print(f"TEVIS stand-in listening on {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,16 @@
 """Clean up logs produced by the monitor job, keeping the last 14 days."""
 from __future__ import annotations
 
+import json
+import os
 import re
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from src.config import EVENTS_FILE
+
 LOG_PATH = Path(__file__).parent / "cron.log"
+EVENTS_PATH = Path(__file__).parent / EVENTS_FILE
 RETENTION_DAYS = 14
 _DATE_PATTERN = re.compile(r"\[(\d{4}-\d{2}-\d{2})")
 
@@ -44,6 +49,34 @@ def prune_log_file(path: Path, cutoff: datetime) -> int:
     return removed
 
 
+def prune_events_file(path: Path, cutoff: datetime) -> int:
+    if not path.exists():
+        return 0
+
+    cutoff_ts = cutoff.timestamp()
+    kept_lines = []
+    removed = 0
+    try:
+        with path.open("r", encoding="utf-8", errors="ignore") as handle:
+            for line in handle:
+                try:
+                    old = float(json.loads(line)["ts"]) < cutoff_ts
+                except (ValueError, KeyError, TypeError):
+                    old = True  # torn or foreign line
+                if old:
+                    removed += 1
+                else:
+                    kept_lines.append(line)
+    except Exception:
+        return 0
+
+    if removed:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text("".join(kept_lines), encoding="utf-8")
+        os.replace(tmp, path)
+    return removed
+
+
 def prune_rotated_logs(path: Path, cutoff: datetime) -> list[str]:
     removed = []
     for rotated in sorted(path.parent.glob("cron.log.*")):
@@ -62,11 +95,14 @@ def main() -> None:
 
     removed_lines = prune_log_file(LOG_PATH, cutoff)
     removed_files = prune_rotated_logs(LOG_PATH, cutoff)
+    removed_events = prune_events_file(EVENTS_PATH, cutoff)
 
-    if removed_lines or removed_files:
+    if removed_lines or removed_files or removed_events:
         summary = [f"[{now:%Y-%m-%d %H:%M:%S}] Log cleanup:"]
         if removed_lines:
             summary.append(f"Removed {removed_lines} old log lines")
+        if removed_events:
+            summary.append(f"Removed {removed_events} old events")
         if removed_files:
             summary.append(f"Removed old log files {', '.join(removed_files)}")
         print(" ".join(summary))
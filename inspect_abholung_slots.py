@@ -4,6 +4,7 @@ from pathlib import Path
 
 from src.browser import BrowserManager, handle_modal_dialog
 from src.booking.navigation import goto_start, click_aufenthaltsangelegenheiten
+from src.booking.slots import extract_calendar_slots
 from src.notifications import log, send_success_notification
 
 ANLIEGEN_TEXT = "Abholung Aufenthaltserlaubnis"
@@ -39,21 +40,7 @@ def click_next(page, attempts: int = 3) -> None:
 
 def collect_slots(page) -> list[dict[str, str]]:
     """Collect available slots as a list of {date, time}."""
-    slots = []
-    accordions = page.locator("#sugg_accordion > h3")
-    for idx in range(accordions.count()):
-        header = accordions.nth(idx)
-        date_text = (header.text_content() or "").strip()
-        panel_id = header.get_attribute("aria-controls")
-        if not panel_id:
-            continue
-        panel = page.locator(f"#{panel_id}")
-        buttons = panel.locator("button.suggest_btn:not([disabled])")
-        for i in range(buttons.count()):
-            time_text = (buttons.nth(i).text_content() or "").strip()
-            if time_text:
-                slots.append({"date": date_text, "time": time_text})
-    return slots
+    return [{"date": date, "time": time} for date, time, _ in extract_calendar_slots(page)]
 
 
 def main() -> None:
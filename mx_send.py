@@ -1,42 +1,177 @@
+import hashlib
+import json
 import os
+import random
+import threading
+import time
 import uuid
+from pathlib import Path
 from urllib.parse import quote
 
-import requests
+# Read lazily so importing this module (e.g. for --no-matrix runs) needs neither
+# the Matrix environment nor requests:
+#   MATRIX_HOMESERVER    https://chat.rickandzoey.com
+#   MATRIX_ACCESS_TOKEN  token obtained in step 1
+#   MATRIX_ROOM_ID       !abc123:rickandzoey.com
 
-MX_HS  = os.environ["MATRIX_HOMESERVER"]      # https://chat.rickandzoey.com
-MX_TOK = os.environ["MATRIX_ACCESS_TOKEN"]    # token obtained in step 1
-ROOM   = os.environ["MATRIX_ROOM_ID"]         # !abc123:rickandzoey.com
+# content hash -> mxc:// URI, so identical images (e.g. an unchanged heatmap) are uploaded once
+MEDIA_CACHE = Path(__file__).resolve().parent / os.getenv("MATRIX_MEDIA_CACHE", ".mx_media_cache.json")
+MEDIA_CACHE_MAX_ENTRIES = 500
 
-def send_text(text: str):
-    url = f"{MX_HS}/_matrix/client/v3/rooms/{ROOM}/send/m.room.message/{uuid.uuid4()}"
-    r = requests.put(url,
-        headers={"Authorization": f"Bearer {MX_TOK}", "Content-Type":"application/json"},
-        json={"msgtype":"m.text", "body": text},
-        timeout=10
-    )
-    r.raise_for_status()
+
+def _get_number(name, default, cast, minimum):
+    """Like config._get_int: a malformed value falls back to the default instead of failing the import."""
+    try:
+        value = cast(os.getenv(name, str(default)))
+    except ValueError:
+        value = default
+    return max(minimum, value)
+
+
+# Retries: bounded exponential backoff; 429 responses wait for the server's retry_after_ms
+MAX_ATTEMPTS = _get_number("MATRIX_MAX_ATTEMPTS", 4, int, 1)
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = _get_number("MATRIX_BACKOFF_MAX_SECONDS", 30.0, float, BACKOFF_BASE_SECONDS)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+_retry_listeners = []
+
+
+class MatrixError(RuntimeError):
+    """Raised when a Matrix request still fails after all retries."""
+
+
+def add_retry_listener(callback):
+    """Call ``callback(reason, delay_seconds)`` before every retry."""
+    if callback not in _retry_listeners:
+        _retry_listeners.append(callback)
+
+
+def _settings():
+    """Return (homeserver, token, room); raises MatrixError when one is not configured."""
+    values = []
+    for name in ("MATRIX_HOMESERVER", "MATRIX_ACCESS_TOKEN", "MATRIX_ROOM_ID"):
+        value = os.environ.get(name)
+        if not value:
+            raise MatrixError(f"{name} is not set")
+        values.append(value)
+    return tuple(values)
+
+
+def _get_session():
+    """One pooled keep-alive session per process instead of a new TLS handshake per call."""
+    global _session
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Authorization"] = f"Bearer {_settings()[1]}"
+            _session = session
+        return _session
+
+
+def _retry_delay(response, attempt: int) -> float:
+    if response is not None and response.status_code == 429:
+        try:
+            retry_ms = response.json().get("retry_after_ms")
+        except ValueError:
+            retry_ms = None
+        if retry_ms is None and response.headers.get("Retry-After", "").isdigit():
+            retry_ms = int(response.headers["Retry-After"]) * 1000
+        if retry_ms is not None:
+            return min(BACKOFF_MAX_SECONDS, max(0.0, retry_ms / 1000))
+    backoff = BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))
+    return min(BACKOFF_MAX_SECONDS, backoff) * random.uniform(0.8, 1.2)
+
+
+def _request(method: str, url: str, timeout: float, **kwargs):
+    """Send with retries on network errors, 5xx and 429; other 4xx fail immediately."""
+    import requests
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        response = None
+        try:
+            response = _get_session().request(method, url, timeout=timeout, **kwargs)
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response
+            reason = f"HTTP {response.status_code}"
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            reason = exc.__class__.__name__
+
+        if attempt == MAX_ATTEMPTS:
+            break
+        delay = _retry_delay(response, attempt)
+        for callback in list(_retry_listeners):
+            try:
+                callback(reason, delay)
+            except Exception:
+                pass
+        time.sleep(delay)
+
+    raise MatrixError(f"Matrix {method} failed after {MAX_ATTEMPTS} attempts ({reason})")
+
+
+def _send_event(content: dict, txn_id: str = None):
+    # The transaction id stays fixed across retries so the homeserver de-duplicates them
+    homeserver, _, room = _settings()
+    txn_id = txn_id or uuid.uuid4().hex
+    url = f"{homeserver}/_matrix/client/v3/rooms/{room}/send/m.room.message/{txn_id}"
+    _request("PUT", url, timeout=10, json=content)
+
+
+def send_text(text: str, txn_id: str = None):
+    _send_event({"msgtype": "m.text", "body": text}, txn_id)
+
+
+def _load_media_cache() -> dict:
+    try:
+        cache = json.loads(MEDIA_CACHE.read_text(encoding="utf-8"))
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_media_cache(cache: dict):
+    # Dicts keep insertion order, so the oldest uploads are dropped first
+    entries = list(cache.items())[-MEDIA_CACHE_MAX_ENTRIES:]
+    tmp = MEDIA_CACHE.with_name(MEDIA_CACHE.name + ".tmp")
+    try:
+        tmp.write_text(json.dumps(dict(entries)), encoding="utf-8")
+        os.replace(tmp, MEDIA_CACHE)
+    except OSError:
+        pass
 
 
 def _upload_media(data: bytes, mimetype: str, filename: str) -> str:
-    url = f"{MX_HS}/_matrix/media/v3/upload?filename={quote(filename)}"
-    r = requests.post(
-        url,
-        headers={"Authorization": f"Bearer {MX_TOK}", "Content-Type": mimetype},
-        data=data,
-        timeout=30,
-    )
-    r.raise_for_status()
+    homeserver = _settings()[0]
+    key = f"{homeserver}|{mimetype}|{hashlib.sha256(data).hexdigest()}"
+    cache = _load_media_cache()
+    if cache.get(key):
+        return cache[key]
+
+    url = f"{homeserver}/_matrix/media/v3/upload?filename={quote(filename)}"
+    r = _request("POST", url, timeout=30, headers={"Content-Type": mimetype}, data=data)
     payload = r.json()
-    return payload.get("content_uri", "")
+    content_uri = payload.get("content_uri", "")
+    if content_uri:
+        cache[key] = content_uri
+        _save_media_cache(cache)
+    return content_uri
 
 
-def send_image(text: str, image_bytes: bytes, filename: str = "image.png", mimetype: str = "image/png"):
+def send_image(text: str, image_bytes: bytes, filename: str = "image.png", mimetype: str = "image/png", txn_id: str = None):
     content_uri = _upload_media(image_bytes, mimetype, filename)
     if not content_uri:
         raise RuntimeError("Matrix media upload did not return a content URI")
 
-    url = f"{MX_HS}/_matrix/client/v3/rooms/{ROOM}/send/m.room.message/{uuid.uuid4()}"
     payload = {
         "msgtype": "m.image",
         "body": text or filename,
@@ -46,10 +181,4 @@ def send_image(text: str, image_bytes: bytes, filename: str = "image.png", mimet
             "size": len(image_bytes),
         },
     }
-    r = requests.put(
-        url,
-        headers={"Authorization": f"Bearer {MX_TOK}", "Content-Type": "application/json"},
-        json=payload,
-        timeout=10,
-    )
-    r.raise_for_status()
+    _send_event(payload, txn_id)
@@ -14,6 +14,9 @@ import matplotlib.pyplot as plt
 from matplotlib import colors
 import numpy as np
 
+from src import stats_store
+from src.timezone_utils import DISPLAY_TZ
+
 WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 DEFAULT_STATS_PATH = Path("stats/slot_detection_stats.json")
 DEFAULT_OUTPUT_PATH = Path("stats/hotspot_heatmap.png")
@@ -25,7 +28,13 @@ def _parse_args() -> argparse.Namespace:
         "--stats-path",
         type=Path,
         default=DEFAULT_STATS_PATH,
-        help="Path to slot_detection_stats.json",
+        help="Path to slot_detection_stats.json (used when the stats database does not exist)",
+    )
+    parser.add_argument(
+        "--db-path",
+        type=Path,
+        default=None,
+        help="SQLite stats store (defaults to STATS_DB_FILE)",
     )
     parser.add_argument(
         "--output",
@@ -37,7 +46,7 @@ def _parse_args() -> argparse.Namespace:
         "--recent-days",
         type=int,
         default=None,
-        help="Only include buckets whose last_seen is within the last N days",
+        help="Only count the last N days (per-day rows of the stats database; last_seen for the JSON file)",
     )
     parser.add_argument(
         "--min-checks",
@@ -253,13 +262,21 @@ def _plot_heatmap(
 
 def main() -> None:
     args = _parse_args()
-    data = _load_stats(args.stats_path)
-    buckets = data.get("buckets", {})
-    bucket_minutes = int(data.get("bucket_minutes", 30))
+    db_path = args.db_path or stats_store.db_path()
     cutoff = None
-    if args.recent_days:
-        cutoff = datetime.now(timezone.utc) - timedelta(days=args.recent_days)
-        cutoff = cutoff.replace(tzinfo=None)
+    if db_path.exists():
+        since_day = None
+        if args.recent_days:
+            since_day = (datetime.now(DISPLAY_TZ).date() - timedelta(days=args.recent_days)).isoformat()
+        bucket_minutes, buckets = stats_store.load_bucket_stats(db_path, since_day)
+    else:
+        # The JSON file only has lifetime totals, so a window can only filter by last_seen
+        data = _load_stats(args.stats_path)
+        buckets = data.get("buckets", {})
+        bucket_minutes = int(data.get("bucket_minutes", 30))
+        if args.recent_days:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=args.recent_days)
+            cutoff = cutoff.replace(tzinfo=None)
 
     matrix, cell_info, time_labels, _ = _prepare_matrix(
         buckets,
@@ -0,0 +1,177 @@
+"""Alert throttling shared by the monitor engines."""
+import json
+import time
+
+from .config import (
+    ALERT_CHANGE_ONLY,
+    ALERT_MIN_INTERVAL_MINUTES,
+    ALERT_MIN_CONSECUTIVE_DETECTIONS,
+    ALERT_CONFIRM_RECHECKS,
+    ALERT_CONFIRM_DELAY_SECONDS,
+)
+from .notifications import log
+
+
+def default_state():
+    return {"last_state": "none", "last_alert_ts": 0, "consecutive_slot_runs": 0}
+
+
+def parse_state(data):
+    """Normalise a persisted state dict, keeping only the fields we need."""
+    state = default_state()
+    if not isinstance(data, dict):
+        return state
+    state["last_state"] = data.get("last_state", "none")
+    state["last_alert_ts"] = int(data.get("last_alert_ts", 0))
+    state["consecutive_slot_runs"] = max(0, int(data.get("consecutive_slot_runs", 0)))
+    return state
+
+
+def load_state(path):
+    try:
+        if path.exists():
+            return parse_state(json.loads(path.read_text(encoding="utf-8")))
+    except Exception as exc:
+        log(f"Failed to read monitor state: {exc}")
+    return default_state()
+
+
+def save_state(path, state):
+    try:
+        path.write_text(json.dumps(parse_state(state)), encoding="utf-8")
+    except Exception as exc:
+        log(f"Failed to write monitor state: {exc}")
+
+
+def decide_alert(state, has_slots, now_ts, min_detections=None):
+    """Apply change-only, cooldown and persistence rules to one check result.
+
+    Returns ``(new_state, should_send, reason, note)``; ``note`` is the log
+    line to emit when no alert is sent.
+    """
+    last_state = state["last_state"]
+    last_alert_ts = state["last_alert_ts"]
+    consecutive_slot_runs = state["consecutive_slot_runs"] + 1 if has_slots else 0
+    cooldown = max(0, int(ALERT_MIN_INTERVAL_MINUTES) * 60)
+
+    if min_detections is None:
+        min_detections = ALERT_MIN_CONSECUTIVE_DETECTIONS
+    min_detections = max(1, int(min_detections))
+    slots_are_persistent = has_slots and consecutive_slot_runs >= min_detections
+
+    should_send = False
+    reason = ""
+    if slots_are_persistent:
+        if last_state != "some":
+            should_send = True
+            reason = f"availability persisted for {consecutive_slot_runs} consecutive runs"
+        elif not ALERT_CHANGE_ONLY and (
+            cooldown == 0 or (now_ts - last_alert_ts) >= cooldown
+        ):
+            should_send = True
+            reason = f"periodic reminder after {ALERT_MIN_INTERVAL_MINUTES} min"
+
+    note = ""
+    if slots_are_persistent and should_send:
+        last_alert_ts = now_ts
+        last_state = "some"
+    elif has_slots and not slots_are_persistent:
+        note = (
+            "Slots detected but waiting for persistence threshold "
+            f"({consecutive_slot_runs}/{min_detections} consecutive runs)"
+        )
+        last_state = "none"
+    elif slots_are_persistent:
+        if ALERT_CHANGE_ONLY:
+            note = "Persistent slots detected but change-only mode suppressed a reminder"
+        else:
+            note = "Persistent slots detected but throttled until the reminder cooldown elapses"
+        last_state = "some"
+    else:
+        note = "No slots currently available."
+        last_state = "none"
+
+    new_state = {
+        "last_state": last_state,
+        "last_alert_ts": int(last_alert_ts),
+        "consecutive_slot_runs": int(consecutive_slot_runs),
+    }
+    return new_state, should_send, reason, note
+
+
+class SlotList(list):
+    """Slot labels, plus whether in-run re-checks confirmed them."""
+
+    confirmed = False
+
+
+def confirm_slots(slots, reread, rechecks=ALERT_CONFIRM_RECHECKS, delay=ALERT_CONFIRM_DELAY_SECONDS, sleep=time.sleep):
+    """Re-read the calendar within the same run before trusting a detection.
+
+    ``reread`` returns the current slot list, or None when a re-check was
+    inconclusive (e.g. the page could not be reloaded); inconclusive
+    re-checks neither confirm nor refute. Returns the latest slots as a
+    :class:`SlotList` that is ``confirmed`` only when at least one re-check
+    was conclusive, or an empty list when they vanished during confirmation.
+    """
+    if not slots or rechecks <= 0:
+        return slots
+
+    conclusive = 0
+    for attempt in range(1, rechecks + 1):
+        sleep(delay)
+        try:
+            current = _judge_recheck(reread(), attempt, rechecks)
+        except Exception as exc:
+            log(f"Confirmation re-check {attempt}/{rechecks} was inconclusive: {exc}")
+            continue
+        if current == []:
+            return []
+        if current:
+            conclusive += 1
+            slots = current
+    return _confirmed(slots, conclusive, rechecks)
+
+
+async def confirm_slots_async(slots, reread, rechecks=ALERT_CONFIRM_RECHECKS, delay=ALERT_CONFIRM_DELAY_SECONDS):
+    """:func:`confirm_slots` for a coroutine ``reread``, e.g. on an async Playwright page."""
+    import asyncio
+
+    if not slots or rechecks <= 0:
+        return slots
+
+    conclusive = 0
+    for attempt in range(1, rechecks + 1):
+        await asyncio.sleep(delay)
+        try:
+            current = _judge_recheck(await reread(), attempt, rechecks)
+        except Exception as exc:
+            log(f"Confirmation re-check {attempt}/{rechecks} was inconclusive: {exc}")
+            continue
+        if current == []:
+            return []
+        if current:
+            conclusive += 1
+            slots = current
+    return _confirmed(slots, conclusive, rechecks)
+
+
+def _judge_recheck(current, attempt, rechecks):
+    """Log one re-check; returns its slots, [] when they vanished, or None when inconclusive."""
+    if current is None:
+        log(f"Confirmation re-check {attempt}/{rechecks} was inconclusive")
+        return None
+    if not current:
+        log(f"Slots vanished during confirmation re-check {attempt}/{rechecks}")
+        return []
+    return current
+
+
+def _confirmed(slots, conclusive, rechecks):
+    result = SlotList(slots)
+    if conclusive:
+        result.confirmed = True
+        log(f"Slots confirmed by {conclusive} of {rechecks} in-run re-checks")
+    else:
+        log("No confirmation re-check was conclusive; the slots stay unconfirmed")
+    return result
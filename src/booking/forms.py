@@ -2,7 +2,38 @@
 import re
 from playwright.sync_api import TimeoutError as PWTimeout
 from ..config import FIRST_NAME, LAST_NAME, EMAIL, PHONE, DATE_OF_BIRTH
+from .. import forensics
 from ..notifications import log
+from ..waits import act_and_wait
+
+PERSONAL_SELECTORS = ['input[name*="vorname"]', 'input[name*="firstname"]', 'input[name*="first"]']
+
+# Fields to populate
+PERSONAL_FIELDS = [
+    ('input[name*="vorname"], input[name*="firstname"], input[name*="first"]', FIRST_NAME),
+    ('input[name*="nachname"], input[name*="lastname"], input[name*="last"], input[name*="name"]', LAST_NAME),
+    ('input[name*="email"], input[type="email"]', EMAIL),
+    ('input[name*="telefon"], input[name*="phone"], input[name*="tel"]', PHONE),
+    ('input[name*="geburt"], input[name*="birth"], input[name*="dob"]', DATE_OF_BIRTH)
+]
+
+# Fills every field in one evaluate call; an input claimed by an earlier field
+# is skipped so the broad last-name selector cannot overwrite the first name.
+FILL_SCRIPT = r"""(fields) => {
+    const used = new Set();
+    const filled = [];
+    for (const [selector, value] of fields) {
+        const input = Array.from(document.querySelectorAll(selector))
+            .find((el) => !used.has(el) && el.offsetParent !== null && !el.disabled);
+        if (!input) continue;
+        used.add(input);
+        input.value = value;
+        input.dispatchEvent(new Event('input', { bubbles: true }));
+        input.dispatchEvent(new Event('change', { bubbles: true }));
+        filled.push(selector);
+    }
+    return filled;
+}"""
 
 
 def proceed_until_personal(page, max_clicks=3):
@@ -21,8 +52,7 @@ def proceed_until_personal(page, max_clicks=3):
                 try:
                     button = page.get_by_role("button", name=re.compile(pattern, re.I))
                     if button.is_visible(timeout=2000):
-                        button.click()
-                        page.wait_for_timeout(2000)
+                        act_and_wait(page, button.click, 2000, selectors=PERSONAL_SELECTORS)
                         clicks += 1
                         break
                 except PWTimeout:
@@ -40,16 +70,7 @@ def fill_personal_data(page):
     """Fill in personal information."""
     log("Filling personal information...")
 
-    # Fields to populate
-    name_fields = [
-        ('input[name*="vorname"], input[name*="firstname"], input[name*="first"]', FIRST_NAME),
-        ('input[name*="nachname"], input[name*="lastname"], input[name*="last"], input[name*="name"]', LAST_NAME),
-        ('input[name*="email"], input[type="email"]', EMAIL),
-        ('input[name*="telefon"], input[name*="phone"], input[name*="tel"]', PHONE),
-        ('input[name*="geburt"], input[name*="birth"], input[name*="dob"]', DATE_OF_BIRTH)
-    ]
-
-    for selector, value in name_fields:
+    for selector, value in PERSONAL_FIELDS:
         if value:  # only populate when a value is provided
             try:
                 field = page.locator(selector).first
@@ -63,16 +84,26 @@ def fill_personal_data(page):
     log("Completed personal information entry")
 
 
+def fill_personal_data_at_once(page):
+    """Fill all configured personal fields in a single round trip; returns how many were set."""
+    fields = [[selector, value] for selector, value in PERSONAL_FIELDS if value]
+    filled = page.evaluate(FILL_SCRIPT, fields) if fields else []
+    log(f"Filled {len(filled)} of {len(fields)} personal fields")
+    return len(filled)
+
+
 def solve_captcha_human_in_loop(page):
     """Allow a human to solve the captcha and resume afterwards."""
     log("Captcha detected, manual resolution required...")
 
-    # Capture a screenshot for manual review
-    try:
-        page.screenshot(path='captcha_screenshot.png')
-        log("Saved captcha screenshot: captcha_screenshot.png")
-    except Exception as e:
-        log(f"Failed to save captcha screenshot: {e}")
+    # Capture a screenshot for manual review (kept in the forensic ring)
+    target = forensics.capture("captcha", page)
+    if target is None:
+        try:
+            page.screenshot(path='captcha_screenshot.png')
+            log("Saved captcha screenshot: captcha_screenshot.png")
+        except Exception as e:
+            log(f"Failed to save captcha screenshot: {e}")
 
     # Wait for the user to solve the captcha manually
     log("Please solve the captcha manually, then press Enter to continue...")
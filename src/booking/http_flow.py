@@ -0,0 +1,419 @@
+"""Browserless monitor flow that replays the TEVIS form posts over HTTP."""
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .. import events
+from ..alerting import confirm_slots
+from ..config import START_URL, ANLIEGEN, HTTP_TIMEOUT_SECONDS
+from ..notifications import log
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+INTRO_PATTERNS = ["weiter", "termin", "starten"]
+DEPARTMENT_PATTERNS = [
+    "ausländer- und staatsangehörigkeitsbehörde",
+    "ausländerbehörde",
+    "ausländer",
+    "aufenthaltsangelegenheiten",
+]
+NO_SLOT_MARKERS = ["kein freier termin", "keine freien termine", "keine termine"]
+MAX_STEPS = 8
+
+_session = None
+
+
+class HttpFlowUnsupported(Exception):
+    """Raised when a page does not look like the TEVIS step we expect."""
+
+
+class Node:
+    """Minimal DOM node produced by :class:`_TreeBuilder`."""
+
+    __slots__ = ("tag", "attrs", "children", "parent")
+
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.parent = parent
+
+    def get(self, name, default=None):
+        return self.attrs.get(name, default)
+
+    def classes(self):
+        return (self.attrs.get("class") or "").split()
+
+    def iter(self):
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Node):
+                yield node
+                stack.extend(reversed(node.children))
+
+    def find_all(self, tag=None, predicate=None):
+        return [
+            node for node in self.iter()
+            if node is not self
+            and (tag is None or node.tag == tag)
+            and (predicate is None or predicate(node))
+        ]
+
+    def text(self):
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            else:
+                stack.extend(reversed(node.children))
+        return "".join(parts)
+
+    def ancestor(self, tag):
+        node = self.parent
+        while node is not None and node.tag != tag:
+            node = node.parent
+        return node
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document", {})
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {name: (value if value is not None else "") for name, value in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        node = Node(tag, {name: (value if value is not None else "") for name, value in attrs}, self.current)
+        self.current.children.append(node)
+
+    def handle_endtag(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def parse_html(html):
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+class Page:
+    """A fetched TEVIS page with its URL and parsed DOM."""
+
+    def __init__(self, url, html, request=None):
+        self.url = url
+        self.html = html
+        self.request = request
+        self.root = parse_html(html)
+        body = self.root.find_all("body")
+        self.body_text = (body[0] if body else self.root).text()
+
+    def by_id(self, element_id):
+        for node in self.root.iter():
+            if node.get("id") == element_id:
+                return node
+        return None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "de-DE,de;q=0.9"})
+        _session = session
+    return _session
+
+
+def _fetch(session, method, url, data=None, referer=None):
+    headers = {"Referer": referer} if referer else {}
+    if method == "POST":
+        resp = session.post(url, data=data, headers=headers, timeout=HTTP_TIMEOUT_SECONDS)
+    else:
+        resp = session.get(url, params=data, headers=headers, timeout=HTTP_TIMEOUT_SECONDS)
+    resp.raise_for_status()
+    return Page(resp.url, resp.text, request=(method, url, data, referer))
+
+
+def _form_fields(form, overrides=None, submitter=None):
+    """Collect the successful controls of a form the way a browser would."""
+    fields = []
+    for node in form.iter():
+        name = node.get("name")
+        if not name or "disabled" in node.attrs:
+            continue
+        if node.tag == "input":
+            kind = (node.get("type") or "text").lower()
+            if kind in ("submit", "button", "image", "reset", "file"):
+                continue
+            if kind in ("checkbox", "radio") and "checked" not in node.attrs:
+                continue
+            fields.append((name, node.get("value", "on" if kind in ("checkbox", "radio") else "")))
+        elif node.tag == "select":
+            options = node.find_all("option")
+            chosen = [opt for opt in options if "selected" in opt.attrs] or options[:1]
+            for opt in chosen:
+                fields.append((name, opt.get("value", opt.text().strip())))
+        elif node.tag == "textarea":
+            fields.append((name, node.text()))
+
+    if overrides:
+        names = set(overrides)
+        fields = [(name, value) for name, value in fields if name not in names]
+        fields.extend(overrides.items())
+    if submitter is not None and submitter.get("name"):
+        fields.append((submitter.get("name"), submitter.get("value", "")))
+    return fields
+
+
+def _submit(session, page, form, overrides=None, submitter=None):
+    action = (submitter.get("formaction") if submitter is not None else None) or form.get("action") or page.url
+    method = (form.get("method") or "GET").upper()
+    fields = _form_fields(form, overrides, submitter)
+    return _fetch(session, method, urljoin(page.url, action), fields, referer=page.url)
+
+
+def _is_submit_control(node):
+    if node.tag == "button":
+        return (node.get("type") or "submit").lower() == "submit"
+    return node.tag == "input" and (node.get("type") or "").lower() in ("submit", "image")
+
+
+def _control_label(node):
+    return (node.text().strip() or node.get("value") or node.get("title") or "").strip().lower()
+
+
+def _follow_control(session, page, node):
+    """Activate a button or link: submit its form or follow its target URL."""
+    form = node.ancestor("form")
+    if form is not None and _is_submit_control(node):
+        return _submit(session, page, form, submitter=node)
+    target = node.get("href") or node.get("data-url") or node.get("data-href")
+    if not target:
+        onclick = node.get("onclick") or ""
+        if "location" in onclick and "'" in onclick:
+            target = onclick.split("'")[1]
+    if not target or target.startswith(("#", "javascript:")):
+        raise HttpFlowUnsupported(f"control '{_control_label(node)}' has no replayable target")
+    return _fetch(session, "GET", urljoin(page.url, target), referer=page.url)
+
+
+def _anliegen_inputs(page):
+    return page.root.find_all("input", lambda node: "data-tevis-cncname" in node.attrs)
+
+
+def _department_step(session, page):
+    buttons = page.root.find_all("button", lambda node: "select_mdt_btn" in node.classes())
+    if len(buttons) == 1:
+        log(f"Clicked single department button: {buttons[0].text().strip()}")
+        return _follow_control(session, page, buttons[0])
+
+    candidates = page.root.find_all(
+        predicate=lambda node: node.tag in ("a", "button") or _is_submit_control(node)
+    )
+    for pattern in DEPARTMENT_PATTERNS:
+        for node in candidates:
+            if pattern in _control_label(node):
+                return _follow_control(session, page, node)
+    for node in candidates:
+        if "aufenthalt" in (node.get("href") or "").lower():
+            return _follow_control(session, page, node)
+    return None
+
+
+def _intro_step(session, page):
+    candidates = page.root.find_all(predicate=_is_submit_control)
+    for pattern in INTRO_PATTERNS:
+        for node in candidates:
+            if pattern in _control_label(node):
+                return _follow_control(session, page, node)
+    return None
+
+
+def _anliegen_step(session, page, anliegen):
+    target = None
+    for node in _anliegen_inputs(page):
+        if node.get("data-tevis-cncname") == anliegen:
+            target = node
+            break
+    if target is None:
+        log(f"Option not found: {anliegen}")
+        return None
+    form = target.ancestor("form")
+    if form is None or not target.get("name"):
+        raise HttpFlowUnsupported("Anliegen input is not part of a submittable form")
+
+    submitter = None
+    for node in form.find_all(predicate=_is_submit_control):
+        if "weiter" in _control_label(node) or node.get("id") == "WeiterButton":
+            submitter = node
+            break
+    log(f"Selected: {anliegen}")
+    return _submit(session, page, form, overrides={target.get("name"): "1"}, submitter=submitter)
+
+
+def _location_step(session, page):
+    for form in page.root.find_all("form"):
+        submit = form.find_all(
+            predicate=lambda node: node.get("name") == "select_location" or node.get("id") == "WeiterButton"
+        )
+        if submit:
+            log("Submitted Standort form via Weiter button")
+            return _submit(session, page, form, submitter=submit[0])
+
+    options = page.root.find_all(
+        "input", lambda node: (node.get("type") or "").lower() in ("radio", "checkbox")
+    )
+    if options and options[0].get("name"):
+        form = options[0].ancestor("form")
+        if form is not None:
+            submitter = next(
+                (node for node in form.find_all(predicate=_is_submit_control) if "weiter" in _control_label(node)),
+                None,
+            )
+            log("Selected a location")
+            return _submit(
+                session,
+                page,
+                form,
+                overrides={options[0].get("name"): options[0].get("value", "on")},
+                submitter=submitter,
+            )
+    raise HttpFlowUnsupported("location page has neither a select_location form nor options")
+
+
+def _panel_of(page, header, siblings):
+    """The panel of an accordion header: ``aria-controls`` once jQuery UI ran, else the next sibling."""
+    panel_id = header.get("aria-controls")
+    if panel_id:
+        return page.by_id(panel_id)
+    index = siblings.index(header)
+    following = siblings[index + 1] if index + 1 < len(siblings) else None
+    return following if following is not None and following.tag != "h3" else None
+
+
+def extract_slots(page):
+    """Return ``"date time"`` strings from the ``#sugg_accordion`` calendar.
+
+    Raises HttpFlowUnsupported when the accordion has headers but none of
+    them leads to a panel, rather than reporting a calendar it cannot read
+    as empty.
+    """
+    accordion = page.by_id("sugg_accordion")
+    if accordion is None:
+        return None
+
+    slots = []
+    siblings = [node for node in accordion.children if isinstance(node, Node)]
+    headers = [node for node in siblings if node.tag == "h3"]
+    panels = [_panel_of(page, header, siblings) for header in headers]
+    if headers and not any(panel is not None for panel in panels):
+        raise HttpFlowUnsupported("calendar headers have no recognisable panels")
+    for header, panel in zip(headers, panels):
+        if panel is None:
+            continue
+        date_text = header.text().strip()
+        buttons = panel.find_all(
+            "button", lambda node: "suggest_btn" in node.classes() and "disabled" not in node.attrs
+        )
+        for button in buttons:
+            time_text = (button.text() or button.get("title") or "").strip()
+            if time_text:
+                slots.append(f"{date_text} {time_text}".strip())
+    return slots
+
+
+def _is_error_page(page):
+    return "Fehlermeldung: Ungültiger Aufruf" in page.body_text
+
+
+def check_availability_http(anliegen=ANLIEGEN, start_url=START_URL):
+    """Replay the monitor flow without a browser and return slot strings.
+
+    Raises HttpFlowUnsupported whenever a page does not match the expected
+    TEVIS step so the caller can fall back to the Playwright flow.
+    """
+    session = _get_session()
+    page = _fetch(session, "GET", start_url)
+
+    # Walk intro and department pages until the Anliegen catalog shows up.
+    for _ in range(MAX_STEPS):
+        if _is_error_page(page):
+            raise HttpFlowUnsupported("TEVIS answered with 'Ungültiger Aufruf'")
+        if _anliegen_inputs(page):
+            break
+        next_page = _department_step(session, page) or _intro_step(session, page)
+        if next_page is None:
+            raise HttpFlowUnsupported(f"no way forward from {page.url}")
+        page = next_page
+    else:
+        raise HttpFlowUnsupported("Anliegen selection page not reached")
+
+    log("Searching for the RWTH option...")
+    page = _anliegen_step(session, page, anliegen)
+    if page is None:
+        return []
+    if _is_error_page(page):
+        raise HttpFlowUnsupported("Anliegen submission was rejected")
+
+    if page.by_id("sugg_accordion") is None:
+        page = _location_step(session, page)
+    if _is_error_page(page):
+        raise HttpFlowUnsupported("location submission was rejected")
+
+    log("Checking available slots...")
+    events.emit("check", engine="http")
+    slots = _calendar_slots(page)
+    if slots is None:
+        raise HttpFlowUnsupported("calendar page has no #sugg_accordion")
+
+    if slots:
+        log(f"Found {len(slots)} available slots: {slots[:5]}")
+        events.slots_found(slots)
+    else:
+        log("No slots currently available.")
+    return confirm_slots(slots, lambda: _reread_calendar(session, page))
+
+
+def _calendar_slots(page):
+    """Slots on a calendar page, [] for an explicit "no appointments" page, else None."""
+    slots = extract_slots(page)
+    if slots is None:
+        lowered = page.body_text.lower()
+        if any(marker in lowered for marker in NO_SLOT_MARKERS):
+            return []
+    return slots
+
+
+def _reread_calendar(session, page):
+    """Repeat the request that produced the calendar; None when the answer is not a calendar."""
+    method, url, data, referer = page.request
+    fresh = _fetch(session, method, url, data, referer=referer)
+    if _is_error_page(fresh):
+        return None
+    return _calendar_slots(fresh)
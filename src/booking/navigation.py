@@ -1,32 +1,32 @@
 """Page navigation helpers."""
-import re
-from playwright.sync_api import TimeoutError as PWTimeout
 from ..config import START_URL
-from ..browser import accept_cookies
+from ..browser import handle_prelude
+from ..metrics import timed
 from ..notifications import log
+from ..waits import act_and_wait, wait_for_selectors
 
+# Elements that show the department/Anliegen step has rendered
+ANLIEGEN_SELECTORS = ["input[data-tevis-cncname]", ':text("Auswahl des Anliegens")']
+ENTRY_SELECTORS = ["button.select_mdt_btn", ':text("Aufenthaltsangelegenheiten")'] + ANLIEGEN_SELECTORS
 
+
+@timed("goto_start")
 def goto_start(page):
     """Navigate to the start page."""
     page.goto(START_URL)
-    accept_cookies(page)
 
-    # Intro pages often expose a "Weiter/Termin" button
-    for pat in ["Weiter", "Termin", "Starten"]:
-        try:
-            page.get_by_role("button", name=re.compile(pat, re.I)).click(timeout=1500)
-            break
-        except PWTimeout:
-            pass
+    # Cookie banner and intro pages often expose an "Einverstanden" or "Weiter/Termin" button
+    handle_prelude(page)
 
 
+@timed("department")
 def click_aufenthaltsangelegenheiten(page):
     """Click the current Ausländerbehörde entry point."""
     log("Opening the Ausländerbehörde entry point...")
 
     # Wait for the page to stabilise
     page.wait_for_load_state("domcontentloaded")
-    page.wait_for_timeout(1500)
+    wait_for_selectors(page, ENTRY_SELECTORS, 1500)
 
     try:
         body_text = page.locator("body").inner_text(timeout=2000)
@@ -43,9 +43,8 @@ def click_aufenthaltsangelegenheiten(page):
             button = department_buttons.first
             if button.is_visible(timeout=2000):
                 label = (button.inner_text() or "").strip()
-                button.click()
+                act_and_wait(page, button.click, 2000, selectors=ANLIEGEN_SELECTORS)
                 log(f"Clicked single department button: {label}")
-                page.wait_for_timeout(2000)
                 return True
     except Exception as exc:
         log(f"Failed to use the single department shortcut: {exc}")
@@ -65,8 +64,7 @@ def click_aufenthaltsangelegenheiten(page):
         try:
             element = page.locator(selector).first
             if element.is_visible(timeout=2000):
-                element.click()
-                page.wait_for_timeout(2000)
+                act_and_wait(page, element.click, 2000, selectors=ANLIEGEN_SELECTORS)
                 return True
         except Exception as e:
             log(f"Failed using selector {selector}: {e}")
@@ -0,0 +1,159 @@
+"""Race-to-book: keep a session parked on the calendar and book on first sight.
+
+The prelude (start page, department, Anliegen, Standort) is walked once and
+the calendar is then re-read in place. When a slot shows up the click, the
+personal-data form and the final submit run back to back without the
+pattern probing of the regular ``run_once`` flow.
+"""
+import time
+from pathlib import Path
+
+from ..browser import BrowserManager
+from ..config import (
+    ANLIEGEN,
+    STANDORT,
+    AUTO_BOOK,
+    LOCK_FILE,
+    RACE_POLL_SECONDS,
+    RACE_MAX_MINUTES,
+)
+from ..metrics import stage
+from ..notifications import log, send_error_notification, send_success_notification
+from ..waits import act_and_wait, wait_for_selectors
+from .forms import PERSONAL_SELECTORS, fill_personal_data_at_once, proceed_until_personal, solve_captcha_human_in_loop
+from .navigation import goto_start, click_aufenthaltsangelegenheiten
+from .selection import select_anliegen, select_standort
+from .session import is_error_page
+from .slots import CALENDAR_SCRIPT, _wait_for_calendar
+
+CAPTCHA_SELECTOR = 'img[src*="captcha"], canvas, #captcha'
+SUBMIT_SELECTOR = 'button:has-text("Buchen"), input[type="submit"][value*="Buchen"]'
+
+# Timings of the most recent booking attempt, in milliseconds (read by the benchmarks)
+last_timings = {}
+
+
+def park(page) -> bool:
+    """Walk the prelude up to the calendar page; returns whether it got there."""
+    log("Parking a session on the calendar page...")
+    goto_start(page)
+    click_aufenthaltsangelegenheiten(page)
+    select_anliegen(page, ANLIEGEN, count=1)
+    select_standort(page, STANDORT)
+    _wait_for_calendar(page)
+    if is_error_page(page):
+        log("Parking failed on the 'Ungültiger Aufruf' error page")
+        return False
+    log("Session parked on the calendar page")
+    return True
+
+
+def poll_calendar(page):
+    """Reload the parked calendar and return its slot rows; None when the session was lost."""
+    page.reload(wait_until="domcontentloaded")
+    if is_error_page(page):
+        return None
+    _wait_for_calendar(page)
+    return page.evaluate(CALENDAR_SCRIPT)
+
+
+def book_slot(page, row) -> bool:
+    """Click the slot ``row`` and submit the booking in one tight sequence."""
+    date_text, time_text, panel_id, index = row
+    slot_label = f"{date_text} {time_text}".strip()
+    last_timings.clear()
+    detected = time.perf_counter()
+
+    with stage("race_book") as run:
+        button = page.locator(f"#{panel_id}").locator("button.suggest_btn:not([disabled])").nth(index)
+        act_and_wait(page, button.click, 2000, selectors=PERSONAL_SELECTORS)
+        clicked = time.perf_counter()
+
+        if not wait_for_selectors(page, PERSONAL_SELECTORS, 0, timeout_ms=2000):
+            # Some variants put a confirmation step in between
+            if not proceed_until_personal(page):
+                run.outcome = "miss"
+                send_error_notification(f"Unable to reach the personal information page for {slot_label}")
+                return False
+
+        fill_personal_data_at_once(page)
+        filled = time.perf_counter()
+
+        if page.locator(CAPTCHA_SELECTOR).count() > 0:
+            log("Captcha on the personal information page; the click-to-submit timing includes manual solving")
+            if not solve_captcha_human_in_loop(page):
+                run.outcome = "miss"
+                send_error_notification("Captcha handling failed")
+                return False
+
+        submit = page.locator(SUBMIT_SELECTOR).first
+        if submit.count() == 0:
+            run.outcome = "miss"
+            send_error_notification("Unable to locate the final submission button")
+            return False
+        act_and_wait(page, submit.click, 3000)
+        submitted = time.perf_counter()
+
+    last_timings.update(
+        {
+            "click_ms": round((clicked - detected) * 1000),
+            "fill_ms": round((filled - clicked) * 1000),
+            "detect_to_submit_ms": round((submitted - detected) * 1000),
+        }
+    )
+    log(
+        f"Race booking of {slot_label}: detection-to-submit {last_timings['detect_to_submit_ms']} ms "
+        f"(click {last_timings['click_ms']} ms, fill {last_timings['fill_ms']} ms)"
+    )
+    Path(LOCK_FILE).touch()
+    send_success_notification(
+        f"🎉 Booking submitted for {slot_label} "
+        f"({last_timings['detect_to_submit_ms']} ms from detection to submission)."
+    )
+    return True
+
+
+def race_to_book(headless=True, poll_seconds=RACE_POLL_SECONDS, max_minutes=RACE_MAX_MINUTES):
+    """Keep a parked session polling the calendar and book the first slot that appears.
+
+    Returns True once a booking was submitted, False on a failed attempt and
+    None when no slot appeared within ``max_minutes``.
+    """
+    if not AUTO_BOOK:
+        log("Race booking requires AUTO_BOOK=true; nothing to do")
+        return None
+    if Path(LOCK_FILE).exists():
+        log("Lock file detected; skipping booking to avoid duplicates")
+        return True
+
+    deadline = time.monotonic() + max_minutes * 60
+    with BrowserManager(headless=headless) as page:
+        parked = False
+        while time.monotonic() < deadline:
+            if not parked:
+                try:
+                    parked = park(page)
+                except Exception as exc:
+                    log(f"Failed to park the session: {exc}")
+                if not parked:
+                    page.wait_for_timeout(poll_seconds * 1000)
+                    continue
+                rows = page.evaluate(CALENDAR_SCRIPT)
+            else:
+                try:
+                    rows = poll_calendar(page)
+                except Exception as exc:
+                    log(f"Calendar poll failed: {exc}")
+                    rows = None
+                if rows is None:
+                    log("Parked session was lost; parking again")
+                    parked = False
+                    continue
+
+            if rows:
+                log(f"{len(rows)} slots appeared in the parked calendar; booking the first one")
+                return book_slot(page, rows[0])
+            page.wait_for_timeout(poll_seconds * 1000)
+
+    log(f"No slot appeared within {max_minutes} minutes of race booking")
+    return None
@@ -2,22 +2,52 @@
 import re
 from playwright.sync_api import TimeoutError as PWTimeout
 from ..browser import handle_modal_dialog
+from ..metrics import timed
 from ..notifications import log
+from ..waits import act_and_wait, pause, settle
+
+MODAL_SELECTORS = ['.modal-dialog', '[role="dialog"]', '.modal.in']
+CALENDAR_SELECTORS = ["#sugg_accordion"]
+ANLIEGEN_INPUTS = "input[data-tevis-cncname]"
+LOCATION_INPUTS = 'input[type="radio"], input[type="checkbox"]'
+
+# Describes every input matching the selector in one call: its position in the
+# match list, Anliegen name, id, label text (label[for] or parent) and visibility.
+OPTION_CATALOG_SCRIPT = r"""(selector) => Array.from(document.querySelectorAll(selector)).map((el, index) => {
+    let label = '';
+    if (el.id) {
+        const labelEl = document.querySelector(`label[for="${CSS.escape(el.id)}"]`);
+        if (labelEl) label = labelEl.textContent || '';
+    }
+    if (!label && el.parentElement) label = el.parentElement.textContent || '';
+    const style = window.getComputedStyle(el);
+    return {
+        index,
+        name: el.getAttribute('data-tevis-cncname') || '',
+        id: el.id || '',
+        label: label.trim(),
+        visible: style.visibility !== 'hidden' && style.display !== 'none' && el.getClientRects().length > 0,
+    };
+})"""
+
+
+def _set_number_input(inp, count, visible=None):
+    """Fill a numeric Anliegen input, falling back to JavaScript for hidden fields.
+
+    ``visible`` skips the visibility round trips when the caller already knows it.
+    """
+    if visible is not False:
+        try:
+            inp.scroll_into_view_if_needed()
+        except Exception:
+            pass
 
-
-def _set_number_input(inp, count):
-    """Fill a numeric Anliegen input, falling back to JavaScript for hidden fields."""
-    try:
-        inp.scroll_into_view_if_needed()
-    except Exception:
-        pass
-
-    try:
-        if inp.is_visible():
-            inp.fill(str(count))
-            return
-    except Exception:
-        pass
+        try:
+            if visible or inp.is_visible():
+                inp.fill(str(count))
+                return
+        except Exception:
+            pass
 
     inp.evaluate(
         """(el, value) => {
@@ -29,46 +59,36 @@ def _set_number_input(inp, count):
     )
 
 
+@timed("anliegen")
 def select_anliegen(page, text, count=1):
     """Select the requested service."""
     log(f"Searching for option: {text}")
 
     # Wait for the page to finish loading
-    page.wait_for_load_state('networkidle')
-    page.wait_for_timeout(2000)
+    settle(page, 2000)
 
     # Scroll to the bottom to ensure lazy-loaded elements appear
     page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-    page.wait_for_timeout(1000)
-
-    # Capture a screenshot for debugging
-    page.screenshot(path='debug_select_anliegen.png', full_page=True)
-    log("Saved page screenshot: debug_select_anliegen.png")
+    pause(page, 1000)
 
-    # Find all inputs and iterate to match the requested option
-    inputs = page.locator('input[data-tevis-cncname]').all()
-    log(f"Found {len(inputs)} options")
+    # Read the whole option catalog in one call and match in Python
+    catalog = page.evaluate(OPTION_CATALOG_SCRIPT, ANLIEGEN_INPUTS)
+    log(f"Found {len(catalog)} options")
 
     # List all options for debugging
-    for i, inp in enumerate(inputs):
-        try:
-            cnc_name = inp.get_attribute('data-tevis-cncname')
-            log(f"Option {i}: {cnc_name}")
-        except:
-            pass
+    for option in catalog:
+        log(f"Option {option['index']}: {option['name']}")
 
     found = False
-    for i, inp in enumerate(inputs):
-        try:
-            cnc_name = inp.get_attribute('data-tevis-cncname')
-            if cnc_name and text == cnc_name:  # use exact match
-                _set_number_input(inp, count)
-                log(f"Selected {cnc_name} with count {count}")
+    for option in catalog:
+        if option["name"] and text == option["name"]:  # use exact match
+            try:
+                _set_number_input(page.locator(ANLIEGEN_INPUTS).nth(option["index"]), count, option["visible"])
+                log(f"Selected {option['name']} with count {count}")
                 found = True
-                break
-        except Exception as e:
-            log(f"Error processing option {i}: {e}")
-            continue
+            except Exception as e:
+                log(f"Error processing option {option['index']}: {e}")
+            break
 
     if not found:
         error_msg = f"Option not found: {text}"
@@ -81,13 +101,13 @@ def select_anliegen(page, text, count=1):
     for attempt in range(max_attempts):
         # Dismiss modal dialogs if they appear
         handle_modal_dialog(page)
-        page.wait_for_timeout(500)
+        pause(page, 500)
 
         try:
             # Try clicking the Weiter button
             weiter_btn = page.get_by_role("button", name=re.compile("Weiter", re.I))
             if weiter_btn.is_visible() and weiter_btn.is_enabled():
-                weiter_btn.click(timeout=3000)
+                act_and_wait(page, lambda: weiter_btn.click(timeout=3000), 0, selectors=MODAL_SELECTORS)
                 log("Successfully clicked the Weiter button")
                 break
         except PWTimeout:
@@ -114,60 +134,42 @@ def select_anliegen(page, text, count=1):
     log("Handled modal dialogs and submitted the form")
 
 
+@timed("standort")
 def select_standort(page, text):
     """Select the location."""
     log("Selecting location...")
-    page.wait_for_timeout(2000)
+    pause(page, 2000)
 
     # Check for and dismiss modal dialogs
     handle_modal_dialog(page)
 
     # Wait for the page to load
-    page.wait_for_load_state('networkidle')
-    page.wait_for_timeout(2000)
+    settle(page, 2000)
 
     # Some TEVIS flows show explicit radio options, others expose standalone submit forms.
-    inputs = page.locator('input[type="radio"], input[type="checkbox"]').all()
+    inputs = page.evaluate(OPTION_CATALOG_SCRIPT, LOCATION_INPUTS)
     log(f"Found {len(inputs)} location options")
 
     found = False
-    for inp in inputs:
-        try:
-            # Get the associated label text
-            label_text = ""
-            inp_id = inp.get_attribute('id')
-            if inp_id:
-                try:
-                    label = page.locator(f'label[for="{inp_id}"]')
-                    if label.count() > 0:
-                        label_text = label.text_content() or ""
-                except:
-                    pass
-
-            # If there is no label, fall back to the parent element text
-            if not label_text:
-                try:
-                    parent_text = inp.locator('xpath=..').text_content() or ""
-                    label_text = parent_text
-                except:
-                    pass
-
-            log(f"Inspecting location option: {label_text}")
-            if text.lower() in label_text.lower():
+    for option in inputs:
+        label_text = option["label"]
+        log(f"Inspecting location option: {label_text}")
+        if text.lower() in label_text.lower():
+            try:
                 log(f"Selected location: {label_text}")
-                inp.click()
-                page.wait_for_timeout(1000)
+                page.locator(LOCATION_INPUTS).nth(option["index"]).click()
+                pause(page, 1000)
                 found = True
                 break
-        except Exception as e:
-            log(f"Error while selecting location: {e}")
-            continue
+            except Exception as e:
+                log(f"Error while selecting location: {e}")
+                continue
 
     if not found and inputs:
         # No match found; fall back to the first available option
         log("No matching location found, selecting the first option")
         try:
-            first_input = page.locator('input[type="radio"], input[type="checkbox"]').first
+            first_input = page.locator(LOCATION_INPUTS).first
             if first_input.is_visible():
                 first_input.click()
                 log("Selected the first location option")
@@ -203,9 +205,14 @@ def select_standort(page, text):
                 pass
 
             try:
-                submit.click()
+                act_and_wait(page, submit.click, 0, selectors=CALENDAR_SELECTORS)
             except Exception:
-                form.evaluate("(el) => el.requestSubmit ? el.requestSubmit() : el.submit()")
+                act_and_wait(
+                    page,
+                    lambda: form.evaluate("(el) => el.requestSubmit ? el.requestSubmit() : el.submit()"),
+                    0,
+                    selectors=CALENDAR_SELECTORS,
+                )
 
             log("Submitted the location form")
             found = True
@@ -218,18 +225,18 @@ def select_standort(page, text):
         return
 
     # Click the continue/submit button
-    page.wait_for_timeout(2000)
+    pause(page, 2000)
     try:
         weiter_button = page.get_by_role("button", name="Weiter")
         if weiter_button.is_visible(timeout=3000):
-            weiter_button.click()
+            act_and_wait(page, weiter_button.click, 0, selectors=CALENDAR_SELECTORS)
             log("Successfully clicked the Weiter button")
         else:
             # Try other submit buttons
             buttons = page.locator('input[type="submit"], button[type="submit"]').all()
             for btn in buttons:
                 if btn.is_visible():
-                    btn.click()
+                    act_and_wait(page, btn.click, 0, selectors=CALENDAR_SELECTORS)
                     log("Clicked a submit button")
                     break
     except Exception as e:
@@ -0,0 +1,123 @@
+"""Persist the TEVIS session between monitor runs and resume at the latest step."""
+import json
+import time
+from pathlib import Path
+
+from ..config import (
+    STORAGE_STATE,
+    SESSION_RESUME,
+    SESSION_RESUME_FILE,
+    SESSION_RESUME_MAX_AGE_MINUTES,
+)
+from ..notifications import log
+from ..waits import settle
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+STEP_ORDER = ["calendar", "location", "anliegen"]
+# Each step is recognised by markup only that page renders
+STEP_MARKERS = {
+    "calendar": '#sugg_accordion, :text-matches("keine? (freien? )?termine?", "i")',
+    "location": "input[type='radio'], input[type='checkbox'], input[name='select_location'], "
+                "button[name='select_location']",
+    "anliegen": "input[data-tevis-cncname]",
+}
+MAX_FAILURES = 3
+FAILURE_BACKOFF_SECONDS = 6 * 3600
+
+
+def is_error_page(page):
+    try:
+        return page.locator("body:has-text('Fehlermeldung: Ungültiger Aufruf')").count() > 0
+    except Exception:
+        return False
+
+
+class SessionResume:
+    """Remembers step URLs of the last successful run and tries to jump back in."""
+
+    def __init__(self, path=None, enabled=SESSION_RESUME):
+        self.path = Path(path) if path else ROOT / SESSION_RESUME_FILE
+        self.enabled = enabled
+        self.data = self._load() if enabled else {}
+        self.steps = {}
+
+    def _load(self):
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        try:
+            self.path.write_text(json.dumps(data), encoding="utf-8")
+        except OSError as exc:
+            log(f"Failed to write session resume file: {exc}")
+
+    def mark(self, step, url):
+        """Record the URL at which ``step`` was reached during this run."""
+        # A step posted back to the URL of an earlier step cannot be reopened directly
+        if url not in self.steps.values():
+            self.steps[step] = url
+
+    def _candidate(self, now):
+        if not self.enabled or not self.data.get("steps"):
+            return None, None
+        if now < self.data.get("paused_until", 0):
+            return None, None
+        if now - self.data.get("saved_at", 0) > SESSION_RESUME_MAX_AGE_MINUTES * 60:
+            return None, None
+        if not Path(STORAGE_STATE).exists():
+            return None, None
+        for step in STEP_ORDER:
+            url = self.data["steps"].get(step)
+            if url:
+                return step, url
+        return None, None
+
+    def resume(self, page):
+        """Open the latest saved step; returns its name, or None to run the full flow."""
+        now = int(time.time())
+        step, url = self._candidate(now)
+        if not step:
+            return None
+
+        log(f"Resuming saved session at the {step} step")
+        try:
+            page.goto(url)
+            settle(page)
+            valid = not is_error_page(page) and page.locator(STEP_MARKERS[step]).count() > 0
+        except Exception as exc:
+            log(f"Session resume failed: {exc}")
+            valid = False
+
+        if valid:
+            if self.data.get("failures"):
+                self.data["failures"] = 0
+                self._write(self.data)
+            return step
+
+        failures = int(self.data.get("failures", 0)) + 1
+        log(f"Saved session is no longer valid ({failures} consecutive failures); running the full flow")
+        data = {"failures": failures}
+        if failures >= MAX_FAILURES:
+            data["paused_until"] = now + FAILURE_BACKOFF_SECONDS
+        self._write(data)
+        self.data = data
+        return None
+
+    def save(self, page):
+        """Persist cookies/storage and the step URLs reached in this run."""
+        if not self.enabled or not self.steps:
+            return
+        try:
+            page.context.storage_state(path=STORAGE_STATE)
+        except Exception as exc:
+            log(f"Failed to save storage state: {exc}")
+            return
+        data = {
+            "saved_at": int(time.time()),
+            "steps": self.steps,
+            "failures": int(self.data.get("failures", 0)),
+            "paused_until": int(self.data.get("paused_until", 0)),
+        }
+        self._write(data)
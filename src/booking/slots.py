@@ -1,112 +1,184 @@
 """Slot discovery and booking helpers."""
+import json
 from datetime import datetime
-from typing import List, Tuple
-
-from playwright.sync_api import Locator
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Tuple
 
 from ..browser import BrowserManager, handle_modal_dialog
-from ..config import ANLIEGEN, SEND_MONITOR_SCREENSHOT
+from ..config import ANLIEGEN, SEND_MONITOR_SCREENSHOT, MONITOR_ENGINE, SLOT_PROBE_STATE_FILE
+from ..metrics import stage, timed
 from ..notifications import log, send_screenshot_notification
+from ..waits import act_and_wait, pause, settle, wait_for_selectors
+from .session import SessionResume, is_error_page
+from ..alerting import confirm_slots
+from .. import events, screenshots
+
+if TYPE_CHECKING:
+    from playwright.sync_api import Locator
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+MODAL_SELECTORS = ['.modal-dialog', '[role="dialog"]', '.modal.in']
+LOCATION_SELECTORS = [
+    'input[type="radio"]',
+    'input[type="checkbox"]',
+    "input[name='select_location']",
+    "button[name='select_location']",
+    "#sugg_accordion",
+]
+CALENDAR_SELECTORS = ["#sugg_accordion"]
+PERSONAL_SELECTORS = ['input[name*="vorname"]', 'input[name*="firstname"]'] + MODAL_SELECTORS
+
+
+# Reads every enabled slot in one evaluate call instead of per-element IPC.
+CALENDAR_SCRIPT = r"""() => {
+    const slots = [];
+    for (const header of document.querySelectorAll('#sugg_accordion > h3')) {
+        const panelId = header.getAttribute('aria-controls');
+        if (!panelId) continue;
+        const panel = document.getElementById(panelId);
+        if (!panel) continue;
+        const date = (header.textContent || '').trim();
+        const buttons = panel.querySelectorAll('button.suggest_btn:not([disabled])');
+        buttons.forEach((button, index) => {
+            const time = (button.textContent || button.getAttribute('title') || '').trim();
+            if (time) slots.push([date, time, panelId, index]);
+        });
+    }
+    return slots;
+}"""
+
+
+def extract_calendar_slots(page) -> List[Tuple[str, str, "Locator"]]:
+    """Parse the booking calendar and return a list of (date, time, button)."""
+    rows = page.evaluate(CALENDAR_SCRIPT)
+    return [
+        (date_text, time_text, page.locator(f"#{panel_id}").locator("button.suggest_btn:not([disabled])").nth(index))
+        for date_text, time_text, panel_id, index in rows
+    ]
+
+
+# Legacy page variants without the accordion: (css, required text). The first
+# entry stands in for the old 'button:not([disabled]):has-text("Uhr")'.
+FALLBACK_SLOT_SELECTORS = [
+    ('button:not([disabled])', 'uhr'),
+    ('button.suggest_btn:not([disabled])', ''),
+    ('a[href*="slot"]:not(.disabled)', ''),
+    ('button.available', ''),
+    ('td.available button', ''),
+    ('.calendar-slot:not(.disabled)', ''),
+    ('button[data-time]:not([disabled])', ''),
+]
+
+# Checks every variant in one evaluate call; per variant it returns the
+# [querySelectorAll index, text] of each visible element that looks like a slot.
+FALLBACK_PROBE_SCRIPT = r"""(variants) => variants.map(([css, needle]) => {
+    const matches = [];
+    let nodes;
+    try {
+        nodes = document.querySelectorAll(css);
+    } catch (e) {
+        return matches;
+    }
+    nodes.forEach((el, index) => {
+        const text = (el.textContent || '').trim();
+        const lower = text.toLowerCase();
+        if (!text || (needle && !lower.includes(needle))) return;
+        if (!lower.includes(':') && !lower.includes('uhr')) return;
+        const style = window.getComputedStyle(el);
+        if (style.visibility === 'hidden' || style.display === 'none' || !el.getClientRects().length) return;
+        matches.push([index, text]);
+    });
+    return matches;
+})"""
+
+
+def _probe_state_path():
+    return ROOT / SLOT_PROBE_STATE_FILE
+
+
+def _preferred_selector():
+    try:
+        return json.loads(_probe_state_path().read_text(encoding="utf-8")).get("selector")
+    except (OSError, ValueError, AttributeError):
+        return None
 
 
-def _extract_slots_from_calendar(page) -> List[Tuple[str, str, Locator]]:
-    """Parse the booking calendar and return a list of (date, time, button)."""
-    slots: List[Tuple[str, str, Locator]] = []
+def _remember_selector(selector):
+    if selector == _preferred_selector():
+        return
+    try:
+        _probe_state_path().write_text(json.dumps({"selector": selector}), encoding="utf-8")
+    except OSError as exc:
+        log(f"Failed to record the matching slot selector: {exc}")
 
-    accordion_headers = page.locator("#sugg_accordion > h3")
-    header_count = accordion_headers.count()
-    if header_count == 0:
-        return slots
 
-    for idx in range(header_count):
-        header = accordion_headers.nth(idx)
-        date_text = (header.text_content() or "").strip()
-        panel_id = header.get_attribute("aria-controls")
-        if not panel_id:
-            continue
-
-        panel = page.locator(f"#{panel_id}")
-        buttons = panel.locator("button.suggest_btn:not([disabled])")
-        button_count = buttons.count()
-
-        for btn_idx in range(button_count):
-            button = buttons.nth(btn_idx)
-            time_text = (button.text_content() or button.get_attribute("title") or "").strip()
-            if not time_text:
-                continue
-            slots.append((date_text, time_text, button))
+def probe_fallback_slots(page):
+    """Probe all fallback variants at once; returns (css, [(index, text), ...]) of the first that matched.
 
-    return slots
+    The variant that matched last time is preferred when several match.
+    """
+    variants = [list(variant) for variant in FALLBACK_SLOT_SELECTORS]
+    results = page.evaluate(FALLBACK_PROBE_SCRIPT, variants)
+    preferred = _preferred_selector()
+    order = sorted(range(len(variants)), key=lambda idx: variants[idx][0] != preferred)
+    for idx in order:
+        if results[idx]:
+            selector = variants[idx][0]
+            _remember_selector(selector)
+            return selector, [(index, text) for index, text in results[idx]]
+    return None, []
 
 
+@timed("calendar")
 def find_and_click_first_slot(page, monitor_only=False):
     """Find and optionally click the first available slot."""
     log("Checking available slots...")
-    page.wait_for_timeout(2000)
+    events.emit("check", engine="browser")
+    pause(page, 2000)
 
     try:
         # Wait for the slot accordion to load
-        page.wait_for_load_state('networkidle')
-        page.wait_for_timeout(3000)
+        _wait_for_calendar(page)
 
-        parsed_slots = _extract_slots_from_calendar(page)
+        parsed_slots = extract_calendar_slots(page)
 
         if parsed_slots:
             formatted_slots = [f"{date} {time}".strip() for date, time, _ in parsed_slots]
 
             if monitor_only:
                 log(f"Found {len(formatted_slots)} available slots: {formatted_slots[:5]}")
+                events.slots_found(formatted_slots)
                 return formatted_slots
 
             # Click the first available slot
             first_date, first_time, first_button = parsed_slots[0]
             slot_label = f"{first_date} {first_time}".strip()
             try:
-                first_button.click()
+                act_and_wait(page, first_button.click, 2000, selectors=PERSONAL_SELECTORS, timeout_ms=2000)
                 log(f"Clicked slot: {slot_label}")
-                page.wait_for_timeout(2000)
                 return True
             except Exception as e:
                 log(f"Error while clicking slot {slot_label}: {e}")
-                page.wait_for_timeout(1000)
+                pause(page, 1000)
                 parsed_slots = []  # continue with fallback logic
 
         if not parsed_slots:
             # Fall back to legacy selectors to cover potential page variants
-            slot_selectors = [
-                'button:not([disabled]):has-text("Uhr")',
-                'button.suggest_btn:not([disabled])',
-                'a[href*="slot"]:not(.disabled)',
-                'button.available',
-                'td.available button',
-                '.calendar-slot:not(.disabled)',
-                'button[data-time]:not([disabled])'
-            ]
-
-            fallback_slots = []
-            for selector in slot_selectors:
-                try:
-                    slots = page.locator(selector).all()
-                    for slot in slots:
-                        if slot.is_visible():
-                            slot_text = slot.text_content() or ""
-                            if slot_text and (":" in slot_text or "uhr" in slot_text.lower()):
-                                slot_label = slot_text.strip()
-                                fallback_slots.append(slot_label)
-                                if not monitor_only:
-                                    slot.click()
-                                    log(f"Clicked slot: {slot_label}")
-                                    page.wait_for_timeout(2000)
-                                    return True
-                    if fallback_slots:
-                        break
-                except Exception as e:
-                    log(f"Error while checking slot selector {selector}: {e}")
-                    continue
-
-            if fallback_slots:
-                log(f"Found {len(fallback_slots)} available slots: {fallback_slots[:5]}")
-                return fallback_slots if monitor_only else True
+            selector, matches = probe_fallback_slots(page)
+            if matches:
+                fallback_slots = [text for _, text in matches]
+                if not monitor_only:
+                    try:
+                        slot = page.locator(selector).nth(matches[0][0])
+                        act_and_wait(page, slot.click, 2000, selectors=PERSONAL_SELECTORS, timeout_ms=2000)
+                        log(f"Clicked slot: {fallback_slots[0]}")
+                        return True
+                    except Exception as e:
+                        log(f"Error while clicking fallback slot {fallback_slots[0]}: {e}")
+                else:
+                    log(f"Found {len(fallback_slots)} available slots: {fallback_slots[:5]}")
+                    events.slots_found(fallback_slots)
+                    return fallback_slots
 
     except Exception as e:
         log(f"Error while discovering slots: {e}")
@@ -119,96 +191,52 @@ def check_availability():
     """Check availability using the simplified legacy flow."""
     from .navigation import goto_start, click_aufenthaltsangelegenheiten
 
-    with BrowserManager(headless=True) as page:
-        try:
-            # Navigate to the start page
-            goto_start(page)
-
-            # Click the Aufenthaltsangelegenheiten entrypoint
-            click_aufenthaltsangelegenheiten(page)
-
-            # Use the simplified legacy logic directly
-            log("Searching for the RWTH option...")
+    if MONITOR_ENGINE == "http":
+        from .http_flow import HttpFlowUnsupported, check_availability_http
 
-            # Wait for the page to load fully
-            page.wait_for_load_state('networkidle')
-            page.wait_for_timeout(2000)
+        try:
+            with stage("http_check"):
+                # Confirms its own detections by replaying the calendar request
+                return check_availability_http()
+        except HttpFlowUnsupported as exc:
+            log(f"HTTP fast path does not match the page ({exc}); falling back to the browser")
+        except Exception as exc:
+            log(f"HTTP fast path failed ({exc}); falling back to the browser")
 
-            # Scroll to the bottom to ensure everything loads
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            page.wait_for_timeout(1000)
+    with BrowserManager(headless=True) as page:
+        try:
+            session = SessionResume()
+            step = session.resume(page)
 
-            target_input = page.locator(f'input[data-tevis-cncname="{ANLIEGEN}"]').first
+            if step is None:
+                # Navigate to the start page
+                goto_start(page)
 
-            if target_input.count() == 0:
-                log(f"Option not found: {ANLIEGEN}")
-                return []
+                # Click the Aufenthaltsangelegenheiten entrypoint
+                click_aufenthaltsangelegenheiten(page)
+                step = "anliegen"
 
-            # Select the option without waiting on hidden inputs.
-            try:
-                if target_input.is_visible():
-                    target_input.fill("1")
-                    log(f"Selected: {ANLIEGEN}")
-                else:
-                    raise RuntimeError("target input is hidden")
-            except Exception:
-                page.evaluate(f"""
-                    const input = document.querySelector('input[data-tevis-cncname="{ANLIEGEN}"]');
-                    if (input) {{
-                        input.value = '1';
-                        input.dispatchEvent(new Event('change', {{ bubbles: true }}));
-                        input.dispatchEvent(new Event('input', {{ bubbles: true }}));
-                    }}
-                """)
-                log(f"Selected via JavaScript: {ANLIEGEN}")
-
-            page.wait_for_timeout(1000)
-
-            # Click the continue button
-            try:
-                weiter_btn = page.get_by_role("button", name="Weiter")
-                weiter_btn.click()
-                log("Successfully clicked the Weiter button")
-                # Some Anliegen show a confirmation modal that must be acknowledged
-                page.wait_for_timeout(800)
-                handled_modal = handle_modal_dialog(page)
-                if handled_modal:
-                    log("Dismissed the Hinweis modal after selecting the Anliegen")
-            except Exception as e:
-                log(f"Failed to click the Weiter button: {e}")
-
-            # Wait for the location page to load
-            page.wait_for_timeout(2000)
-
-            # Simplified location selection - choose the first available option
-            progressed = False
-            try:
-                first_location = page.locator('input[type="radio"], input[type="checkbox"]').first
-                if first_location.count() > 0:
-                    first_location.click()
-                    log("Selected a location")
-                    page.wait_for_timeout(1000)
-
-                    # Continue to the slot calendar
-                    weiter_btn = page.get_by_role("button", name="Weiter")
-                    weiter_btn.click()
-                    log("Clicked the Weiter button on the location page")
-                    progressed = True
-            except Exception as e:
-                log(f"Failed to select a location via radio buttons: {e}")
+            if step == "anliegen":
+                session.mark("anliegen", page.url)
+                if not _monitor_select_anliegen(page):
+                    return []
+                step = "location"
 
-            if not progressed:
-                progressed = _submit_location_form(page)
+            if step == "location":
+                session.mark("location", page.url)
+                progressed = _monitor_select_location(page)
 
-            if _handle_error_page(page):
-                return []
+                if _handle_error_page(page):
+                    return []
 
-            if progressed:
-                page.wait_for_load_state('networkidle')
-                page.wait_for_timeout(2000)
+                if progressed:
+                    settle(page, 2000)
 
             # Check the availability calendar again
+            session.mark("calendar", page.url)
             available_slots = find_and_click_first_slot(page, monitor_only=True)
+            session.save(page)
+            available_slots = confirm_slots(available_slots, lambda: _reread_calendar(page))
             _send_monitor_screenshot(page, available_slots)
             return available_slots if available_slots else []
 
@@ -217,6 +245,118 @@ def check_availability():
             return []
 
 
+@timed("anliegen")
+def _monitor_select_anliegen(page) -> bool:
+    """Set the configured Anliegen to 1 and continue to the location page."""
+    # Use the simplified legacy logic directly
+    log("Searching for the RWTH option...")
+
+    # Wait for the page to load fully
+    settle(page, 2000)
+
+    # Scroll to the bottom to ensure everything loads
+    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+    pause(page, 1000)
+
+    target_input = page.locator(f'input[data-tevis-cncname="{ANLIEGEN}"]').first
+
+    if target_input.count() == 0:
+        log(f"Option not found: {ANLIEGEN}")
+        return False
+
+    # Select the option without waiting on hidden inputs.
+    try:
+        if target_input.is_visible():
+            target_input.fill("1")
+            log(f"Selected: {ANLIEGEN}")
+        else:
+            raise RuntimeError("target input is hidden")
+    except Exception:
+        page.evaluate(f"""
+            const input = document.querySelector('input[data-tevis-cncname="{ANLIEGEN}"]');
+            if (input) {{
+                input.value = '1';
+                input.dispatchEvent(new Event('change', {{ bubbles: true }}));
+                input.dispatchEvent(new Event('input', {{ bubbles: true }}));
+            }}
+        """)
+        log(f"Selected via JavaScript: {ANLIEGEN}")
+
+    pause(page, 1000)
+
+    # Click the continue button
+    try:
+        weiter_btn = page.get_by_role("button", name="Weiter")
+        # Some Anliegen show a confirmation modal that must be acknowledged
+        act_and_wait(page, weiter_btn.click, 800, selectors=MODAL_SELECTORS)
+        log("Successfully clicked the Weiter button")
+        handled_modal = handle_modal_dialog(page)
+        if handled_modal:
+            log("Dismissed the Hinweis modal after selecting the Anliegen")
+    except Exception as e:
+        log(f"Failed to click the Weiter button: {e}")
+
+    # Wait for the location page to load
+    wait_for_selectors(page, LOCATION_SELECTORS, 2000)
+    return True
+
+
+@timed("standort")
+def _monitor_select_location(page) -> bool:
+    """Pick the first location and continue to the calendar; returns whether it progressed."""
+    # Simplified location selection - choose the first available option
+    progressed = False
+    try:
+        first_location = page.locator('input[type="radio"], input[type="checkbox"]').first
+        if first_location.count() > 0:
+            first_location.click()
+            log("Selected a location")
+            pause(page, 1000)
+
+            # Continue to the slot calendar
+            weiter_btn = page.get_by_role("button", name="Weiter")
+            act_and_wait(page, weiter_btn.click, 0, selectors=CALENDAR_SELECTORS)
+            log("Clicked the Weiter button on the location page")
+            progressed = True
+    except Exception as e:
+        log(f"Failed to select a location via radio buttons: {e}")
+
+    if not progressed:
+        progressed = _submit_location_form(page)
+    return progressed
+
+
+def _reread_calendar(page):
+    """Reload the calendar page and read it the way the first read did (accordion, then fallback probe).
+
+    Returns None when the reload did not land on a calendar (error page,
+    redirect to the start page, expired session): only an accordion without
+    slots is a conclusive "no slots".
+    """
+    page.reload(wait_until="domcontentloaded")
+    if is_error_page(page):
+        return None
+    _wait_for_calendar(page)
+    slots = [f"{date} {time}".strip() for date, time, _ in extract_calendar_slots(page)]
+    if slots:
+        return slots
+    _, matches = probe_fallback_slots(page)
+    if matches:
+        return [text for _, text in matches]
+    return [] if page.locator("#sugg_accordion").count() > 0 else None
+
+
+def _wait_for_calendar(page):
+    """Wait until the calendar page has loaded and its accordion is initialised."""
+    settle(page, 3000)
+    try:
+        has_accordion = page.locator("#sugg_accordion").count() > 0
+    except Exception:
+        has_accordion = False
+    if has_accordion:
+        wait_for_selectors(page, ["#sugg_accordion > h3[aria-controls]", "#sugg_accordion.ui-accordion"], 0)
+
+
 def _send_monitor_screenshot(page, slots):
     """Optionally send a screenshot for debugging to confirm calendar access."""
     if not SEND_MONITOR_SCREENSHOT:
@@ -227,9 +367,9 @@ def _send_monitor_screenshot(page, slots):
         timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
         status = f"found {len(slots)} appointments" if slots else "no appointments this run"
         message = f"📸 RWTH monitor screenshot @ {timestamp}: {status}"
-        filename = f"rwth_monitor_{now:%Y%m%d_%H%M%S}.png"
-        image_bytes = page.screenshot(full_page=True)
-        send_screenshot_notification(message, image_bytes, filename=filename)
+        image_bytes, mimetype, extension = screenshots.capture(page, crop_selector="#sugg_accordion")
+        filename = f"rwth_monitor_{now:%Y%m%d_%H%M%S}.{extension}"
+        send_screenshot_notification(message, image_bytes, filename=filename, mimetype=mimetype)
     except Exception as exc:
         log(f"Unable to capture/send screenshot: {exc}")
 
@@ -266,13 +406,17 @@ def _submit_location_form(page) -> bool:
                 pass
 
             try:
-                submit.click()
+                act_and_wait(page, submit.click, 1000, selectors=CALENDAR_SELECTORS)
             except Exception:
                 # Fallback to form submission via JavaScript
-                form.evaluate("(el) => el.requestSubmit ? el.requestSubmit() : el.submit()")
+                act_and_wait(
+                    page,
+                    lambda: form.evaluate("(el) => el.requestSubmit ? el.requestSubmit() : el.submit()"),
+                    1000,
+                    selectors=CALENDAR_SELECTORS,
+                )
 
             log("Submitted Standort form via Weiter button")
-            page.wait_for_timeout(1000)
             return True
 
         log("No visible Standort submit button was clickable")
@@ -284,11 +428,7 @@ def _submit_location_form(page) -> bool:
 
 def _handle_error_page(page) -> bool:
     """Detect the TEVIS error page and log it."""
-    try:
-        error_locator = page.locator("body:has-text('Fehlermeldung: Ungültiger Aufruf')")
-        if error_locator.count() > 0:
-            log("Encountered 'Ungültiger Aufruf' error page; will retry on next run")
-            return True
-    except Exception:
-        pass
+    if is_error_page(page):
+        log("Encountered 'Ungültiger Aufruf' error page; will retry on next run")
+        return True
     return False
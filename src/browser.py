@@ -1,42 +1,92 @@
 """Core browser helpers."""
-import re
 import time
 from pathlib import Path
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
-from .config import STORAGE_STATE
+from . import forensics
+from .config import STORAGE_STATE, BROWSER_SERVER_ENABLED, PRELUDE_GRACE_MS, WAIT_STEP_MAX_MS
+from .route_profile import RouteProfile
+from .metrics import stage
 from .notifications import log
+from .waits import wait_for_hidden
 
 
 class BrowserManager:
     """Browser manager context helper."""
 
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, use_server=None, route_profile=None):
         self.headless = headless
+        self.route_profile_name = route_profile
+        self.route_profile = None
         self.launch_attempts = 3
+        if use_server is None:
+            use_server = BROWSER_SERVER_ENABLED
+        # The shared server always runs headless; headed runs launch their own browser.
+        self.server = None
+        if use_server and headless:
+            from .browser_server import BrowserServer
+            self.server = BrowserServer()
+        self.shared_browser = False
         self.playwright = None
         self.p = None
         self.browser = None
         self.context = None
         self.page = None
 
+    def _connect_or_launch(self):
+        if self.server:
+            leased = False
+            try:
+                endpoint = self.server.ensure(self.p.chromium.executable_path)
+                leased = True
+                browser = self.p.chromium.connect_over_cdp(endpoint, timeout=10000)
+                self.shared_browser = True
+                return browser
+            except Exception as exc:
+                if leased:
+                    self._release_server()
+                brief = str(exc).splitlines()[0] if str(exc) else exc.__class__.__name__
+                log(f"Browser server unavailable, launching a private browser: {brief}")
+
+        self.shared_browser = False
+        return self.p.chromium.launch(
+            headless=self.headless,
+            args=["--disable-gpu"],
+        )
+
+    def _release_server(self):
+        try:
+            self.server.release()
+        except Exception as exc:
+            log(f"Failed to update browser server usage: {exc}")
+
     def __enter__(self):
+        with stage("browser_launch"):
+            return self._enter()
+
+    def _enter(self):
+        # Imported here so modules that only need the page scripts stay cheap to import
+        from playwright.sync_api import sync_playwright
+
         last_exc = None
         for attempt in range(1, self.launch_attempts + 1):
             try:
                 self.playwright = sync_playwright()
                 self.p = self.playwright.__enter__()
-                self.browser = self.p.chromium.launch(
-                    headless=self.headless,
-                    args=["--disable-gpu"],
-                )
+                self.browser = self._connect_or_launch()
 
                 ctx_kwargs = {}
                 if Path(STORAGE_STATE).exists():
                     ctx_kwargs["storage_state"] = STORAGE_STATE
 
                 self.context = self.browser.new_context(**ctx_kwargs)
+                if self.route_profile_name is None:
+                    self.route_profile = RouteProfile.from_name()
+                else:
+                    self.route_profile = RouteProfile.from_name(self.route_profile_name)
+                if self.route_profile:
+                    self.route_profile.apply(self.context)
                 self.page = self.context.new_page()
                 self.page.set_default_timeout(15000)
+                forensics.attach(self.page)
 
                 return self.page
             except Exception as exc:
@@ -56,6 +106,10 @@ class BrowserManager:
         self._cleanup(exc_type, exc_val, exc_tb)
 
     def _cleanup(self, exc_type, exc_val, exc_tb):
+        forensics.detach()
+        if self.route_profile:
+            self.route_profile.report()
+            self.route_profile = None
         if self.context:
             try:
                 self.context.close()
@@ -63,11 +117,15 @@ class BrowserManager:
                 pass
             self.context = None
         if self.browser:
+            # For a shared server this only disconnects; the browser keeps running.
             try:
                 self.browser.close()
             except Exception:
                 pass
             self.browser = None
+        if self.shared_browser:
+            self._release_server()
+            self.shared_browser = False
         self.page = None
         if self.playwright:
             try:
@@ -78,74 +136,164 @@ class BrowserManager:
             self.p = None
 
 
+COOKIE_PATTERN = "Einverstanden|Akzept|Zustimmen|Okay"
+INTRO_PATTERN = "Weiter|Termin|Starten"
+PRELUDE_MARK = "data-termin-prelude"
+
+# Resolves with "cookie" or "intro" as soon as a matching button is visible (and
+# tags it), or "none" once the document has loaded and stayed quiet for graceMs.
+# Intro buttons are ignored once the Anliegen list is already on the page.
+PRELUDE_SCRIPT = r"""([cookiePattern, introPattern, wantIntro, mark, graceMs]) => {
+    const visible = (el) => {
+        const style = window.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none' && el.getClientRects().length > 0;
+    };
+    const label = (el) => (el.innerText || el.value || el.getAttribute('aria-label') || '').trim();
+    const buttons = Array.from(
+        document.querySelectorAll('button, [role="button"], input[type="button"], input[type="submit"]')
+    ).filter(visible);
+    const pick = (kind, pattern) => {
+        const re = new RegExp(pattern, 'i');
+        const el = buttons.find((button) => re.test(label(button)));
+        if (!el) return null;
+        document.querySelectorAll(`[${mark}]`).forEach((old) => old.removeAttribute(mark));
+        el.setAttribute(mark, kind);
+        return kind;
+    };
+
+    const found = pick('cookie', cookiePattern)
+        || (wantIntro && !document.querySelector('input[data-tevis-cncname]') && pick('intro', introPattern));
+    if (found) return found;
+    if (document.readyState !== 'complete') return null;
+    window.__terminPreludeQuietSince = window.__terminPreludeQuietSince || performance.now();
+    return performance.now() - window.__terminPreludeQuietSince >= graceMs ? 'none' : null;
+}"""
+
+
+def handle_prelude(page, intro=True):
+    """Accept the cookie banner and click an intro button, whichever shows up.
+
+    One combined wait reacts to the first known element that appears and
+    returns as soon as the loaded page shows none of them. Returns the
+    handled kinds in order, e.g. ``["cookie", "intro"]``.
+    """
+    handled = []
+    while True:
+        want_intro = intro and "intro" not in handled
+        try:
+            result = page.wait_for_function(
+                PRELUDE_SCRIPT,
+                arg=[COOKIE_PATTERN, INTRO_PATTERN, want_intro, PRELUDE_MARK, PRELUDE_GRACE_MS],
+                polling=100,
+                timeout=WAIT_STEP_MAX_MS,
+            )
+            kind = result.json_value()
+        except Exception:
+            # Timed out or the document was replaced mid-check
+            return handled
+
+        if kind == "none" or kind in handled:
+            return handled
+        try:
+            page.locator(f'[{PRELUDE_MARK}="{kind}"]').first.click(timeout=2500)
+        except Exception as exc:
+            log(f"Failed to click the {kind} button: {exc}")
+            return handled
+        handled.append(kind)
+        if kind == "intro":
+            return handled
+
+
 def accept_cookies(page):
     """Accept site cookies when banners appear."""
-    for pat in ["Einverstanden", "Akzept", "Zustimmen", "Okay"]:
-        try:
-            page.get_by_role("button", name=re.compile(pat, re.I)).click(timeout=2500)
-            return
-        except PWTimeout:
-            continue
+    return bool(handle_prelude(page, intro=False))
+
+
+# Preferred confirmation labels, best first
+CONFIRM_PATTERNS = [
+    "Verstanden", "OK", "Schließen", "Weiter", "Bestätigen",
+    "Ja", "Akzeptieren", "Fortfahren", "Continue"
+]
+MODAL_MARK = "data-termin-modal"
+BUTTON_MARK = "data-termin-modal-button"
+
+# Finds the visible dialog and ranks its buttons by CONFIRM_PATTERNS in one call.
+# The chosen button and its dialog are tagged so Python can click and await them.
+MODAL_SCRIPT = r"""([patterns, modalMark, buttonMark]) => {
+    const visible = (el) => {
+        const style = window.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none' && el.getClientRects().length > 0;
+    };
+    const label = (el) => (el.innerText || el.value || el.textContent || '').trim();
+    const rank = (el) => {
+        const text = label(el).toLowerCase();
+        const idx = patterns.findIndex((pattern) => text.includes(pattern.toLowerCase()));
+        return idx < 0 ? patterns.length : idx;
+    };
+    for (const el of document.querySelectorAll(`[${modalMark}], [${buttonMark}]`)) {
+        el.removeAttribute(modalMark);
+        el.removeAttribute(buttonMark);
+    }
+
+    const controls = 'button, input[type="button"], input[type="submit"]';
+    const dialog = Array.from(document.querySelectorAll('.modal-dialog, [role="dialog"], .modal.in')).find(visible);
+    let candidates;
+    if (dialog) {
+        candidates = Array.from(dialog.querySelectorAll(controls)).filter(visible);
+    } else {
+        // No dialog wrapper: only a visible OK-style button counts as a modal
+        const ok = Array.from(document.querySelectorAll('button#OKButton, button.btn-ok, button'))
+            .filter((el) => visible(el) && (el.matches('#OKButton, .btn-ok') || /\bok\b/i.test(label(el))));
+        if (!ok.length) return null;
+        candidates = Array.from(document.querySelectorAll('button')).filter((el) => visible(el) && rank(el) < patterns.length);
+    }
+
+    if (dialog) dialog.setAttribute(modalMark, '');
+    let best = null;
+    let bestRank = patterns.length + 1;
+    for (const el of candidates) {
+        const r = rank(el);
+        if (r < bestRank) {
+            best = el;
+            bestRank = r;
+        }
+    }
+    if (best) best.setAttribute(buttonMark, '');
+    return {dialog: !!dialog, label: best ? label(best) : null, matched: !!best && bestRank < patterns.length};
+}"""
 
 
 def handle_modal_dialog(page):
     """Handle modal dialogs that block progress."""
-    modal_locators = '.modal-dialog, [role="dialog"], .modal.in'
-    modal = page.locator(modal_locators).first
-    has_modal = False
     try:
-        has_modal = modal.count() > 0 and modal.is_visible(timeout=500)
+        found = page.evaluate(MODAL_SCRIPT, [CONFIRM_PATTERNS, MODAL_MARK, BUTTON_MARK])
     except Exception:
-        has_modal = False
+        # The document may be swapping out mid-navigation
+        found = None
 
-    if not has_modal:
-        # Fallback: look for common OK buttons even if the dialog wrapper is missing
-        try:
-            ok_button = page.locator('button#OKButton, button.btn-ok, button:has-text("OK")').first
-            has_modal = ok_button.is_visible(timeout=500)
-        except Exception:
-            has_modal = False
-
-    if not has_modal:
+    if not found:
         return False
 
     log("Modal dialog detected, attempting to handle it...")
+    dialog_selector = f"[{MODAL_MARK}]" if found["dialog"] else f"[{BUTTON_MARK}]"
 
-    # Try to click through common confirmation buttons
-    confirm_patterns = [
-        "Verstanden", "OK", "Schließen", "Weiter", "Bestätigen",
-        "Ja", "Akzeptieren", "Fortfahren", "Continue"
-    ]
-
-    for pattern in confirm_patterns:
+    if found["label"] is not None:
         try:
-            # First attempt to click via button text
-            button = page.locator(f'button:has-text("{pattern}")').first
-            if button.is_visible(timeout=1000):
-                button.click()
-                log(f"Clicked modal confirmation button: {pattern}")
-                page.wait_for_timeout(1000)
-                return True
-        except Exception:
-            continue
-
-    # Fall back to clicking any button inside the modal
-    try:
-        modal_buttons = page.locator('.modal button, [role="dialog"] button, .dialog button').all()
-        for button in modal_buttons:
-            if button.is_visible():
-                button.click()
+            page.locator(f"[{BUTTON_MARK}]").first.click()
+            if found["matched"]:
+                log(f"Clicked modal confirmation button: {found['label']}")
+            else:
                 log("Clicked a button inside the modal dialog")
-                page.wait_for_timeout(1000)
-                return True
-    except Exception:
-        pass
+            wait_for_hidden(page, dialog_selector, 1000)
+            return True
+        except Exception as exc:
+            log(f"Failed to click the modal button: {exc}")
 
     # Finally, try hitting Escape to dismiss it
     try:
         page.keyboard.press("Escape")
         log("Pressed Escape to dismiss the modal dialog")
-        page.wait_for_timeout(1000)
+        wait_for_hidden(page, dialog_selector, 1000)
         return True
     except Exception:
         pass
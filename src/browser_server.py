@@ -0,0 +1,272 @@
+"""Long-lived local Chromium server shared across monitor runs."""
+import fcntl
+import json
+import os
+import signal
+import subprocess
+import time
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+
+from .config import (
+    BROWSER_SERVER_PORT,
+    BROWSER_SERVER_MAX_USES,
+    BROWSER_SERVER_MAX_RSS_MB,
+    BROWSER_SERVER_STATE_FILE,
+    BROWSER_SERVER_PROFILE_DIR,
+)
+from .notifications import log
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _exited(pid, block=False):
+    """True once ``pid`` is gone; reaps it when this process launched it.
+
+    A child that exited stays a zombie until it is waited for, and
+    ``os.kill(pid, 0)`` keeps succeeding on a zombie.
+    """
+    try:
+        done, _ = os.waitpid(pid, 0 if block else os.WNOHANG)
+        return done == pid
+    except ChildProcessError:
+        pass  # started by another process
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    return False
+
+
+def _process_tree_rss_kb(root_pid):
+    """Sum VmRSS over a process and all of its descendants (Linux /proc only)."""
+    children = {}
+    rss = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            status = (entry / "status").read_text()
+        except OSError:
+            continue
+        pid = int(entry.name)
+        fields = dict(
+            line.split(":", 1) for line in status.splitlines() if ":" in line
+        )
+        ppid = int(fields.get("PPid", "0").strip() or 0)
+        children.setdefault(ppid, []).append(pid)
+        rss_text = fields.get("VmRSS", "0 kB").strip().split()[0]
+        rss[pid] = int(rss_text) if rss_text.isdigit() else 0
+
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+class BrowserServer:
+    """Start, health-check and recycle a headless Chromium reachable over CDP."""
+
+    def __init__(
+        self,
+        port=BROWSER_SERVER_PORT,
+        max_uses=BROWSER_SERVER_MAX_USES,
+        max_rss_mb=BROWSER_SERVER_MAX_RSS_MB,
+        state_path=None,
+        profile_dir=None,
+    ):
+        self.port = port
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.state_path = Path(state_path) if state_path else ROOT / BROWSER_SERVER_STATE_FILE
+        self.profile_dir = Path(profile_dir) if profile_dir else ROOT / BROWSER_SERVER_PROFILE_DIR
+        self.lock_path = self.state_path.with_name(self.state_path.name + ".lock")
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _load_state(self):
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        try:
+            self.state_path.write_text(json.dumps(state), encoding="utf-8")
+        except OSError as exc:
+            log(f"Failed to write browser server state: {exc}")
+
+    def is_healthy(self):
+        """Return True when the DevTools endpoint answers."""
+        try:
+            with urllib.request.urlopen(f"{self.endpoint}/json/version", timeout=2) as resp:
+                return resp.status == 200 and bool(json.loads(resp.read()).get("Browser"))
+        except Exception:
+            return False
+
+    def rss_mb(self, state=None):
+        state = state if state is not None else self._load_state()
+        pid = state.get("pid")
+        if not pid:
+            return 0
+        try:
+            return _process_tree_rss_kb(int(pid)) // 1024
+        except OSError:
+            return 0
+
+    def _live_leases(self, state):
+        """Leases of runs still connected, as {pid: count}; leases of dead processes are dropped."""
+        leases = {}
+        for pid, count in (state.get("leases") or {}).items():
+            try:
+                os.kill(int(pid), 0)
+            except (ProcessLookupError, ValueError):
+                continue
+            except PermissionError:
+                pass  # alive, owned by another user
+            leases[pid] = int(count)
+        return leases
+
+    def _acquire(self, state):
+        key = str(os.getpid())
+        leases = self._live_leases(state)
+        leases[key] = leases.get(key, 0) + 1
+        state["leases"] = leases
+        self._save_state(state)
+
+    def _is_server_process(self, pid):
+        """True when ``pid`` is still the Chromium started for this port and profile (not a reused pid)."""
+        try:
+            args = Path(f"/proc/{pid}/cmdline").read_bytes().split(b"\0")
+        except OSError:
+            return False
+        expected = {
+            f"--remote-debugging-port={self.port}".encode(),
+            f"--user-data-dir={self.profile_dir}".encode(),
+        }
+        return expected.issubset(args)
+
+    def _recycle_reason(self, state):
+        uses = int(state.get("uses", 0))
+        if uses >= self.max_uses:
+            return f"reached {uses} uses"
+        if self.max_rss_mb:
+            rss = self.rss_mb(state)
+            if rss >= self.max_rss_mb:
+                return f"memory grew to {rss} MB"
+        return ""
+
+    def ensure(self, executable_path):
+        """Lease a CDP endpoint of a healthy server, starting or recycling as needed.
+
+        A server due for recycling is only replaced while no other run holds
+        a lease on it; every successful call must be paired with release().
+        """
+        with self._locked():
+            state = self._load_state()
+            if state.get("pid") and self.is_healthy():
+                reason = self._recycle_reason(state)
+                leases = self._live_leases(state)
+                if reason and leases:
+                    log(f"Browser server is due for recycling ({reason}) but still used by {len(leases)} run(s)")
+                if not reason or leases:
+                    self._acquire(state)
+                    return self.endpoint
+                log(f"Recycling browser server ({reason})")
+            self._stop(state)
+            self._start(executable_path)
+            self._acquire(self._load_state())
+            return self.endpoint
+
+    def release(self):
+        """Return this run's lease and count the use; recycling happens in a later ensure()."""
+        with self._locked():
+            state = self._load_state()
+            if not state.get("pid"):
+                return
+            state["uses"] = int(state.get("uses", 0)) + 1
+            key = str(os.getpid())
+            leases = self._live_leases(state)
+            if leases.get(key, 0) > 1:
+                leases[key] -= 1
+            else:
+                leases.pop(key, None)
+            state["leases"] = leases
+            self._save_state(state)
+
+    def stop(self):
+        with self._locked():
+            self._stop(self._load_state())
+
+    def _start(self, executable_path):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        cmd = [
+            executable_path,
+            "--headless=new",
+            "--disable-gpu",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--remote-debugging-address=127.0.0.1",
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={self.profile_dir}",
+            "about:blank",
+        ]
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Browser server exited early with code {proc.returncode}")
+            if self.is_healthy():
+                self._save_state({"pid": proc.pid, "port": self.port, "uses": 0, "started_at": int(time.time())})
+                log(f"Started browser server (pid {proc.pid}) on port {self.port}")
+                return
+            time.sleep(0.2)
+
+        self._stop({"pid": proc.pid})
+        raise RuntimeError("Browser server did not become healthy in time")
+
+    def _stop(self, state):
+        pid = state.get("pid")
+        if pid and not self._is_server_process(int(pid)):
+            # The state file outlived the browser; the pid may belong to another process now.
+            # Only reap it in case it is our own exited child.
+            _exited(int(pid))
+            pid = None
+        if pid:
+            pid = int(pid)
+            try:
+                os.killpg(pid, signal.SIGTERM)
+                for _ in range(25):
+                    if _exited(pid):
+                        break
+                    time.sleep(0.2)
+                else:
+                    os.killpg(pid, signal.SIGKILL)
+                    _exited(pid, block=True)
+            except (ProcessLookupError, PermissionError):
+                pass
+        try:
+            self.state_path.unlink()
+        except FileNotFoundError:
+            pass
@@ -39,3 +39,103 @@ DATE_OF_BIRTH = os.getenv("APPLICANT_DOB", "")
 MATRIX_HOMESERVER = os.getenv("MATRIX_HOMESERVER", "")
 MATRIX_ACCESS_TOKEN = os.getenv("MATRIX_ACCESS_TOKEN", "")
 MATRIX_ROOM_ID = os.getenv("MATRIX_ROOM_ID", "")
+
+
+def _get_bool(name, default):
+    return os.getenv(name, default).lower() == "true"
+
+
+def _get_int(name, default, minimum=None):
+    try:
+        value = int(os.getenv(name, str(default)))
+    except ValueError:
+        value = default
+    if minimum is not None:
+        value = max(minimum, value)
+    return value
+
+
+# Shared browser server configuration (reused across monitor runs)
+BROWSER_SERVER_ENABLED = _get_bool("BROWSER_SERVER_ENABLED", "false")
+BROWSER_SERVER_PORT = _get_int("BROWSER_SERVER_PORT", 9333)
+BROWSER_SERVER_MAX_USES = _get_int("BROWSER_SERVER_MAX_USES", 200, minimum=1)
+BROWSER_SERVER_MAX_RSS_MB = _get_int("BROWSER_SERVER_MAX_RSS_MB", 600, minimum=0)
+BROWSER_SERVER_STATE_FILE = os.getenv("BROWSER_SERVER_STATE_FILE", ".browser_server.json")
+BROWSER_SERVER_PROFILE_DIR = os.getenv("BROWSER_SERVER_PROFILE_DIR", ".browser_server_profile")
+
+# Monitor engine: "browser" drives Chromium, "http" replays the TEVIS form posts
+# directly and falls back to the browser when the page shape is unexpected.
+MONITOR_ENGINE = os.getenv("MONITOR_ENGINE", "browser").strip().lower()
+HTTP_TIMEOUT_SECONDS = _get_int("HTTP_TIMEOUT_SECONDS", 15, minimum=1)
+
+# Wait strategy: "event" waits on concrete page conditions, "legacy" keeps the
+# original fixed sleeps as a fallback.
+WAIT_MODE = os.getenv("WAIT_MODE", "event").strip().lower()
+WAIT_STEP_MAX_MS = _get_int("WAIT_STEP_MAX_MS", 10000, minimum=500)
+
+# Request routing profile for browser contexts: "off" (default), "lean" or "strict"
+ROUTE_PROFILE = os.getenv("ROUTE_PROFILE", "off").strip().lower()
+ROUTE_BLOCK_LOG = os.getenv("ROUTE_BLOCK_LOG", "")
+
+# Multi-target monitoring: "Anliegen|Standort" pairs separated by ";"
+MONITOR_TARGETS = os.getenv("MONITOR_TARGETS", "")
+MONITOR_CONCURRENCY = _get_int("MONITOR_CONCURRENCY", 2, minimum=1)
+MONITOR_TARGETS_STATE_FILE = os.getenv("MONITOR_TARGETS_STATE_FILE", ".monitor_targets_state.json")
+
+# Session resume: reuse saved cookies and the last step URLs to skip the prelude
+SESSION_RESUME = _get_bool("SESSION_RESUME", "true")
+SESSION_RESUME_FILE = os.getenv("SESSION_RESUME_FILE", ".session_resume.json")
+SESSION_RESUME_MAX_AGE_MINUTES = _get_int("SESSION_RESUME_MAX_AGE_MINUTES", 30, minimum=1)
+
+# Adaptive polling scheduler driven by stats/slot_detection_stats.json
+SCHEDULER_DAILY_BUDGET = _get_int("SCHEDULER_DAILY_BUDGET", 288, minimum=1)
+SCHEDULER_MIN_INTERVAL_SECONDS = _get_int("SCHEDULER_MIN_INTERVAL_SECONDS", 30, minimum=10)
+SCHEDULER_MAX_INTERVAL_SECONDS = _get_int("SCHEDULER_MAX_INTERVAL_SECONDS", 1800, minimum=60)
+SCHEDULER_STATE_FILE = os.getenv("SCHEDULER_STATE_FILE", ".scheduler_state.json")
+
+# In-run confirmation: re-read the calendar this many times before alerting
+ALERT_CONFIRM_RECHECKS = _get_int("ALERT_CONFIRM_RECHECKS", 0, minimum=0)
+ALERT_CONFIRM_DELAY_SECONDS = _get_int("ALERT_CONFIRM_DELAY_SECONDS", 3, minimum=0)
+
+# Metrics export (OpenMetrics text): textfile path and/or local HTTP port (0 disables)
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+METRICS_PORT = _get_int("METRICS_PORT", 0, minimum=0)
+METRICS_STATE_FILE = os.getenv("METRICS_STATE_FILE", "stats/metrics_state.json")
+
+# Race-to-book: keep a session parked on the calendar and book on first sight
+RACE_POLL_SECONDS = _get_int("RACE_POLL_SECONDS", 20, minimum=2)
+RACE_MAX_MINUTES = _get_int("RACE_MAX_MINUTES", 60, minimum=1)
+
+# Fallback slot probe: remembers which legacy selector variant matched last
+SLOT_PROBE_STATE_FILE = os.getenv("SLOT_PROBE_STATE_FILE", ".slot_probe.json")
+
+# Prelude (cookie banner / intro button): how long a loaded page must stay quiet
+PRELUDE_GRACE_MS = _get_int("PRELUDE_GRACE_MS", 300, minimum=0)
+
+# Forensic captures on stage failure (screenshot, HTML, step history) in a size-bounded ring
+FORENSICS_ENABLED = _get_bool("FORENSICS_ENABLED", "true")
+FORENSICS_DIR = os.getenv("FORENSICS_DIR", "forensics")
+FORENSICS_MAX_CAPTURES = _get_int("FORENSICS_MAX_CAPTURES", 20, minimum=1)
+FORENSICS_MAX_MB = _get_int("FORENSICS_MAX_MB", 50, minimum=1)
+FORENSICS_SNAPSHOTS = _get_int("FORENSICS_SNAPSHOTS", 3, minimum=0)
+
+# Monitor screenshots: "calendar" crops to the slot accordion, "page" keeps the
+# full page; JPEG is re-encoded at the given quality and wide images downscaled.
+MONITOR_SCREENSHOT_SCOPE = os.getenv("MONITOR_SCREENSHOT_SCOPE", "calendar").strip().lower()
+MONITOR_SCREENSHOT_FORMAT = os.getenv("MONITOR_SCREENSHOT_FORMAT", "jpeg").strip().lower()
+MONITOR_SCREENSHOT_QUALITY = min(100, _get_int("MONITOR_SCREENSHOT_QUALITY", 70, minimum=1))
+MONITOR_SCREENSHOT_MAX_WIDTH = _get_int("MONITOR_SCREENSHOT_MAX_WIDTH", 1000, minimum=0)
+
+# Notification outbox: messages are spooled to disk and delivered by a background drainer
+OUTBOX_ENABLED = _get_bool("OUTBOX_ENABLED", "true")
+OUTBOX_DIR = os.getenv("OUTBOX_DIR", "outbox")
+OUTBOX_COALESCE_SECONDS = _get_int("OUTBOX_COALESCE_SECONDS", 5, minimum=0)
+OUTBOX_EXIT_TIMEOUT_SECONDS = _get_int("OUTBOX_EXIT_TIMEOUT_SECONDS", 20, minimum=0)
+OUTBOX_MAX_AGE_HOURS = _get_int("OUTBOX_MAX_AGE_HOURS", 24, minimum=1)
+
+# Structured event stream: one JSON object per run, stage, check, detection, alert and error
+EVENTS_ENABLED = _get_bool("EVENTS_ENABLED", "true")
+EVENTS_FILE = os.getenv("EVENTS_FILE", "events.jsonl")
+
+# Long-term detection statistics (SQLite); the legacy JSON file is imported once
+STATS_DB_FILE = os.getenv("STATS_DB_FILE", "stats/slot_detection_stats.db")
@@ -0,0 +1,182 @@
+"""Typed, append-only JSONL event stream.
+
+Every record is one line ``{"ts": <epoch>, "run": <id>, "kind": <kind>, ...}``:
+
+- ``run_start`` / ``run_end``: ``mode``; the end also has ``outcome`` and ``seconds``
+- ``stage``: ``stage``, ``outcome`` and ``seconds`` of every metrics stage
+- ``check``: an availability check started (``engine`` is "browser" or "http")
+- ``slots``: slots were found (``count``, ``first`` and a short ``preview``)
+- ``alert``: the alert decision (``sent``, ``reason``, optional ``target``)
+- ``error``: an error notification (``stage``, ``message``, ``detail``)
+
+Lines are written with a single ``O_APPEND`` write, so concurrent runs do
+not interleave. Readers skip lines that do not parse (e.g. a torn write).
+Because the file is append-only, it is ordered by time up to a few seconds
+between concurrent runs; a reader that asks for a time window seeks to its
+start by bisecting the byte offsets and stops once it is past the end.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from .config import EVENTS_ENABLED, EVENTS_FILE
+from .metrics import add_listener
+
+ROOT = Path(__file__).resolve().parent.parent
+RUN_ID = uuid.uuid4().hex[:12]
+PREVIEW_SLOTS = 5
+# How far out of order concurrent writers can append, and when bisection stops
+ORDER_SLACK_SECONDS = 300
+SEEK_MIN_BYTES = 64 * 1024
+
+_local = threading.local()
+
+
+def events_path():
+    return ROOT / EVENTS_FILE
+
+
+def emit(kind, **fields):
+    """Append one event; failures are swallowed so the stream never breaks a run."""
+    if not EVENTS_ENABLED:
+        return
+    record = {"ts": round(time.time(), 3), "run": RUN_ID, "kind": kind}
+    record.update(fields)
+    line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+    try:
+        fd = os.open(events_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def slots_found(slots, **fields):
+    """Record a detection from a list of slot labels."""
+    slots = list(slots)
+    emit("slots", count=len(slots), first=slots[0] if slots else None, preview=slots[:PREVIEW_SLOTS], **fields)
+
+
+def current_stage():
+    """Innermost open stage of this thread, or None."""
+    stack = getattr(_local, "stages", None)
+    return stack[-1] if stack else None
+
+
+def _on_stage(event, name, outcome, seconds):
+    stack = getattr(_local, "stages", None)
+    if stack is None:
+        stack = _local.stages = []
+    if event == "start":
+        stack.append(name)
+        return
+    if stack:
+        stack.pop()
+    emit("stage", stage=name, outcome=outcome, seconds=round(seconds or 0.0, 3))
+
+
+@contextmanager
+def run(mode):
+    """Bracket a process run with run_start/run_end events."""
+    started = time.monotonic()
+    emit("run_start", mode=mode)
+    outcome = "success"
+    try:
+        yield
+    except SystemExit as exc:
+        outcome = "success" if exc.code in (None, 0) else "error"
+        raise
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        emit("run_end", mode=mode, outcome=outcome, seconds=round(time.monotonic() - started, 3))
+
+
+def _line_time(line):
+    try:
+        return float(json.loads(line)["ts"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _seek(handle, since):
+    """Byte offset at or before the first line with ``ts >= since - ORDER_SLACK_SECONDS``."""
+    target = since - ORDER_SLACK_SECONDS
+    low, high = 0, handle.seek(0, os.SEEK_END)
+    while high - low > SEEK_MIN_BYTES:
+        middle = (low + high) // 2
+        handle.seek(middle)
+        handle.readline()  # partial line
+        ts = None
+        while ts is None and handle.tell() < high:
+            ts = _line_time(handle.readline())
+        if ts is not None and ts < target:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def read_events(path=None, kinds=None, since=None, until=None):
+    """Yield event dicts in file order, optionally limited to ``kinds`` and ``since <= ts < until``."""
+    path = Path(path) if path else events_path()
+    markers = [f'"kind": "{kind}"'.encode() for kind in kinds] if kinds is not None else None
+    try:
+        handle = path.open("rb")
+    except FileNotFoundError:
+        return
+    with handle:
+        if since is not None:
+            offset = _seek(handle, since)
+            handle.seek(offset)
+            if offset:
+                handle.readline()
+        for line in handle:
+            # Substring test before parsing: most lines are stage records nobody asked for
+            if markers is not None and not any(marker in line for marker in markers):
+                continue
+            try:
+                record = json.loads(line)
+                ts = float(record["ts"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            if until is not None and ts >= until:
+                if ts >= until + ORDER_SLACK_SECONDS:
+                    return
+                continue
+            if since is not None and ts < since:
+                continue
+            if kinds is not None and record.get("kind") not in kinds:
+                continue
+            yield record
+
+
+def first_event_time(path=None):
+    """Timestamp of the oldest event, i.e. from when on the stream is authoritative."""
+    for record in read_events(path):
+        return float(record["ts"])
+    return None
+
+
+def describe(record):
+    """Human-readable one-liner for summaries."""
+    kind = record.get("kind")
+    if kind == "slots":
+        return f"Found {record.get('count', 0)} available slots: {record.get('preview') or []}"
+    if kind == "error":
+        where = f" [{record['stage']}]" if record.get("stage") else ""
+        detail = f" ({record['detail']})" if record.get("detail") else ""
+        return f"🚨{where} {record.get('message', '')}{detail}"
+    if kind == "alert":
+        return f"Alert {'sent' if record.get('sent') else 'suppressed'}: {record.get('reason', '')}"
+    return kind or ""
+
+
+add_listener(_on_stage)
@@ -0,0 +1,145 @@
+"""Failure-triggered forensic captures.
+
+Every stage start/end is appended to an in-memory step history, and the
+stage and URL of the last few successful stages are kept in a small ring;
+the success path never reads the DOM. Nothing touches the disk until a stage
+fails: then a screenshot, the current HTML and the step history are written
+to a timestamped directory under ``FORENSICS_DIR``, whose oldest captures
+are evicted once the count or size limit is exceeded.
+"""
+import json
+import re
+import shutil
+import time
+from collections import deque
+from pathlib import Path
+
+from .config import (
+    FORENSICS_ENABLED,
+    FORENSICS_DIR,
+    FORENSICS_MAX_CAPTURES,
+    FORENSICS_MAX_MB,
+    FORENSICS_SNAPSHOTS,
+)
+from .metrics import add_listener
+from .notifications import log
+
+ROOT = Path(__file__).resolve().parent.parent
+HISTORY_SIZE = 50
+# A miss in these stages is the normal "no slots" outcome, not a failure
+BENIGN_MISSES = {"calendar", "check", "http_check"}
+# Failures that say nothing about the page
+IGNORED_STAGES = {"matrix_send"}
+
+_page = None
+_history = deque(maxlen=HISTORY_SIZE)
+_snapshots = deque(maxlen=FORENSICS_SNAPSHOTS)
+_open_stages = []
+_last_capture = 0.0
+
+
+def attach(page):
+    """Observe ``page`` for DOM snapshots and failure captures."""
+    global _page
+    _page = page
+
+
+def detach():
+    global _page
+    _page = None
+
+
+def _page_url():
+    try:
+        return _page.url if _page is not None else ""
+    except Exception:
+        return ""
+
+
+def _on_stage(event, name, outcome, seconds):
+    if name in IGNORED_STAGES:
+        # Also keeps the outbox drainer thread out of the stage stack
+        return
+    now = time.time()
+    if event == "start":
+        _open_stages.append(now)
+        _history.append({"ts": now, "stage": name, "event": "start", "url": _page_url()})
+        return
+
+    started = _open_stages.pop() if _open_stages else now
+    _history.append(
+        {
+            "ts": now,
+            "stage": name,
+            "event": "end",
+            "outcome": outcome,
+            "seconds": round(seconds or 0.0, 3),
+            "url": _page_url(),
+        }
+    )
+    if outcome == "success":
+        _snapshot(name)
+    elif outcome == "error" or name not in BENIGN_MISSES:
+        # An inner stage that already captured this failure covers the outer ones
+        if _last_capture < started:
+            capture(name)
+
+
+def _snapshot(name):
+    if _page is None or not FORENSICS_ENABLED or FORENSICS_SNAPSHOTS == 0:
+        return
+    _snapshots.append({"stage": name, "url": _page_url()})
+
+
+def _ring_dir():
+    return ROOT / FORENSICS_DIR
+
+
+def _evict(ring):
+    captures = sorted(path for path in ring.iterdir() if path.is_dir())
+    sizes = {path: sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) for path in captures}
+    total = sum(sizes.values())
+    limit = FORENSICS_MAX_MB * 1024 * 1024
+    while captures and (len(captures) > FORENSICS_MAX_CAPTURES or total > limit):
+        oldest = captures.pop(0)
+        total -= sizes[oldest]
+        shutil.rmtree(oldest, ignore_errors=True)
+
+
+def capture(reason, page=None):
+    """Write screenshot, HTML and step history for ``reason``; returns the capture directory."""
+    global _last_capture
+    if not FORENSICS_ENABLED:
+        return None
+    page = page if page is not None else _page
+    _last_capture = time.time()
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", reason)[:40]
+    target = _ring_dir() / f"{time.strftime('%Y%m%d_%H%M%S')}_{int(_last_capture * 1000) % 1000:03d}_{slug}"
+    try:
+        target.mkdir(parents=True, exist_ok=True)
+        if page is not None:
+            try:
+                page.screenshot(path=str(target / "screenshot.png"), full_page=True)
+            except Exception as exc:
+                log(f"Forensic screenshot failed: {exc}")
+            try:
+                (target / "page.html").write_text(page.content(), encoding="utf-8")
+            except Exception:
+                pass
+        meta = {
+            "reason": reason,
+            "url": page.url if page is not None else "",
+            "captured_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "snapshots": list(_snapshots),
+            "steps": list(_history),
+        }
+        (target / "steps.json").write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
+        _evict(_ring_dir())
+        log(f"Saved forensic capture: {target}")
+        return target
+    except OSError as exc:
+        log(f"Failed to write forensic capture: {exc}")
+        return None
+
+
+add_listener(_on_stage)
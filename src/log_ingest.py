@@ -0,0 +1,192 @@
+"""Incremental cron.log ingestion into per-day spool files.
+
+Each run reads only the bytes appended since the previous run and appends
+the parsed lines to ``stats/log_days/<YYYY-MM-DD>.log`` (display time zone),
+so summarizing one day reads one day of lines. Per file the checkpoint keeps
+the device/inode, size, byte offset and a hash of the first bytes:
+
+- a renamed file (rotation) is recognized by its inode and continues at its offset
+- a truncated or rewritten file (copytruncate, ``cleanup_logs.py``) and new
+  files, including compressed rotations, are read from the start, keeping
+  only lines newer than the timestamp watermark of the previous run
+- a partial last line is left for the next run
+- the spool sizes are recorded before appending; a run that crashed before
+  saving its checkpoint is rolled back by truncating the spools, so its
+  lines are spooled exactly once when they are read again
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from .timezone_utils import DISPLAY_TZ, to_display_timezone
+
+ROOT = Path(__file__).resolve().parent.parent
+LOG_DIR = ROOT
+LOG_PATTERN = re.compile(r"^cron\.log(\..+)?$")
+STATS_DIR = ROOT / "stats"
+SPOOL_DIR = STATS_DIR / "log_days"
+CHECKPOINT_PATH = STATS_DIR / "log_ingest.json"
+LOCK_PATH = STATS_DIR / ".log_ingest.lock"
+TS_PATTERN = re.compile(rb"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]")
+HEAD_BYTES = 256
+# Matches the retention of cleanup_logs.py
+SPOOL_RETENTION_DAYS = 14
+
+
+def day_spool(day: date) -> Path:
+    return SPOOL_DIR / f"{day.isoformat()}.log"
+
+
+def _log_paths():
+    paths = [path for path in LOG_DIR.glob("cron.log*") if LOG_PATTERN.match(path.name)]
+    return sorted(paths, key=lambda path: path.stat().st_mtime)
+
+
+def _load_checkpoint():
+    try:
+        state = json.loads(CHECKPOINT_PATH.read_text(encoding="utf-8"))
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_checkpoint(state):
+    tmp = CHECKPOINT_PATH.with_name(CHECKPOINT_PATH.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, CHECKPOINT_PATH)
+
+
+def _head_hash(path, length):
+    with open(path, "rb") as handle:
+        return hashlib.sha1(handle.read(length)).hexdigest()
+
+
+class _Spool:
+    """Buffers new lines per display-timezone day."""
+
+    def __init__(self):
+        self.days = {}
+        self._minute_days = {}
+        self.latest = ""
+
+    def add(self, line, watermark=None):
+        match = TS_PATTERN.match(line)
+        if not match:
+            return
+        ts = match.group(1).decode("ascii")
+        # "YYYY-MM-DD HH:MM:SS" sorts chronologically as text
+        if watermark is not None and ts <= watermark:
+            return
+        minute = ts[:16]
+        day = self._minute_days.get(minute)
+        if day is None:
+            local = datetime.strptime(minute, "%Y-%m-%d %H:%M")
+            day = self._minute_days[minute] = to_display_timezone(local).date().isoformat()
+        self.days.setdefault(day, []).append(line if line.endswith(b"\n") else line + b"\n")
+        self.latest = max(self.latest, ts)
+
+    def sizes(self):
+        sizes = {}
+        for day in self.days:
+            try:
+                sizes[day] = (SPOOL_DIR / f"{day}.log").stat().st_size
+            except FileNotFoundError:
+                sizes[day] = 0
+        return sizes
+
+    def flush(self):
+        SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+        for day, lines in self.days.items():
+            with open(SPOOL_DIR / f"{day}.log", "ab") as handle:
+                handle.write(b"".join(lines))
+        return sum(len(lines) for lines in self.days.values())
+
+
+def _read_plain(path, offset, spool, watermark):
+    """Spool complete lines after ``offset``; returns the new offset."""
+    with open(path, "rb") as handle:
+        handle.seek(offset)
+        data = handle.read()
+    end = data.rfind(b"\n") + 1
+    for line in data[:end].splitlines(keepends=True):
+        spool.add(line, watermark)
+    return offset + end
+
+
+def _read_gzip(path, spool, watermark):
+    with gzip.open(path, "rb") as handle:
+        for line in handle:
+            spool.add(line, watermark)
+
+
+def _rollback(pending):
+    """Truncate the spools a crashed run appended to back to their recorded sizes."""
+    for day, size in (pending or {}).items():
+        path = SPOOL_DIR / f"{day}.log"
+        try:
+            if path.stat().st_size > size:
+                os.truncate(path, size)
+        except FileNotFoundError:
+            continue
+
+
+def _prune_spools(today):
+    cutoff = (today - timedelta(days=SPOOL_RETENTION_DAYS)).isoformat()
+    for path in SPOOL_DIR.glob("*.log"):
+        if path.stem < cutoff:
+            path.unlink(missing_ok=True)
+
+
+def ingest() -> int:
+    """Spool the cron.log lines not seen by earlier runs; returns how many were added."""
+    STATS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_PATH, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = _load_checkpoint()
+        _rollback(state.pop("pending", None))
+        known = state.get("files", {})
+        watermark = state.get("watermark") or None
+        spool = _Spool()
+        files = {}
+
+        for path in _log_paths():
+            try:
+                stat = path.stat()
+                key = f"{stat.st_dev}:{stat.st_ino}"
+                previous = known.get(key)
+                if path.suffix == ".gz":
+                    if not (previous and previous.get("size") == stat.st_size):
+                        _read_gzip(path, spool, watermark)
+                    files[key] = {"name": path.name, "size": stat.st_size, "offset": stat.st_size}
+                    continue
+
+                offset = 0
+                file_watermark = watermark
+                if previous and stat.st_size >= previous.get("offset", 0):
+                    length = min(HEAD_BYTES, previous.get("offset", 0))
+                    if _head_hash(path, length) == previous.get("head"):
+                        # Same file, only appended to: everything after the offset is new
+                        offset = previous["offset"]
+                        file_watermark = None
+                offset = _read_plain(path, offset, spool, file_watermark)
+                files[key] = {
+                    "name": path.name,
+                    "size": stat.st_size,
+                    "offset": offset,
+                    "head": _head_hash(path, min(HEAD_BYTES, offset)),
+                }
+            except FileNotFoundError:
+                continue
+
+        if spool.days:
+            # Write-ahead: the next run undoes this append unless the checkpoint below is saved
+            _save_checkpoint(dict(state, pending=spool.sizes()))
+        added = spool.flush()
+        _save_checkpoint({"files": files, "watermark": max(watermark or "", spool.latest)})
+        _prune_spools(datetime.now(DISPLAY_TZ).date())
+    return added
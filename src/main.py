@@ -1,31 +1,35 @@
-"""Main entry module."""
+"""Main entry module.
+
+Browser and booking modules are imported inside the modes that use them, so
+gate-only invocations (``--monitor-adaptive`` when no check is due,
+``--schedule``) start without loading Playwright.
+"""
 import sys
 from pathlib import Path
-
-from .browser import BrowserManager
-import json
 import time
-from datetime import datetime, timezone
 
+from .alerting import decide_alert, load_state, save_state
 from .config import (
     AUTO_BOOK,
     LOCK_FILE,
     ANLIEGEN,
     STANDORT,
     MONITOR_STATE_FILE,
-    ALERT_CHANGE_ONLY,
-    ALERT_MIN_INTERVAL_MINUTES,
-    ALERT_MIN_CONSECUTIVE_DETECTIONS,
+    OUTBOX_ENABLED,
 )
+from . import events, metrics, outbox
 from .notifications import log, send_error_notification, send_success_notification
-from .booking.navigation import goto_start, click_aufenthaltsangelegenheiten
-from .booking.selection import select_anliegen, select_standort
-from .booking.slots import find_and_click_first_slot, check_availability
-from .booking.forms import proceed_until_personal, fill_personal_data, solve_captcha_human_in_loop
 
 
 def run_once(headless=True):
     """Execute the full booking workflow."""
+    from .browser import BrowserManager
+    from .waits import act_and_wait
+    from .booking.navigation import goto_start, click_aufenthaltsangelegenheiten
+    from .booking.selection import select_anliegen, select_standort
+    from .booking.slots import find_and_click_first_slot
+    from .booking.forms import proceed_until_personal, fill_personal_data, solve_captcha_human_in_loop
+
     try:
         with BrowserManager(headless=headless) as page:
             # Navigate to the start page
@@ -73,8 +77,7 @@ def run_once(headless=True):
             try:
                 submit_button = page.get_by_role("button", name="Buchen")
                 if submit_button.is_visible(timeout=5000):
-                    submit_button.click()
-                    page.wait_for_timeout(3000)
+                    act_and_wait(page, submit_button.click, 3000)
 
                     # Create the lock file to prevent duplicate bookings
                     Path(LOCK_FILE).touch()
@@ -98,105 +101,99 @@ def run_once(headless=True):
 
 def monitor_mode():
     """Monitor mode with alert throttling and persistence-aware detection."""
+    from .booking.slots import check_availability
+
     state_path = Path(__file__).resolve().parent.parent / MONITOR_STATE_FILE
 
     # Load previous alert state
-    last_state = "none"  # "none" or "some"
-    last_alert_ts = 0
-    consecutive_slot_runs = 0
-    try:
-        if state_path.exists():
-            data = json.loads(state_path.read_text(encoding="utf-8"))
-            last_state = data.get("last_state", "none")
-            last_alert_ts = int(data.get("last_alert_ts", 0))
-            consecutive_slot_runs = max(0, int(data.get("consecutive_slot_runs", 0)))
-    except Exception as exc:
-        log(f"Failed to read monitor state: {exc}")
-
+    state = load_state(state_path)
     now_ts = int(time.time())
-    cooldown = max(0, int(ALERT_MIN_INTERVAL_MINUTES) * 60)
 
-    slots = check_availability()
-    has_slots = bool(slots)
-    if has_slots:
-        consecutive_slot_runs += 1
-    else:
-        consecutive_slot_runs = 0
-
-    min_detections = max(1, int(ALERT_MIN_CONSECUTIVE_DETECTIONS))
-    slots_are_persistent = has_slots and consecutive_slot_runs >= min_detections
-
-    # Decide whether to send
-    should_send = False
-    reason = ""
-
-    if slots_are_persistent:
-        if last_state != "some":
-            should_send = True
-            reason = f"availability persisted for {consecutive_slot_runs} consecutive runs"
-        elif not ALERT_CHANGE_ONLY and (
-            cooldown == 0 or (now_ts - last_alert_ts) >= cooldown
-        ):
-            should_send = True
-            reason = f"periodic reminder after {ALERT_MIN_INTERVAL_MINUTES} min"
-
-    if slots_are_persistent and should_send:
+    with metrics.stage("check"):
+        slots = check_availability()
+    # Confirmed slots already passed the in-run guard against one-off detections;
+    # unconfirmed ones keep the cross-run persistence threshold
+    min_detections = 1 if getattr(slots, "confirmed", False) else None
+    state, should_send, reason, note = decide_alert(state, bool(slots), now_ts, min_detections)
+    events.emit("alert", sent=should_send, reason=reason if should_send else note)
+
+    if should_send:
         preview = ", ".join(slots[:5])
         message = (
             f"⚠️ Appointment slots detected for SuperC Auslandsamt: {preview}. Please book immediately."
         )
         log(f"Sending alert ({reason})")
         send_success_notification(message)
-        last_alert_ts = now_ts
-        last_state = "some"
-    elif has_slots and not slots_are_persistent:
-        log(
-            "Slots detected but waiting for persistence threshold "
-            f"({consecutive_slot_runs}/{min_detections} consecutive runs)"
-        )
-        last_state = "none"
-    elif slots_are_persistent and not should_send:
-        if ALERT_CHANGE_ONLY:
-            log("Persistent slots detected but change-only mode suppressed a reminder")
-        else:
-            log("Persistent slots detected but throttled until the reminder cooldown elapses")
-        last_state = "some"
     else:
-        log("No slots currently available.")
-        last_state = "none"
+        log(note)
 
     # Persist state (only the minimal fields we need)
-    try:
-        state = {
-            "last_state": last_state,
-            "last_alert_ts": int(last_alert_ts),
-            "consecutive_slot_runs": int(consecutive_slot_runs),
-        }
-        state_path.write_text(json.dumps(state), encoding="utf-8")
-    except Exception as exc:
-        log(f"Failed to write monitor state: {exc}")
+    save_state(state_path, state)
 
 
 def main():
     """Entry point."""
-    try:
-        if len(sys.argv) > 1 and sys.argv[1] == "--monitor":
-            # Monitor mode: check availability and send notifications
-            monitor_mode()
-        else:
-            # Default mode: run the full booking workflow
-            ok = run_once(headless=True)
-            if not ok:
-                send_error_notification("Full booking workflow failed to complete")
-                sys.exit(2)
-
-    except KeyboardInterrupt:
-        log("Execution interrupted by user")
-        sys.exit(0)
-    except Exception as e:
-        log(f"Program execution error: {e}")
-        send_error_notification("Program encountered an error", e)
-        sys.exit(1)
+    if OUTBOX_ENABLED:
+        # Deliver notifications left queued by an earlier run in the background
+        outbox.start()
+    mode = sys.argv[1].lstrip("-") if len(sys.argv) > 1 else "book"
+    with events.run(mode):
+        try:
+            if len(sys.argv) > 1 and sys.argv[1] == "--monitor":
+                # Monitor mode: check availability and send notifications
+                monitor_mode()
+            elif len(sys.argv) > 1 and sys.argv[1] == "--monitor-adaptive":
+                # Timer-driven gate: only check when the hotspot plan says one is due
+                from .scheduler import run_if_due
+                run_if_due(monitor_mode)
+            elif len(sys.argv) > 1 and sys.argv[1] == "--monitor-loop":
+                # Long-running process that sleeps between planned checks
+                from .scheduler import run_forever
+                metrics.serve()
+
+                def checked_monitor():
+                    monitor_mode()
+                    metrics.flush()
+
+                run_forever(checked_monitor)
+            elif len(sys.argv) > 1 and sys.argv[1] == "--schedule":
+                # Print the polling plan and the next planned check time
+                from .scheduler import report
+                report()
+            elif len(sys.argv) > 1 and sys.argv[1] == "--monitor-multi":
+                # Monitor every MONITOR_TARGETS entry concurrently in one browser
+                from .multi_monitor import multi_monitor_mode
+                multi_monitor_mode()
+            elif len(sys.argv) > 1 and sys.argv[1] == "--race-book":
+                # Park a session on the calendar and book the first slot that appears
+                from .booking.race import race_to_book
+                if race_to_book(headless=True) is False:
+                    send_error_notification("Race booking failed to complete")
+                    sys.exit(2)
+            elif len(sys.argv) > 1 and sys.argv[1] == "--stop-browser-server":
+                # Shut down the shared browser server (it restarts on the next run)
+                from .browser_server import BrowserServer
+                BrowserServer().stop()
+                log("Browser server stopped")
+            else:
+                # Default mode: run the full booking workflow
+                ok = run_once(headless=True)
+                if not ok:
+                    send_error_notification("Full booking workflow failed to complete")
+                    sys.exit(2)
+
+        except KeyboardInterrupt:
+            log("Execution interrupted by user")
+            sys.exit(0)
+        except Exception as e:
+            log(f"Program execution error: {e}")
+            send_error_notification("Program encountered an error", e)
+            sys.exit(1)
+        finally:
+            try:
+                metrics.flush()
+            except Exception as exc:
+                log(f"Failed to export metrics: {exc}")
 
 
 if __name__ == "__main__":
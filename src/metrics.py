@@ -0,0 +1,252 @@
+"""Per-stage latency histograms and outcome counters in OpenMetrics text format.
+
+Cron runs are short-lived, so every process adds its observations to a
+cumulative JSON state file on flush and rewrites the textfile from it
+(node_exporter textfile collector style). Long-running modes can also
+serve the same text over a local HTTP endpoint.
+"""
+import fcntl
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .config import METRICS_TEXTFILE, METRICS_PORT, METRICS_STATE_FILE
+
+ROOT = Path(__file__).resolve().parent.parent
+PREFIX = "termin"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+STAGE_HISTOGRAM = f"{PREFIX}_stage_duration_seconds"
+STAGE_COUNTER = f"{PREFIX}_stage"
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_listeners = []
+_help = {
+    STAGE_HISTOGRAM: "Wall time spent in each flow stage",
+    STAGE_COUNTER: "Stage executions by outcome",
+}
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def _empty_histogram():
+    return {"buckets": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0}
+
+
+def observe(name, value, **labels):
+    """Record ``value`` in the histogram ``name``."""
+    with _lock:
+        hist = _histograms.setdefault(_key(name, labels), _empty_histogram())
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                hist["buckets"][idx] += 1
+        hist["buckets"][-1] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def inc(name, amount=1, help_text=None, **labels):
+    """Increment the counter ``name`` (exposed as ``name_total``)."""
+    with _lock:
+        if help_text:
+            _help.setdefault(name, help_text)
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def add_listener(callback):
+    """Call ``callback(event, name, outcome, seconds)`` when a stage starts and ends.
+
+    ``event`` is ``"start"`` or ``"end"``; ``outcome`` and ``seconds`` are None on start.
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def _notify(event, name, outcome=None, seconds=None):
+    for callback in list(_listeners):
+        try:
+            callback(event, name, outcome, seconds)
+        except Exception:
+            # Observers must never break the flow they observe
+            pass
+
+
+class _StageRun:
+    def __init__(self):
+        self.outcome = "success"
+
+
+@contextmanager
+def stage(name):
+    """Time a block as stage ``name``; set ``.outcome`` on the yielded object to override."""
+    run = _StageRun()
+    _notify("start", name)
+    start = time.perf_counter()
+    try:
+        yield run
+    except BaseException:
+        run.outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(STAGE_HISTOGRAM, elapsed, stage=name)
+        inc(STAGE_COUNTER, stage=name, outcome=run.outcome)
+        _notify("end", name, run.outcome, elapsed)
+
+
+def timed(name):
+    """Decorator form of :func:`stage`; a ``False`` return value counts as a miss."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as run:
+                result = func(*args, **kwargs)
+                if result is False:
+                    run.outcome = "miss"
+                return result
+        return wrapper
+    return decorator
+
+
+def _snapshot():
+    with _lock:
+        return (
+            {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]} for key, h in _histograms.items()},
+            dict(_counters),
+        )
+
+
+def _merge(state, histograms, counters):
+    for key, hist in histograms.items():
+        target = state["histograms"].setdefault(key, _empty_histogram())
+        target["buckets"] = [a + b for a, b in zip(target["buckets"], hist["buckets"])]
+        target["sum"] += hist["sum"]
+        target["count"] += hist["count"]
+    for key, value in counters.items():
+        state["counters"][key] = state["counters"].get(key, 0) + value
+    return state
+
+
+def _state_path():
+    return ROOT / METRICS_STATE_FILE
+
+
+def _load_state():
+    try:
+        state = json.loads(_state_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        state = {}
+    state.setdefault("histograms", {})
+    state.setdefault("counters", {})
+    state.setdefault("help", {})
+    return state
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render(state=None):
+    """Return the OpenMetrics exposition for ``state`` (default: persisted + unflushed)."""
+    if state is None:
+        state = _merge(_load_state(), *_snapshot())
+    help_texts = {**state.get("help", {}), **_help}
+
+    families = {}
+    for key, hist in state["histograms"].items():
+        name, labels = json.loads(key)
+        families.setdefault(("histogram", name), []).append((labels, hist))
+    for key, value in state["counters"].items():
+        name, labels = json.loads(key)
+        families.setdefault(("counter", name), []).append((labels, value))
+
+    lines = []
+    for (kind, name), samples in sorted(families.items(), key=lambda item: item[0][1]):
+        lines.append(f"# TYPE {name} {kind}")
+        if name.endswith("_seconds"):
+            lines.append(f"# UNIT {name} seconds")
+        if name in help_texts:
+            lines.append(f"# HELP {name} {help_texts[name]}")
+        for labels, data in sorted(samples, key=lambda item: item[0]):
+            if kind == "counter":
+                lines.append(f"{name}_total{_labels_text(labels)} {data}")
+                continue
+            for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], data["buckets"]):
+                le = bound if isinstance(bound, str) else repr(float(bound))
+                lines.append(f"{name}_bucket{_labels_text(labels, [('le', le)])} {count}")
+            lines.append(f"{name}_count{_labels_text(labels)} {data['count']}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {data['sum']:.6f}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def flush():
+    """Fold this process's observations into the state file and rewrite the textfile."""
+    if not METRICS_TEXTFILE and not METRICS_PORT:
+        return
+    histograms, counters = _snapshot()
+    if not histograms and not counters:
+        return
+
+    state_path = _state_path()
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(state_path.with_name(state_path.name + ".lock"), "w") as lock_handle:
+        fcntl.flock(lock_handle, fcntl.LOCK_EX)
+        state = _merge(_load_state(), histograms, counters)
+        state["help"] = {**state.get("help", {}), **_help}
+        tmp = state_path.with_name(state_path.name + ".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, state_path)
+
+        if METRICS_TEXTFILE:
+            textfile = ROOT / METRICS_TEXTFILE
+            textfile.parent.mkdir(parents=True, exist_ok=True)
+            tmp = textfile.with_name(textfile.name + ".tmp")
+            tmp.write_text(render(state), encoding="utf-8")
+            os.replace(tmp, textfile)
+
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def serve(port=METRICS_PORT):
+    """Expose /metrics on 127.0.0.1:``port`` from a daemon thread; returns the server."""
+    if not port:
+        return None
+    # http.server costs ~50 ms to import and only the long-running modes serve metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
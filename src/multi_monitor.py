@@ -0,0 +1,326 @@
+"""Asyncio monitor that checks several Anliegen/Standort targets in one browser."""
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+from .alerting import confirm_slots_async, decide_alert, default_state, parse_state
+from .booking.slots import CALENDAR_SCRIPT
+from .browser import (
+    CONFIRM_PATTERNS,
+    MODAL_MARK,
+    BUTTON_MARK,
+    MODAL_SCRIPT,
+    COOKIE_PATTERN,
+    INTRO_PATTERN,
+    PRELUDE_MARK,
+    PRELUDE_SCRIPT,
+)
+from .browser_server import BrowserServer
+from .config import (
+    ANLIEGEN,
+    STANDORT,
+    START_URL,
+    STORAGE_STATE,
+    BROWSER_SERVER_ENABLED,
+    MONITOR_TARGETS,
+    MONITOR_CONCURRENCY,
+    MONITOR_TARGETS_STATE_FILE,
+    WAIT_STEP_MAX_MS,
+    PRELUDE_GRACE_MS,
+)
+from . import events
+from .notifications import log, send_success_notification
+from .route_profile import RouteProfile
+
+ROOT = Path(__file__).resolve().parent.parent
+DEPARTMENT_SELECTOR = (
+    'button:has-text("Ausländer"), a:has-text("Aufenthaltsangelegenheiten"), '
+    'button:has-text("Aufenthaltsangelegenheiten"), [href*="aufenthalt"]'
+)
+MODAL_SELECTOR = '.modal-dialog, [role="dialog"], .modal.in'
+ERROR_PAGE_SELECTOR = "body:has-text('Fehlermeldung: Ungültiger Aufruf')"
+SET_VALUE_SCRIPT = r"""(el, value) => {
+    el.value = String(value);
+    el.dispatchEvent(new Event('change', { bubbles: true }));
+    el.dispatchEvent(new Event('input', { bubbles: true }));
+}"""
+# Index of the first radio/checkbox whose label (or parent) mentions the Standort, else 0
+LOCATION_INDEX_SCRIPT = r"""(wanted) => {
+    const inputs = Array.from(document.querySelectorAll('input[type="radio"], input[type="checkbox"]'));
+    const needle = (wanted || '').toLowerCase();
+    if (!needle) return 0;
+    const index = inputs.findIndex((input) => {
+        const label = input.id ? document.querySelector(`label[for="${CSS.escape(input.id)}"]`) : null;
+        const text = ((label && label.textContent) || (input.parentElement && input.parentElement.textContent) || '');
+        return text.toLowerCase().includes(needle);
+    });
+    return index < 0 ? 0 : index;
+}"""
+
+
+class Target:
+    """One Anliegen/Standort combination to watch."""
+
+    def __init__(self, anliegen, standort=""):
+        self.anliegen = anliegen.strip()
+        self.standort = standort.strip()
+
+    @property
+    def name(self):
+        return f"{self.anliegen} @ {self.standort}" if self.standort else self.anliegen
+
+
+def load_targets(spec=MONITOR_TARGETS):
+    """Parse ``Anliegen|Standort;Anliegen|Standort`` into targets."""
+    targets = []
+    for chunk in spec.split(";"):
+        if not chunk.strip():
+            continue
+        anliegen, _, standort = chunk.partition("|")
+        if anliegen.strip():
+            targets.append(Target(anliegen, standort))
+    if not targets and ANLIEGEN:
+        targets.append(Target(ANLIEGEN, STANDORT))
+    return targets
+
+
+async def _handle_prelude(page):
+    """Async counterpart of browser.handle_prelude."""
+    handled = []
+    while True:
+        want_intro = "intro" not in handled
+        try:
+            result = await page.wait_for_function(
+                PRELUDE_SCRIPT,
+                arg=[COOKIE_PATTERN, INTRO_PATTERN, want_intro, PRELUDE_MARK, PRELUDE_GRACE_MS],
+                polling=100,
+                timeout=WAIT_STEP_MAX_MS,
+            )
+            kind = await result.json_value()
+        except Exception:
+            return handled
+        if kind == "none" or kind in handled:
+            return handled
+        try:
+            await page.locator(f'[{PRELUDE_MARK}="{kind}"]').first.click(timeout=2500)
+        except Exception:
+            return handled
+        handled.append(kind)
+        if kind == "intro":
+            return handled
+
+
+async def _act_and_wait(page, action, selector=None):
+    """Async counterpart of waits.act_and_wait: navigation or a visible selector ends the step."""
+    navigated = asyncio.Event()
+
+    def on_navigated(frame):
+        if frame == page.main_frame:
+            navigated.set()
+
+    page.on("framenavigated", on_navigated)
+    try:
+        await action()
+        waiters = [asyncio.ensure_future(navigated.wait())]
+        if selector:
+            waiters.append(asyncio.ensure_future(
+                page.locator(selector).first.wait_for(state="visible", timeout=WAIT_STEP_MAX_MS)
+            ))
+        done, pending = await asyncio.wait(waiters, timeout=WAIT_STEP_MAX_MS / 1000, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.exception()
+        if navigated.is_set():
+            try:
+                await page.wait_for_load_state("domcontentloaded", timeout=WAIT_STEP_MAX_MS)
+            except Exception:
+                pass
+    finally:
+        page.remove_listener("framenavigated", on_navigated)
+
+
+async def _dismiss_modal(page):
+    try:
+        found = await page.evaluate(MODAL_SCRIPT, [CONFIRM_PATTERNS, MODAL_MARK, BUTTON_MARK])
+    except Exception:
+        return False
+    if not found or not found["dialog"]:
+        return False
+    if found["label"] is None:
+        await page.keyboard.press("Escape")
+    else:
+        await _act_and_wait(page, page.locator(f"[{BUTTON_MARK}]").first.click)
+    return True
+
+
+async def _check_target_flow(page, target):
+    prefix = f"[{target.name}]"
+    await page.goto(START_URL)
+    if "intro" in await _handle_prelude(page):
+        await page.wait_for_load_state("domcontentloaded")
+
+    if await page.locator("input[data-tevis-cncname]").count() == 0:
+        departments = page.locator("button.select_mdt_btn")
+        entry = departments if await departments.count() == 1 else page.locator(DEPARTMENT_SELECTOR)
+        await _act_and_wait(page, entry.first.click, "input[data-tevis-cncname]")
+
+    target_input = page.locator(f"input[data-tevis-cncname={json.dumps(target.anliegen, ensure_ascii=False)}]")
+    if await target_input.count() == 0:
+        log(f"{prefix} Option not found: {target.anliegen}")
+        return None
+    await target_input.first.evaluate(SET_VALUE_SCRIPT, "1")
+
+    await _act_and_wait(page, page.get_by_role("button", name="Weiter").first.click, MODAL_SELECTOR)
+    if await _dismiss_modal(page):
+        log(f"{prefix} Dismissed the Hinweis modal after selecting the Anliegen")
+
+    options = page.locator('input[type="radio"], input[type="checkbox"]')
+    if await options.count() > 0:
+        index = await page.evaluate(LOCATION_INDEX_SCRIPT, target.standort)
+        await options.nth(index).click()
+        await _act_and_wait(page, page.get_by_role("button", name="Weiter").first.click, "#sugg_accordion")
+    else:
+        forms = page.locator("form:has(input[name='select_location'])")
+        chosen = forms.first
+        if target.standort:
+            matching = forms.filter(has_text=target.standort)
+            if await matching.count() > 0:
+                chosen = matching.first
+        submit = chosen.locator("input[name='select_location'], button[name='select_location'], #WeiterButton")
+        await _act_and_wait(page, submit.first.click, "#sugg_accordion")
+
+    if await page.locator(ERROR_PAGE_SELECTOR).count() > 0:
+        log(f"{prefix} Encountered 'Ungültiger Aufruf' error page; will retry on next run")
+        return None
+
+    events.emit("check", engine="browser", target=target.name)
+    slots = await _read_calendar(page)
+    log(f"{prefix} Calendar shows {len(slots)} slots: {slots[:5]}")
+    if not slots:
+        return slots
+    events.slots_found(slots, target=target.name)
+    return await confirm_slots_async(slots, lambda: _reread_calendar(page))
+
+
+async def _read_calendar(page):
+    try:
+        await page.wait_for_load_state("load", timeout=WAIT_STEP_MAX_MS)
+    except Exception:
+        pass
+    rows = await page.evaluate(CALENDAR_SCRIPT)
+    return [f"{date} {time_text}".strip() for date, time_text, _, _ in rows]
+
+
+async def _reread_calendar(page):
+    """Async counterpart of slots._reread_calendar; None unless the reload landed on the calendar."""
+    await page.reload(wait_until="domcontentloaded")
+    if await page.locator(ERROR_PAGE_SELECTOR).count() > 0:
+        return None
+    slots = await _read_calendar(page)
+    if slots:
+        return slots
+    return [] if await page.locator("#sugg_accordion").count() > 0 else None
+
+
+async def _check_target(browser, target, semaphore):
+    async with semaphore:
+        ctx_kwargs = {}
+        if Path(STORAGE_STATE).exists():
+            ctx_kwargs["storage_state"] = STORAGE_STATE
+        context = await browser.new_context(**ctx_kwargs)
+        profile = RouteProfile.from_name()
+        try:
+            if profile:
+                await profile.apply_async(context)
+            page = await context.new_page()
+            page.set_default_timeout(15000)
+            return await _check_target_flow(page, target)
+        except Exception as exc:
+            log(f"[{target.name}] Error while checking availability: {exc}")
+            return None
+        finally:
+            if profile:
+                profile.report()
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+
+async def check_targets(targets, concurrency=MONITOR_CONCURRENCY):
+    """Check all targets concurrently in one browser; returns {target name: slots or None if the check failed}."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    server = BrowserServer() if BROWSER_SERVER_ENABLED else None
+    async with async_playwright() as p:
+        browser = None
+        if server:
+            leased = False
+            try:
+                endpoint = await asyncio.to_thread(server.ensure, p.chromium.executable_path)
+                leased = True
+                browser = await p.chromium.connect_over_cdp(endpoint, timeout=10000)
+            except Exception as exc:
+                log(f"Browser server unavailable, launching a private browser: {exc}")
+                if leased:
+                    await asyncio.to_thread(server.release)
+                server = None
+        if browser is None:
+            browser = await p.chromium.launch(headless=True, args=["--disable-gpu"])
+        try:
+            results = await asyncio.gather(*(_check_target(browser, t, semaphore) for t in targets))
+        finally:
+            await browser.close()
+            if server:
+                await asyncio.to_thread(server.release)
+    return {target.name: slots for target, slots in zip(targets, results)}
+
+
+def multi_monitor_mode():
+    """Check every configured target and apply per-target alert throttling."""
+    targets = load_targets()
+    if not targets:
+        log("No monitor targets configured")
+        return
+
+    state_path = ROOT / MONITOR_TARGETS_STATE_FILE
+    try:
+        stored = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else {}
+    except Exception as exc:
+        log(f"Failed to read monitor target state: {exc}")
+        stored = {}
+
+    now_ts = int(time.time())
+    log(f"Checking {len(targets)} targets with concurrency {MONITOR_CONCURRENCY}")
+    results = asyncio.run(check_targets(targets))
+
+    states = {}
+    for target in targets:
+        slots = results.get(target.name)
+        state = parse_state(stored.get(target.name, default_state()))
+        if slots is None:
+            # A failed check says nothing about the calendar; keep the streak as it was
+            log(f"[{target.name}] Check failed; alert state unchanged")
+            states[target.name] = state
+            continue
+        min_detections = 1 if getattr(slots, "confirmed", False) else None
+        state, should_send, reason, note = decide_alert(state, bool(slots), now_ts, min_detections)
+        events.emit("alert", target=target.name, sent=should_send, reason=reason if should_send else note)
+        if should_send:
+            preview = ", ".join(slots[:5])
+            log(f"[{target.name}] Sending alert ({reason})")
+            send_success_notification(
+                f"⚠️ Appointment slots detected for {target.name}: {preview}. Please book immediately."
+            )
+        else:
+            log(f"[{target.name}] {note}")
+        states[target.name] = state
+
+    try:
+        state_path.write_text(json.dumps(states), encoding="utf-8")
+    except Exception as exc:
+        log(f"Failed to write monitor target state: {exc}")
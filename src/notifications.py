@@ -1,6 +1,12 @@
 """Notification system module."""
 import time
-from mx_send import send_text, send_image
+from mx_send import add_retry_listener, send_text, send_image
+
+from .config import OUTBOX_ENABLED
+from .metrics import PREFIX, inc, stage
+from . import events, outbox
+
+MATRIX_RETRY_COUNTER = f"{PREFIX}_matrix_retries"
 
 
 def log(msg):
@@ -8,6 +14,30 @@ def log(msg):
     print(time.strftime("[%Y-%m-%d %H:%M:%S]"), msg, flush=True)
 
 
+def _record_matrix_retry(reason, delay):
+    inc(MATRIX_RETRY_COUNTER, help_text="Matrix request retries by reason", reason=reason)
+    log(f"Matrix request failed ({reason}); retrying in {delay:.1f}s")
+
+
+add_retry_listener(_record_matrix_retry)
+
+
+def _queue_or_send(kind, body, direct, **image):
+    """Queue for the background drainer; send inline when the outbox is off or unwritable.
+
+    Returns True when the message was queued rather than sent.
+    """
+    if OUTBOX_ENABLED:
+        try:
+            outbox.enqueue(kind, body, **image)
+            return True
+        except OSError as exc:
+            log(f"Failed to queue notification, sending directly: {exc}")
+    with stage("matrix_send"):
+        direct()
+    return False
+
+
 def send_error_notification(error_msg, exception=None):
     """Send an error notification to Matrix."""
     try:
@@ -17,8 +47,16 @@ def send_error_notification(error_msg, exception=None):
             full_msg = f"🚨 SuperC booking bot error: {error_msg}"
 
         log(f"Sending error notification: {full_msg}")
-        send_text(full_msg)
-        log("Error notification sent to Matrix")
+        events.emit(
+            "error",
+            stage=events.current_stage(),
+            message=error_msg,
+            detail=str(exception) if exception else None,
+        )
+        if _queue_or_send("error", full_msg, lambda: send_text(full_msg)):
+            log("Error notification queued for Matrix")
+        else:
+            log("Error notification sent to Matrix")
     except Exception as e:
         log(f"Failed to send error notification: {e}")
         # Record the original error even if Matrix notification fails
@@ -29,20 +67,29 @@ def send_success_notification(message):
     """Send a success notification to Matrix."""
     try:
         log(message)
-        send_text(message)
-        log("Matrix notification sent")
+        if _queue_or_send("text", message, lambda: send_text(message)):
+            log("Matrix notification queued")
+        else:
+            log("Matrix notification sent")
     except Exception as e:
         log(f"Failed to send Matrix notification: {e}")
         # Send an error notification when Matrix delivery fails
         send_error_notification("Matrix notification delivery failed", e)
 
 
-def send_screenshot_notification(message: str, image_bytes: bytes, filename: str = "screenshot.png"):
-    """Send a screenshot to Matrix without persisting it locally."""
+def send_screenshot_notification(message: str, image_bytes: bytes, filename: str = "screenshot.png", mimetype: str = "image/png"):
+    """Send a screenshot to Matrix without persisting it beyond delivery."""
     try:
         log(message)
-        send_image(message, image_bytes, filename=filename)
-        log("Matrix screenshot notification sent")
+        queued = _queue_or_send(
+            "image",
+            message,
+            lambda: send_image(message, image_bytes, filename=filename, mimetype=mimetype),
+            image_bytes=image_bytes,
+            filename=filename,
+            mimetype=mimetype,
+        )
+        log("Matrix screenshot notification queued" if queued else "Matrix screenshot notification sent")
     except Exception as e:
         log(f"Failed to send Matrix screenshot: {e}")
         send_error_notification("Matrix screenshot delivery failed", e)
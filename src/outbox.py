@@ -0,0 +1,263 @@
+"""Durable on-disk outbox for Matrix notifications.
+
+Producers write one JSON file per message (plus the image bytes for
+screenshots) and return immediately. A background drainer delivers the
+files in order; a message that fails stays on disk and is retried with
+backoff, by this process or the next one. Consecutive error messages that
+arrive within a short window are merged into a single digest; while a burst
+waits for its window to close, the alerts queued behind it are sent first.
+"""
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from mx_send import send_text, send_image
+
+from .config import (
+    OUTBOX_DIR,
+    OUTBOX_COALESCE_SECONDS,
+    OUTBOX_EXIT_TIMEOUT_SECONDS,
+    OUTBOX_MAX_AGE_HOURS,
+)
+from .metrics import stage
+
+ROOT = Path(__file__).resolve().parent.parent
+MAX_BACKOFF_SECONDS = 60
+LOCK_RETRY_SECONDS = 1.0
+DIGEST_MAX_LINES = 10
+DIGEST_DETAIL_CHARS = 200
+
+_drainer = None
+_drainer_lock = threading.Lock()
+
+
+def _log(msg):
+    from .notifications import log
+    log(msg)
+
+
+def _outbox_dir():
+    return ROOT / OUTBOX_DIR
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as handle:
+        handle.write(data)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp, path)
+
+
+def enqueue(kind, body, image_bytes=None, filename=None, mimetype=None):
+    """Persist a message for delivery; ``kind`` is "text", "error" or "image"."""
+    outbox = _outbox_dir()
+    outbox.mkdir(parents=True, exist_ok=True)
+    txn_id = uuid.uuid4().hex
+    stem = f"{time.time_ns():020d}-{txn_id}"
+    entry = {"id": txn_id, "kind": kind, "body": body, "created": time.time(), "attempts": 0}
+    if image_bytes is not None:
+        _write_atomic(outbox / f"{stem}.bin", image_bytes)
+        entry.update({"image": f"{stem}.bin", "filename": filename, "mimetype": mimetype})
+    _write_atomic(outbox / f"{stem}.json", json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+    start()
+
+
+def _load_pending(outbox):
+    entries = []
+    for path in sorted(outbox.glob("*.json")):
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        entry["_path"] = path
+        entries.append(entry)
+    return entries
+
+
+def _remove(entry):
+    entry["_path"].unlink(missing_ok=True)
+    if entry.get("image"):
+        (entry["_path"].parent / entry["image"]).unlink(missing_ok=True)
+
+
+def _dead_letter(entry):
+    dead = entry["_path"].parent / "dead"
+    dead.mkdir(exist_ok=True)
+    shutil.move(str(entry["_path"]), dead / entry["_path"].name)
+    if entry.get("image"):
+        image = entry["_path"].parent / entry["image"]
+        if image.exists():
+            shutil.move(str(image), dead / image.name)
+
+
+def _mark_failed(entries):
+    for entry in entries:
+        entry["attempts"] = int(entry.get("attempts", 0)) + 1
+        data = {key: value for key, value in entry.items() if key != "_path"}
+        try:
+            _write_atomic(entry["_path"], json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        except OSError:
+            pass
+
+
+def _digest(errors):
+    # Group by headline; the details of repeated errors usually only differ in noise,
+    # so only the first one per headline is shown
+    counts = Counter()
+    details = {}
+    for entry in errors:
+        headline, *rest = entry["body"].splitlines() or [""]
+        counts[headline] += 1
+        details.setdefault(headline, next((line.strip() for line in rest if line.strip()), ""))
+    lines = [f"🚨 {len(errors)} SuperC booking bot errors in a short burst:"]
+    for headline, count in list(counts.items())[:DIGEST_MAX_LINES]:
+        lines.append(f"- {headline}" + (f" (×{count})" if count > 1 else ""))
+        detail = details[headline]
+        if detail:
+            if len(detail) > DIGEST_DETAIL_CHARS:
+                detail = detail[:DIGEST_DETAIL_CHARS - 1] + "…"
+            lines.append(f"  {detail}")
+    if len(counts) > DIGEST_MAX_LINES:
+        lines.append(f"- … and {len(counts) - DIGEST_MAX_LINES} more")
+    return "\n".join(lines)
+
+
+def _deliver(batch):
+    entry = batch[0]
+    with stage("matrix_send"):
+        if entry["kind"] == "image":
+            image = (entry["_path"].parent / entry["image"]).read_bytes()
+            send_image(entry["body"], image, filename=entry.get("filename") or "screenshot.png",
+                       mimetype=entry.get("mimetype") or "image/png", txn_id=entry["id"])
+        elif len(batch) > 1:
+            # Same set of errors -> same transaction id, so a retried digest is not posted twice
+            txn_id = hashlib.sha256("".join(e["id"] for e in batch).encode()).hexdigest()[:32]
+            send_text(_digest(batch), txn_id=txn_id)
+        else:
+            send_text(entry["body"], txn_id=entry["id"])
+
+
+def _send(batch):
+    """Deliver and remove ``batch``; returns the retry delay when delivery failed, else None."""
+    try:
+        _deliver(batch)
+    except Exception as exc:
+        _mark_failed(batch)
+        attempts = int(batch[0].get("attempts", 1))
+        _log(f"Notification delivery failed (attempt {attempts}), keeping it queued: {exc}")
+        return min(MAX_BACKOFF_SECONDS, 2 ** attempts)
+
+    if len(batch) > 1:
+        _log(f"Matrix digest of {len(batch)} error notifications sent")
+    else:
+        _log("Matrix notification sent")
+    for sent in batch:
+        _remove(sent)
+    return None
+
+
+def drain_once(final=False):
+    """Deliver pending messages in order, except that alerts overtake a pending error burst.
+
+    Returns ``(remaining, wait_seconds)``: how many messages are still queued
+    and how long to wait before the next attempt (0 when the queue is empty).
+    """
+    outbox = _outbox_dir()
+    if not outbox.exists():
+        return 0, 0
+    with open(outbox / ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Another process is draining the same outbox
+            return len(list(outbox.glob("*.json"))), LOCK_RETRY_SECONDS
+
+        entries = _load_pending(outbox)
+        now = time.time()
+        while entries:
+            entry = entries[0]
+            if now - float(entry.get("created", now)) > OUTBOX_MAX_AGE_HOURS * 3600:
+                _log(f"Dropping notification older than {OUTBOX_MAX_AGE_HOURS} h to outbox/dead: {entry['body'][:80]}")
+                _dead_letter(entries.pop(0))
+                continue
+
+            batch = [entry]
+            if entry["kind"] == "error":
+                for other in entries[1:]:
+                    if other["kind"] != "error":
+                        break
+                    batch.append(other)
+                # Give a burst a moment to complete before sending its digest
+                newest = max(float(e.get("created", now)) for e in batch)
+                if not final and now - newest < OUTBOX_COALESCE_SECONDS:
+                    # Slot alerts must not wait for the digest: send what is queued behind it
+                    for other in [e for e in entries[len(batch):] if e["kind"] != "error"]:
+                        retry = _send([other])
+                        if retry is not None:
+                            return len(entries), retry
+                        entries.remove(other)
+                    return len(entries), max(0.0, OUTBOX_COALESCE_SECONDS - (time.time() - newest))
+
+            retry = _send(batch)
+            if retry is not None:
+                return len(entries), retry
+            del entries[:len(batch)]
+    return 0, 0
+
+
+class _Drainer(threading.Thread):
+    def __init__(self):
+        super().__init__(name="outbox-drainer", daemon=True)
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                remaining, wait = drain_once(final=self.stopping.is_set())
+            except Exception as exc:
+                _log(f"Outbox drain failed: {exc}")
+                remaining, wait = 1, MAX_BACKOFF_SECONDS
+            if not remaining:
+                if self.stopping.is_set():
+                    return
+                self.wake.wait()
+                self.wake.clear()
+                continue
+            # Sleep until the next attempt, a new message or shutdown
+            self.wake.wait(wait)
+            self.wake.clear()
+
+
+def start():
+    """Start the background drainer (idempotent); it also picks up leftovers from earlier runs."""
+    global _drainer
+    with _drainer_lock:
+        if _drainer is None or not _drainer.is_alive():
+            _drainer = _Drainer()
+            _drainer.start()
+        _drainer.wake.set()
+
+
+def flush(timeout=OUTBOX_EXIT_TIMEOUT_SECONDS):
+    """Deliver what is queued without waiting for coalescing windows, for at most ``timeout`` seconds."""
+    drainer = _drainer
+    if drainer is None or not drainer.is_alive():
+        return
+    drainer.stopping.set()
+    drainer.wake.set()
+    drainer.join(timeout)
+    if drainer.is_alive():
+        _log("Outbox still has undelivered notifications; they will be retried on the next run")
+
+
+atexit.register(flush)
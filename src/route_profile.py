@@ -0,0 +1,129 @@
+"""Request routing profiles that keep non-essential resources out of the flow."""
+import json
+import time
+from collections import Counter
+from fnmatch import fnmatch
+from pathlib import Path
+from urllib.parse import urlparse
+
+from .config import ROUTE_PROFILE, ROUTE_BLOCK_LOG, START_URL
+from .notifications import log
+
+ROOT = Path(__file__).resolve().parent.parent
+MAX_RECORDED = 200
+
+# Stylesheets stay allowed: visibility checks (modals, buttons) depend on CSS.
+PROFILES = {
+    "off": None,
+    "lean": {
+        "block_types": {"image", "media", "font"},
+        "block_patterns": [
+            "*google-analytics.com*",
+            "*googletagmanager.com*",
+            "*doubleclick.net*",
+            "*matomo*",
+            "*piwik*",
+            "*hotjar*",
+        ],
+        "allow_patterns": ["*captcha*"],
+        "first_party_only": False,
+    },
+    "strict": {
+        "block_types": {"image", "media", "font", "manifest", "texttrack", "eventsource", "websocket", "ping"},
+        "block_patterns": [],
+        "allow_patterns": ["*captcha*"],
+        "first_party_only": True,
+    },
+}
+
+
+class RouteProfile:
+    """Abort unneeded requests for a browser context and remember what was blocked."""
+
+    def __init__(self, name, block_types=(), block_patterns=(), allow_patterns=(), first_party_only=False,
+                 first_party_host=None):
+        self.name = name
+        self.block_types = set(block_types)
+        self.block_patterns = list(block_patterns)
+        self.allow_patterns = list(allow_patterns)
+        self.first_party_only = first_party_only
+        self.first_party_host = first_party_host or urlparse(START_URL).hostname or ""
+        self.blocked = []
+        self.blocked_counts = Counter()
+        self.allowed = 0
+
+    @classmethod
+    def from_name(cls, name=ROUTE_PROFILE):
+        spec = PROFILES.get(name)
+        if spec is None:
+            if name not in PROFILES:
+                log(f"Unknown route profile '{name}'; requests are not filtered")
+            return None
+        return cls(name, **spec)
+
+    def _is_first_party(self, url):
+        host = urlparse(url).hostname or ""
+        return host == self.first_party_host or host.endswith("." + self.first_party_host)
+
+    def should_block(self, resource_type, url):
+        if url.startswith(("data:", "blob:")):
+            return False
+        if any(fnmatch(url, pattern) for pattern in self.allow_patterns):
+            return False
+        if resource_type in self.block_types:
+            return True
+        if any(fnmatch(url, pattern) for pattern in self.block_patterns):
+            return True
+        return self.first_party_only and not self._is_first_party(url)
+
+    def _check(self, request):
+        if self.should_block(request.resource_type, request.url):
+            self.blocked_counts[request.resource_type] += 1
+            if len(self.blocked) < MAX_RECORDED:
+                self.blocked.append({"type": request.resource_type, "url": request.url})
+            return True
+        self.allowed += 1
+        return False
+
+    def _handle(self, route):
+        if self._check(route.request):
+            route.abort("blockedbyclient")
+        else:
+            route.continue_()
+
+    async def _handle_async(self, route):
+        if self._check(route.request):
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    def apply(self, context):
+        context.route("**/*", self._handle)
+
+    async def apply_async(self, context):
+        await context.route("**/*", self._handle_async)
+
+    def summary(self):
+        total = sum(self.blocked_counts.values())
+        line = f"Route profile '{self.name}' blocked {total} of {total + self.allowed} requests"
+        if total:
+            line += " (" + ", ".join(f"{kind}: {count}" for kind, count in self.blocked_counts.most_common()) + ")"
+        return line
+
+    def report(self):
+        """Log what was blocked and optionally append the details to ROUTE_BLOCK_LOG."""
+        log(self.summary())
+        if not ROUTE_BLOCK_LOG:
+            return
+        record = {
+            "ts": int(time.time()),
+            "profile": self.name,
+            "allowed": self.allowed,
+            "blocked_counts": dict(self.blocked_counts),
+            "blocked": self.blocked,
+        }
+        try:
+            with (ROOT / ROUTE_BLOCK_LOG).open("a", encoding="utf-8") as handle:
+                handle.write(json.dumps(record) + "\n")
+        except OSError as exc:
+            log(f"Failed to write route block log: {exc}")
@@ -0,0 +1,203 @@
+"""Hotspot-driven polling intervals under a daily check budget."""
+import json
+import math
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .config import (
+    SCHEDULER_DAILY_BUDGET,
+    SCHEDULER_MIN_INTERVAL_SECONDS,
+    SCHEDULER_MAX_INTERVAL_SECONDS,
+    SCHEDULER_STATE_FILE,
+)
+from .notifications import log
+from .stats_store import load_bucket_stats
+from .timezone_utils import DISPLAY_TZ
+
+ROOT = Path(__file__).resolve().parent.parent
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+DEFAULT_BUCKET_MINUTES = 30
+# Buckets without any detection are weighted at this fraction of the global rate
+COLD_BUCKET_FACTOR = 0.02
+# Pseudo-checks that pull sparse buckets toward the global rate
+PRIOR_CHECKS = 20
+
+
+def bucket_key(moment, bucket_minutes):
+    bucket_minute = (moment.minute // bucket_minutes) * bucket_minutes
+    return f"{WEEKDAYS[moment.weekday()]} {moment.hour:02d}:{bucket_minute:02d}"
+
+
+def _all_bucket_keys(bucket_minutes):
+    keys = []
+    for day in WEEKDAYS:
+        for minutes in range(0, 24 * 60, bucket_minutes):
+            keys.append(f"{day} {minutes // 60:02d}:{minutes % 60:02d}")
+    return keys
+
+
+class PollingPlan:
+    """Per-bucket polling intervals whose weekly total stays within the budget.
+
+    Each bucket gets a weight from its smoothed detection rate; intervals are
+    proportional to 1/sqrt(weight), which minimises the expected delay until a
+    slot is seen for a fixed number of checks. A scale factor is then searched
+    so the planned checks per day match ``daily_budget``.
+    """
+
+    def __init__(self, buckets, bucket_minutes=DEFAULT_BUCKET_MINUTES, daily_budget=SCHEDULER_DAILY_BUDGET,
+                 min_interval=SCHEDULER_MIN_INTERVAL_SECONDS, max_interval=SCHEDULER_MAX_INTERVAL_SECONDS):
+        self.bucket_minutes = bucket_minutes
+        self.daily_budget = daily_budget
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.weights = self._weights(buckets)
+        self.intervals = self._solve()
+
+    def _weights(self, buckets):
+        keys = _all_bucket_keys(self.bucket_minutes)
+        total_checks = sum(int(stats.get("checks", 0)) for stats in buckets.values())
+        total_detections = sum(int(stats.get("detections", 0)) for stats in buckets.values())
+        if not total_checks or not total_detections:
+            return {key: 1.0 for key in keys}
+
+        global_rate = total_detections / total_checks
+        weights = {}
+        for key in keys:
+            stats = buckets.get(key, {})
+            checks = int(stats.get("checks", 0))
+            detections = int(stats.get("detections", 0))
+            if detections == 0:
+                weights[key] = global_rate * COLD_BUCKET_FACTOR
+            else:
+                weights[key] = (detections + PRIOR_CHECKS * global_rate) / (checks + PRIOR_CHECKS)
+        return weights
+
+    def _intervals_for(self, scale):
+        return {
+            key: min(self.max_interval, max(self.min_interval, scale / math.sqrt(weight)))
+            for key, weight in self.weights.items()
+        }
+
+    def _checks_per_day(self, intervals):
+        bucket_seconds = self.bucket_minutes * 60
+        return sum(bucket_seconds / interval for interval in intervals.values()) / 7
+
+    def _solve(self):
+        low, high = 1e-9, 1e9
+        for _ in range(200):
+            mid = math.sqrt(low * high)
+            if self._checks_per_day(self._intervals_for(mid)) > self.daily_budget:
+                low = mid
+            else:
+                high = mid
+        return self._intervals_for(high)
+
+    def interval_at(self, moment):
+        return self.intervals[bucket_key(moment.astimezone(DISPLAY_TZ), self.bucket_minutes)]
+
+    def next_check(self, last_check):
+        """Next planned check after ``last_check`` (an aware datetime)."""
+        last_local = last_check.astimezone(DISPLAY_TZ)
+        due = last_local + timedelta(seconds=self.interval_at(last_local))
+        # Jump in early when a shorter-interval bucket starts before the regular due time
+        boundary = last_local.replace(second=0, microsecond=0) + timedelta(
+            minutes=self.bucket_minutes - last_local.minute % self.bucket_minutes
+        )
+        while boundary < due:
+            interval = self.interval_at(boundary)
+            due = min(due, max(boundary, last_local + timedelta(seconds=interval)))
+            boundary += timedelta(minutes=self.bucket_minutes)
+        return due
+
+    def checks_per_day(self):
+        return self._checks_per_day(self.intervals)
+
+    def describe(self, limit=5):
+        ranked = sorted(self.intervals.items(), key=lambda item: item[1])
+        lines = [
+            f"Polling plan: ~{self.checks_per_day():.0f} checks/day (budget {self.daily_budget}), "
+            f"intervals {min(self.intervals.values()):.0f}s–{max(self.intervals.values()):.0f}s"
+        ]
+        for key, interval in ranked[:limit]:
+            lines.append(f"- {key}: every {interval:.0f}s")
+        return lines
+
+
+def load_plan():
+    bucket_minutes, buckets = load_bucket_stats()
+    return PollingPlan(buckets, bucket_minutes)
+
+
+class SchedulerState:
+    """Last check time and the next planned check, persisted between runs."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else ROOT / SCHEDULER_STATE_FILE
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        self.last_check_ts = int(data.get("last_check_ts", 0))
+        self.next_check_ts = int(data.get("next_check_ts", 0))
+
+    def save(self):
+        try:
+            self.path.write_text(
+                json.dumps({"last_check_ts": self.last_check_ts, "next_check_ts": self.next_check_ts}),
+                encoding="utf-8",
+            )
+        except OSError as exc:
+            log(f"Failed to write scheduler state: {exc}")
+
+
+def _to_datetime(ts):
+    return datetime.fromtimestamp(ts, DISPLAY_TZ)
+
+
+def run_if_due(check, plan=None, state=None, now_ts=None):
+    """Run ``check`` when the plan says a check is due; returns whether it ran."""
+    plan = plan or load_plan()
+    state = state or SchedulerState()
+    now_ts = now_ts if now_ts is not None else int(time.time())
+    if state.last_check_ts and now_ts < state.next_check_ts:
+        return False
+
+    state.last_check_ts = now_ts
+    state.next_check_ts = int(plan.next_check(_to_datetime(now_ts)).timestamp())
+    state.save()
+    check()
+    log(f"Next adaptive check planned for {_to_datetime(state.next_check_ts):%Y-%m-%d %H:%M:%S %Z}")
+    return True
+
+
+def run_forever(check):
+    """Long-running loop that sleeps until each planned check."""
+    plan = load_plan()
+    for line in plan.describe():
+        log(line)
+    state = SchedulerState()
+    while True:
+        try:
+            ran = run_if_due(check, plan, state)
+        except Exception as exc:
+            log(f"Scheduled check failed: {exc}")
+            ran = True
+        if not ran:
+            time.sleep(max(1, min(60, state.next_check_ts - int(time.time()))))
+            continue
+        # Pick up the stats the daily summary refreshed overnight
+        plan = load_plan()
+
+
+def report():
+    """Log the current plan and the next planned check time."""
+    plan = load_plan()
+    for line in plan.describe():
+        log(line)
+    state = SchedulerState()
+    if state.next_check_ts:
+        log(f"Next planned check: {_to_datetime(state.next_check_ts):%Y-%m-%d %H:%M:%S %Z}")
+    else:
+        log("Next planned check: immediately (no check recorded yet)")
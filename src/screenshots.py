@@ -0,0 +1,66 @@
+"""Compact screenshots for Matrix: element crop, JPEG re-encoding and downscaling."""
+import io
+
+from .config import (
+    MONITOR_SCREENSHOT_SCOPE,
+    MONITOR_SCREENSHOT_FORMAT,
+    MONITOR_SCREENSHOT_QUALITY,
+    MONITOR_SCREENSHOT_MAX_WIDTH,
+)
+from .notifications import log
+
+MIMETYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+
+def _downscale(data, fmt, quality, max_width):
+    """Shrink images wider than ``max_width``; needs Pillow, otherwise returns ``data`` unchanged."""
+    if not max_width:
+        return data
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width <= max_width:
+            return data
+        height = max(1, round(image.height * max_width / image.width))
+        resized = image.resize((max_width, height), Image.LANCZOS)
+        out = io.BytesIO()
+        if fmt == "jpeg":
+            resized.convert("RGB").save(out, format="JPEG", quality=quality, optimize=True)
+        else:
+            resized.save(out, format="PNG", optimize=True)
+        return out.getvalue()
+
+
+def capture(
+    page,
+    crop_selector=None,
+    scope=MONITOR_SCREENSHOT_SCOPE,
+    fmt=MONITOR_SCREENSHOT_FORMAT,
+    quality=MONITOR_SCREENSHOT_QUALITY,
+    max_width=MONITOR_SCREENSHOT_MAX_WIDTH,
+):
+    """Screenshot ``page`` (or ``crop_selector`` when scope allows); returns (bytes, mimetype, extension)."""
+    fmt = "jpeg" if fmt in ("jpg", "jpeg") else "png"
+    options = {"type": fmt, "scale": "css"}
+    if fmt == "jpeg":
+        options["quality"] = quality
+
+    data = None
+    if crop_selector and scope != "page":
+        element = page.locator(crop_selector).first
+        try:
+            if element.count() > 0:
+                data = element.screenshot(**options)
+        except Exception as exc:
+            log(f"Cropped screenshot failed, using the full page: {exc}")
+    if data is None:
+        data = page.screenshot(full_page=True, **options)
+
+    try:
+        data = _downscale(data, fmt, quality, max_width)
+    except Exception as exc:
+        log(f"Screenshot downscaling failed: {exc}")
+    return data, MIMETYPES[fmt], "jpg" if fmt == "jpeg" else "png"
@@ -0,0 +1,284 @@
+"""SQLite store for long-term detection statistics.
+
+Tables (schema version in ``PRAGMA user_version``):
+
+- ``runs``: one row per availability check
+- ``detections``: one row per slot detection
+- ``streaks``: clustered availability streaks
+- ``bucket_days``: per-day aggregates of each weekday/time bucket
+
+Every summarized day is written in one transaction that first deletes the
+rows of that day, so re-running a day replaces it instead of counting it
+twice. ``stats/slot_detection_stats.json`` from earlier versions is imported
+once when the database is created; its totals have no per-day breakdown, so
+the days it already covers (``imported_through`` in ``meta``) are not
+recorded again.
+"""
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from .config import STATS_DB_FILE
+from .timezone_utils import DISPLAY_TZ
+
+ROOT = Path(__file__).resolve().parent.parent
+LEGACY_JSON_PATH = ROOT / "stats" / "slot_detection_stats.json"
+DEFAULT_BUCKET_MINUTES = 30
+# Day of the bucket rows imported from the JSON file, which has no per-day breakdown;
+# sorts before every real day so range queries skip it and record_day never replaces it
+IMPORTED_DAY = "0000-00-00"
+
+MIGRATIONS = [
+    # 1: initial schema
+    """
+    CREATE TABLE runs (
+        ts TEXT NOT NULL,
+        day TEXT NOT NULL,
+        bucket TEXT NOT NULL
+    );
+    CREATE INDEX runs_day ON runs (day);
+    CREATE INDEX runs_ts ON runs (ts);
+
+    CREATE TABLE detections (
+        ts TEXT NOT NULL,
+        day TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        message TEXT
+    );
+    CREATE INDEX detections_day ON detections (day);
+    CREATE INDEX detections_ts ON detections (ts);
+
+    CREATE TABLE streaks (
+        start TEXT NOT NULL,
+        end TEXT NOT NULL,
+        day TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        detections INTEGER NOT NULL,
+        duration_seconds INTEGER NOT NULL
+    );
+    CREATE INDEX streaks_day ON streaks (day);
+    CREATE INDEX streaks_duration ON streaks (duration_seconds);
+
+    CREATE TABLE bucket_days (
+        day TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        checks INTEGER NOT NULL DEFAULT 0,
+        detections INTEGER NOT NULL DEFAULT 0,
+        first_seen TEXT,
+        last_seen TEXT,
+        streak_seconds INTEGER NOT NULL DEFAULT 0,
+        streaks INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, bucket)
+    );
+    CREATE INDEX bucket_days_bucket ON bucket_days (bucket);
+
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def db_path():
+    path = Path(STATS_DB_FILE)
+    return path if path.is_absolute() else ROOT / path
+
+
+def _migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Stats database schema {version} is newer than this code ({SCHEMA_VERSION})")
+    for number in range(version, SCHEMA_VERSION):
+        # executescript commits first, so the version bump is part of the script
+        conn.executescript(f"BEGIN;\n{MIGRATIONS[number]}\nPRAGMA user_version = {number + 1};\nCOMMIT;")
+    return version
+
+
+def connect(path=None, legacy_json=LEGACY_JSON_PATH):
+    """Open (and create or migrate) the store; imports the legacy JSON into a new database."""
+    path = Path(path) if path else db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if _migrate(conn) == 0 and legacy_json and Path(legacy_json).exists():
+        import_json(conn, legacy_json)
+    return conn
+
+
+def get_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def _set_meta(conn, **values):
+    conn.executemany(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        [(key, str(value)) for key, value in values.items()],
+    )
+
+
+def _bucket_of(iso, bucket_minutes):
+    moment = datetime.fromisoformat(iso)
+    minute = moment.minute // bucket_minutes * bucket_minutes
+    return f"{moment.strftime('%a')} {moment.hour:02d}:{minute:02d}"
+
+
+def _imported_through(data):
+    """Last day the JSON totals cover: the day before its last update, or a later detection."""
+    days = [stats.get("last_seen", "")[:10] for stats in data.get("buckets", {}).values()
+            if isinstance(stats, dict) and stats.get("last_seen")]
+    days += [event["start"][:10] for event in data.get("events", []) if event.get("start")]
+    try:
+        updated = datetime.fromisoformat(data["updated_at"])
+        if updated.tzinfo is not None:
+            updated = updated.astimezone(DISPLAY_TZ)
+        # The daily summary runs in the morning for the previous day
+        days.append((updated.date() - timedelta(days=1)).isoformat())
+    except (KeyError, TypeError, ValueError):
+        pass
+    return max(days, default="")
+
+
+def import_json(conn, path):
+    """Copy buckets and streak events from a slot_detection_stats.json file; returns the bucket count."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    buckets = data.get("buckets", {})
+    bucket_minutes = int(data.get("bucket_minutes", DEFAULT_BUCKET_MINUTES))
+    with conn:
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO bucket_days
+                (day, bucket, checks, detections, first_seen, last_seen, streak_seconds, streaks)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    IMPORTED_DAY,
+                    key,
+                    int(stats.get("checks", 0)),
+                    int(stats.get("detections", 0)),
+                    stats.get("first_seen"),
+                    stats.get("last_seen"),
+                    int(stats.get("streak_seconds", 0)),
+                    int(stats.get("streaks", 0)),
+                )
+                for key, stats in buckets.items()
+                if isinstance(stats, dict)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO streaks (start, end, day, bucket, detections, duration_seconds) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    event["start"],
+                    event["end"],
+                    event["start"][:10],
+                    _bucket_of(event["start"], bucket_minutes),
+                    int(event.get("detections", 0)),
+                    int(event.get("duration_seconds", 0)),
+                )
+                for event in data.get("events", [])
+                if event.get("start") and event.get("end")
+            ],
+        )
+        _set_meta(
+            conn,
+            bucket_minutes=bucket_minutes,
+            cluster_gap_minutes=data.get("cluster_gap_minutes", ""),
+            imported_json=str(path),
+            imported_through=_imported_through(data),
+            updated_at=data.get("updated_at") or datetime.now(timezone.utc).isoformat(),
+        )
+    return len(buckets)
+
+
+def record_day(conn, day, buckets, runs, detections, streaks, bucket_minutes, cluster_gap_minutes):
+    """Replace everything stored for ``day`` (YYYY-MM-DD) in one transaction.
+
+    Returns False without writing when ``day`` is already part of the
+    imported JSON totals, which cannot be split up to replace it.
+
+    ``buckets`` maps bucket keys to checks/detections/first_seen/last_seen/
+    streak_seconds/streaks, ``runs`` holds ``(ts, bucket)``, ``detections``
+    ``(ts, bucket, message)`` and ``streaks`` dicts with start, end, bucket,
+    detections and duration_seconds; timestamps are ISO strings.
+    """
+    if day <= get_meta(conn, "imported_through", ""):
+        return False
+    with conn:
+        for table in ("runs", "detections", "streaks", "bucket_days"):
+            conn.execute(f"DELETE FROM {table} WHERE day = ?", (day,))
+        conn.executemany("INSERT INTO runs (ts, day, bucket) VALUES (?, ?, ?)", [(ts, day, bucket) for ts, bucket in runs])
+        conn.executemany(
+            "INSERT INTO detections (ts, day, bucket, message) VALUES (?, ?, ?, ?)",
+            [(ts, day, bucket, message) for ts, bucket, message in detections],
+        )
+        conn.executemany(
+            "INSERT INTO streaks (start, end, day, bucket, detections, duration_seconds) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (event["start"], event["end"], day, event["bucket"], event["detections"], event["duration_seconds"])
+                for event in streaks
+            ],
+        )
+        conn.executemany(
+            """
+            INSERT INTO bucket_days
+                (day, bucket, checks, detections, first_seen, last_seen, streak_seconds, streaks)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (day, key, s["checks"], s["detections"], s["first_seen"], s["last_seen"],
+                 s["streak_seconds"], s["streaks"])
+                for key, s in buckets.items()
+            ],
+        )
+        _set_meta(
+            conn,
+            bucket_minutes=bucket_minutes,
+            cluster_gap_minutes=cluster_gap_minutes,
+            updated_at=datetime.now(timezone.utc).isoformat(),
+        )
+    return True
+
+
+def bucket_stats(conn, since_day=None):
+    """Return (bucket_minutes, {key: stats}) summed over all days, or days >= ``since_day``.
+
+    The stats dicts have the shape of the legacy JSON buckets: checks,
+    detections, first_seen, last_seen, streak_seconds and streaks. A
+    ``since_day`` window leaves out the imported JSON totals.
+    """
+    query = """
+        SELECT bucket, SUM(checks) AS checks, SUM(detections) AS detections,
+               MIN(first_seen) AS first_seen, MAX(last_seen) AS last_seen,
+               SUM(streak_seconds) AS streak_seconds, SUM(streaks) AS streaks
+        FROM bucket_days
+    """
+    params = ()
+    if since_day:
+        query += " WHERE day >= ?"
+        params = (since_day,)
+    query += " GROUP BY bucket"
+    buckets = {row["bucket"]: {key: row[key] for key in row.keys() if key != "bucket"}
+               for row in conn.execute(query, params)}
+    return int(get_meta(conn, "bucket_minutes", DEFAULT_BUCKET_MINUTES)), buckets
+
+
+def load_bucket_stats(path=None, since_day=None):
+    """Like :func:`bucket_stats` on a fresh connection; empty when the store is unavailable."""
+    path = Path(path) if path else db_path()
+    if not path.exists() and not LEGACY_JSON_PATH.exists():
+        return DEFAULT_BUCKET_MINUTES, {}
+    try:
+        conn = connect(path)
+        try:
+            return bucket_stats(conn, since_day)
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError, ValueError, RuntimeError):
+        return DEFAULT_BUCKET_MINUTES, {}
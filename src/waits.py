@@ -0,0 +1,110 @@
+"""Condition-based waits for the booking flow.
+
+In ``event`` mode each helper returns as soon as its condition holds (a
+navigation committed, a selector became visible, a dialog went away), bounded
+by a per-step maximum. ``legacy`` mode keeps the original fixed sleeps.
+"""
+import time
+
+from .config import WAIT_MODE, WAIT_STEP_MAX_MS
+
+POLL_MS = 100
+
+
+def is_legacy():
+    return WAIT_MODE == "legacy"
+
+
+def _visible(page, selectors):
+    if not selectors:
+        return False
+    try:
+        return page.locator(f"{', '.join(selectors)} >> visible=true").count() > 0
+    except Exception:
+        # The document may be swapping out mid-navigation
+        return False
+
+
+def pause(page, legacy_ms):
+    """Fixed sleep that only exists for legacy mode."""
+    if is_legacy():
+        page.wait_for_timeout(legacy_ms)
+
+
+def settle(page, legacy_ms=0, timeout_ms=None):
+    """Wait until the current document has loaded."""
+    if is_legacy():
+        page.wait_for_load_state("networkidle")
+        if legacy_ms:
+            page.wait_for_timeout(legacy_ms)
+        return
+    try:
+        page.wait_for_load_state("load", timeout=timeout_ms or WAIT_STEP_MAX_MS)
+    except Exception:
+        pass
+
+
+def wait_for_selectors(page, selectors, legacy_ms, timeout_ms=None):
+    """Wait until any of ``selectors`` is visible; returns whether one appeared."""
+    if is_legacy():
+        page.wait_for_timeout(legacy_ms)
+        return _visible(page, selectors)
+
+    deadline = time.monotonic() + (timeout_ms or WAIT_STEP_MAX_MS) / 1000
+    while True:
+        if _visible(page, selectors):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        page.wait_for_timeout(POLL_MS)
+
+
+def wait_for_hidden(page, selector, legacy_ms, timeout_ms=None):
+    """Wait until ``selector`` is detached or hidden (e.g. a dismissed dialog)."""
+    if is_legacy():
+        page.wait_for_timeout(legacy_ms)
+        return
+    try:
+        page.locator(selector).first.wait_for(state="hidden", timeout=timeout_ms or WAIT_STEP_MAX_MS)
+    except Exception:
+        pass
+
+
+def act_and_wait(page, action, legacy_ms, selectors=(), timeout_ms=None):
+    """Run ``action`` and wait for the step it triggers to finish.
+
+    The step counts as finished when the main frame navigates (including a
+    form post back to the same URL) and the new document is parsed, or when
+    any of ``selectors`` becomes visible without a navigation, e.g. a modal.
+    Returns False when neither happened within the step maximum.
+    """
+    if is_legacy():
+        action()
+        page.wait_for_timeout(legacy_ms)
+        return True
+
+    navigations = []
+
+    def on_navigated(frame):
+        if frame == page.main_frame:
+            navigations.append(frame.url)
+
+    timeout_ms = timeout_ms or WAIT_STEP_MAX_MS
+    deadline = time.monotonic() + timeout_ms / 1000
+    page.on("framenavigated", on_navigated)
+    try:
+        action()
+        while True:
+            if navigations:
+                try:
+                    page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+                except Exception:
+                    pass
+                return True
+            if _visible(page, selectors):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            page.wait_for_timeout(POLL_MS)
+    finally:
+        page.remove_listener("framenavigated", on_navigated)
@@ -3,19 +3,21 @@
 from __future__ import annotations
 
 import argparse
-from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
 import gzip
 from pathlib import Path
 import re
 import shlex
 import subprocess
 import sys
-from typing import Any, Dict, Iterable, List, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    # Imported where it is used, to keep NumPy out of the start-up budget (benchmarks/startup_profile.py)
+    import numpy as np
 
 ROOT = Path(__file__).resolve().parent
 LOG_DIR = ROOT
-STATS_PATH = ROOT / "stats" / "slot_detection_stats.json"
 LOG_PATTERN = re.compile(r"cron\.log(\..+)?$")
 LINE_PATTERN = re.compile(r"^\[(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]\s*(?P<msg>.*)$")
 BUCKET_MINUTES = 30
@@ -25,18 +27,20 @@ TOP_BUCKETS = 8
 TOP_STREAKS = 5
 WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 DEFAULT_INTERVAL_SECONDS = 180
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+# Record kinds as small integer codes for the NumPy columns
+OTHER, CHECK, SLOTS, ERROR = 0, 1, 2, 3
+KIND_CODES = {"check": CHECK, "slots": SLOTS, "error": ERROR}
 
-SRC_DIR = ROOT / "src"
-if str(SRC_DIR) not in sys.path:
-    sys.path.insert(0, str(SRC_DIR))
-
-from notifications import (  # type: ignore
+from src.notifications import (
     log,
     send_error_notification,
     send_success_notification,
     send_screenshot_notification,
 )
-from timezone_utils import DISPLAY_TZ_LABEL, to_display_timezone  # type: ignore
+from src import stats_store
+from src.events import first_event_time, read_events
+from src.timezone_utils import DISPLAY_TZ, DISPLAY_TZ_LABEL, to_display_timezone
 
 
 def _parse_args() -> argparse.Namespace:
@@ -78,76 +82,133 @@ def _iter_entries(paths: Sequence[Path]) -> List[Tuple[datetime, str]]:
     return entries
 
 
-def _bucket_key(timestamp: datetime) -> str:
-    bucket_minute = (timestamp.minute // BUCKET_MINUTES) * BUCKET_MINUTES
-    return f"{timestamp.strftime('%a')} {timestamp.hour:02d}:{bucket_minute:02d}"
+def _classify_line(message: str) -> str | None:
+    """Map a cron.log line to an event kind; only used for time before the event stream."""
+    if "Checking available slots" in message:
+        return "check"
+    if message.startswith("Found") and "available slots" in message:
+        return "slots"
+    if message.startswith("🚨") or "error" in message.lower():
+        return "error"
+    return None
+
+
+def _load_columns() -> Tuple[np.ndarray, np.ndarray]:
+    """Epoch seconds and kind codes, sorted by time: cron.log before the event stream, then events."""
+    import numpy as np
+
+    stream_start = first_event_time()
+    timestamps: List[float] = []
+    kinds: List[int] = []
+    for timestamp, message in _iter_entries(_iter_log_paths()):
+        epoch = timestamp.timestamp()
+        if stream_start is None or epoch < stream_start:
+            timestamps.append(epoch)
+            kinds.append(KIND_CODES.get(_classify_line(message), OTHER))
+    for record in read_events(kinds=set(KIND_CODES)):
+        timestamps.append(float(record["ts"]))
+        kinds.append(KIND_CODES[record["kind"]])
+    ts = np.asarray(timestamps, dtype=np.float64)
+    codes = np.asarray(kinds, dtype=np.int8)
+    order = np.argsort(ts, kind="stable")
+    return ts[order], codes[order]
+
+
+def _to_display(epoch: float) -> datetime:
+    return datetime.fromtimestamp(float(epoch), DISPLAY_TZ)
+
+
+def _local_seconds(ts: np.ndarray) -> np.ndarray:
+    """Shift epoch seconds to DISPLAY_TZ wall-clock seconds, looking up the offset once per hour."""
+    import numpy as np
+
+    hours, inverse = np.unique((ts // 3600).astype(np.int64), return_inverse=True)
+    offsets = np.array(
+        [_to_display(hour * 3600).utcoffset().total_seconds() for hour in hours.tolist()],
+        dtype=np.float64,
+    )
+    return ts + offsets[inverse]
 
 
-def _estimate_interval_seconds(run_times: Sequence[datetime]) -> int:
-    if len(run_times) < 2:
-        return DEFAULT_INTERVAL_SECONDS
-    deltas = [
-        int((current - previous).total_seconds())
-        for previous, current in zip(run_times, run_times[1:])
-        if current > previous
-    ]
-    if not deltas:
+def _bucket_label(index: int) -> str:
+    minutes = (index % BUCKETS_PER_DAY) * BUCKET_MINUTES
+    return f"{WEEKDAYS[index // BUCKETS_PER_DAY]} {minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _estimate_interval_seconds(run_times: np.ndarray) -> int:
+    import numpy as np
+
+    deltas = np.diff(run_times)
+    deltas = deltas[deltas > 0].astype(np.int64)
+    if not deltas.size:
         return DEFAULT_INTERVAL_SECONDS
-    return max(60, sorted(deltas)[len(deltas) // 2])
-
-
-def _cluster_slot_events(
-    slot_events: Sequence[Tuple[datetime, str]], interval_seconds: int
-) -> List[Dict[str, Any]]:
-    if not slot_events:
-        return []
-    clusters: List[Dict[str, Any]] = []
-    current_start = slot_events[0][0]
-    current_end = current_start
-    detections = 1
-    for timestamp, _ in slot_events[1:]:
-        if timestamp - current_end <= timedelta(minutes=CLUSTER_GAP_MINUTES):
-            current_end = timestamp
-            detections += 1
-            continue
-        clusters.append(_build_event(current_start, current_end, detections, interval_seconds))
-        current_start = current_end = timestamp
-        detections = 1
-    clusters.append(_build_event(current_start, current_end, detections, interval_seconds))
-    return clusters
-
-
-def _build_event(
-    start: datetime, end: datetime, detections: int, interval_seconds: int
-) -> Dict[str, Any]:
-    span_seconds = max(0, int((end - start).total_seconds()))
-    duration_seconds = span_seconds + max(60, interval_seconds)
+    middle = deltas.size // 2
+    return max(60, int(np.partition(deltas, middle)[middle]))
+
+
+def _cluster_streaks(slot_times: np.ndarray, slot_buckets: np.ndarray, interval_seconds: int) -> Dict[str, np.ndarray]:
+    """Detections at most CLUSTER_GAP_MINUTES apart form one streak."""
+    import numpy as np
+
+    if not slot_times.size:
+        empty = np.empty(0, dtype=np.int64)
+        return {"start": slot_times, "end": slot_times, "detections": empty, "duration_seconds": empty, "bucket": empty}
+    breaks = np.flatnonzero(np.diff(slot_times) > CLUSTER_GAP_MINUTES * 60) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks - 1, [slot_times.size - 1]))
+    span = np.maximum(0, (slot_times[ends] - slot_times[starts]).astype(np.int64))
     return {
-        "start": start,
-        "end": end,
-        "detections": detections,
-        "duration_seconds": duration_seconds,
+        "start": slot_times[starts],
+        "end": slot_times[ends],
+        "detections": ends - starts + 1,
+        "duration_seconds": span + max(60, interval_seconds),
+        "bucket": slot_buckets[starts],
     }
 
 
-def _collect_event_buckets(events: Sequence[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
-    bucket_summary: Dict[str, Dict[str, int]] = defaultdict(lambda: {"streak_seconds": 0, "streaks": 0})
-    for event in events:
-        bucket = _bucket_key(event["start"])
-        bucket_summary[bucket]["streak_seconds"] += int(event["duration_seconds"])
-        bucket_summary[bucket]["streaks"] += 1
-    return bucket_summary
+def _gather_history(ts: np.ndarray, kinds: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-bucket counts, first/last seen, weekday totals and streaks in one vectorized pass."""
+    import numpy as np
+
+    local = _local_seconds(ts)
+    days = np.floor_divide(local, 86400).astype(np.int64)
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+    slot_of_day = ((local - days * 86400) // (BUCKET_MINUTES * 60)).astype(np.int64)
+    bucket = weekday * BUCKETS_PER_DAY + slot_of_day
+    total = 7 * BUCKETS_PER_DAY
+
+    is_check = kinds == CHECK
+    is_slot = kinds == SLOTS
+    first_seen = np.full(total, np.nan)
+    last_seen = np.full(total, np.nan)
+    present, first_index = np.unique(bucket, return_index=True)
+    first_seen[present] = ts[first_index]
+    present, last_index = np.unique(bucket[::-1], return_index=True)
+    last_seen[present] = ts[ts.size - 1 - last_index]
+
+    run_times = ts[is_check]
+    streaks = _cluster_streaks(ts[is_slot], bucket[is_slot], _estimate_interval_seconds(run_times))
+    return {
+        "checks": np.bincount(bucket[is_check], minlength=total),
+        "detections": np.bincount(bucket[is_slot], minlength=total),
+        "first_seen": first_seen,
+        "last_seen": last_seen,
+        "weekday_checks": np.bincount(weekday[is_check], minlength=7),
+        "weekday_detections": np.bincount(weekday[is_slot], minlength=7),
+        "streak_seconds": np.bincount(streaks["bucket"], weights=streaks["duration_seconds"], minlength=total),
+        "streak_count": np.bincount(streaks["bucket"], minlength=total),
+        "streaks": streaks,
+    }
 
 
-def _aggregate_weekdays(buckets: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
-    totals: Dict[str, Dict[str, int]] = {day: {"checks": 0, "detections": 0} for day in WEEKDAYS}
-    for key, stats in buckets.items():
-        weekday = key.split()[0][:3]
-        if weekday not in totals:
-            continue
-        totals[weekday]["checks"] += stats.get("checks", 0)
-        totals[weekday]["detections"] += stats.get("detections", 0)
-    return totals
+def _aggregate_weekdays(history: Dict[str, np.ndarray]) -> Dict[str, Dict[str, int]]:
+    return {
+        day: {
+            "checks": int(history["weekday_checks"][index]),
+            "detections": int(history["weekday_detections"][index]),
+        }
+        for index, day in enumerate(WEEKDAYS)
+    }
 
 
 def _format_weekday_lines(totals: Dict[str, Dict[str, int]]) -> List[str]:
@@ -164,33 +225,22 @@ def _format_weekday_lines(totals: Dict[str, Dict[str, int]]) -> List[str]:
     return lines
 
 
-def _gather_history(entries: Sequence[Tuple[datetime, str]]):
-    bucket_stats: Dict[str, Dict[str, Any]] = defaultdict(lambda: {
-        "checks": 0,
-        "detections": 0,
-        "first_seen": None,
-        "last_seen": None,
-    })
-    run_times: List[datetime] = []
-    slot_events: List[Tuple[datetime, str]] = []
-    errors: List[Tuple[datetime, str]] = []
-    for timestamp, message in entries:
-        bucket = _bucket_key(timestamp)
-        state = bucket_stats[bucket]
-        state["first_seen"] = timestamp if state["first_seen"] is None else min(state["first_seen"], timestamp)
-        state["last_seen"] = timestamp if state["last_seen"] is None else max(state["last_seen"], timestamp)
-
-        if "Checking available slots" in message:
-            state["checks"] += 1
-            run_times.append(timestamp)
-            continue
-        if message.startswith("Found") and "available slots" in message:
-            state["detections"] += 1
-            slot_events.append((timestamp, message))
-            continue
-        if message.startswith("🚨") or "error" in message.lower():
-            errors.append((timestamp, message))
-    return bucket_stats, run_times, slot_events, errors
+def _bucket_stats(history: Dict[str, np.ndarray], index: int) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    import numpy as np
+
+    first_seen = history["first_seen"][index]
+    last_seen = history["last_seen"][index]
+    stats = {
+        "checks": int(history["checks"][index]),
+        "detections": int(history["detections"][index]),
+        "first_seen": None if np.isnan(first_seen) else _to_display(first_seen),
+        "last_seen": None if np.isnan(last_seen) else _to_display(last_seen),
+    }
+    event_stats = {
+        "streak_seconds": int(history["streak_seconds"][index]),
+        "streaks": int(history["streak_count"][index]),
+    }
+    return stats, event_stats
 
 
 def _format_bucket_line(
@@ -219,20 +269,25 @@ def _format_bucket_line(
 
 
 def build_summary(
-    entries: Sequence[Tuple[datetime, str]],
+    ts: np.ndarray,
+    kinds: np.ndarray,
     limit_buckets: int,
     min_checks: int,
     limit_streaks: int,
 ) -> Tuple[str, List[str]]:
-    if not entries:
+    import numpy as np
+
+    if not ts.size:
         lines = ["ℹ️ No log entries found; cannot build historical summary."]
         return "\n".join(lines), lines
 
-    bucket_stats, run_times, slot_events, _ = _gather_history(entries)
-    total_checks = sum(stats["checks"] for stats in bucket_stats.values())
-    total_detections = sum(stats["detections"] for stats in bucket_stats.values())
-    first_seen = entries[0][0]
-    last_seen = entries[-1][0]
+    history = _gather_history(ts, kinds)
+    checks = history["checks"]
+    detections = history["detections"]
+    total_checks = int(checks.sum())
+    total_detections = int(detections.sum())
+    first_seen = _to_display(ts[0])
+    last_seen = _to_display(ts[-1])
 
     lines: List[str] = []
     header = (
@@ -245,58 +300,44 @@ def build_summary(
         f"Observed {total_checks} checks and {total_detections} detections ({rate:.2f}%)."
     )
 
-    interval_seconds = _estimate_interval_seconds(run_times)
-    events = _cluster_slot_events(slot_events, interval_seconds)
-    event_buckets = _collect_event_buckets(events)
-
-    ranked = [
-        (stats["detections"] / stats["checks"], stats["detections"], stats["checks"], bucket)
-        for bucket, stats in bucket_stats.items()
-        if stats["detections"] > 0 and stats["checks"] >= min_checks
-    ]
-    ranked.sort(key=lambda item: (item[0], item[1], item[2]), reverse=True)
+    # Rank by rate, then detections, then checks (all descending); ties keep weekday/time order
+    indexes = np.arange(checks.size)
+    eligible = indexes[(detections > 0) & (checks >= min_checks)]
+    rates = detections[eligible] / checks[eligible]
+    ranked = eligible[np.lexsort((-eligible, checks[eligible], detections[eligible], rates))[::-1]]
 
     lines.append("")
-    if ranked:
-        lines.append(f"Top {min(limit_buckets, len(ranked))} time buckets (>= {min_checks} checks):")
-        for _, _, _, bucket in ranked[:limit_buckets]:
-            stats = bucket_stats[bucket]
-            event_stats = event_buckets.get(bucket)
-            lines.append(_format_bucket_line(bucket, stats, event_stats))
+    if ranked.size:
+        lines.append(f"Top {min(limit_buckets, ranked.size)} time buckets (>= {min_checks} checks):")
+        for index in ranked[:limit_buckets].tolist():
+            lines.append(_format_bucket_line(_bucket_label(index), *_bucket_stats(history, index)))
     else:
-        fallback = [
-            (stats["detections"], stats["checks"], bucket)
-            for bucket, stats in bucket_stats.items()
-            if stats["detections"] > 0
-        ]
-        fallback.sort(key=lambda item: (item[0], item[1]), reverse=True)
-        if fallback:
+        fallback = indexes[detections > 0]
+        fallback = fallback[np.lexsort((-fallback, checks[fallback], detections[fallback]))[::-1]]
+        if fallback.size:
             lines.append(
                 f"No buckets met the >= {min_checks} checks threshold; showing top detections instead:"
             )
-            for detections, checks, bucket in fallback[:limit_buckets]:
-                stats = bucket_stats[bucket]
-                event_stats = event_buckets.get(bucket)
-                lines.append(_format_bucket_line(bucket, stats, event_stats))
+            for index in fallback[:limit_buckets].tolist():
+                lines.append(_format_bucket_line(_bucket_label(index), *_bucket_stats(history, index)))
         else:
             lines.append("No availability detections recorded yet.")
 
-    weekday_totals = _aggregate_weekdays(bucket_stats)
     lines.append("")
     lines.append("Weekday detection rates:")
-    lines.extend(_format_weekday_lines(weekday_totals))
+    lines.extend(_format_weekday_lines(_aggregate_weekdays(history)))
 
-    if events:
+    streaks = history["streaks"]
+    if streaks["start"].size:
         lines.append("")
         lines.append("Longest observed availability streaks:")
-        sorted_events = sorted(events, key=lambda e: e["duration_seconds"], reverse=True)
-        for event in sorted_events[:limit_streaks]:
-            start = event["start"].strftime("%a %Y-%m-%d %H:%M")
-            end = event["end"].strftime("%H:%M")
-            duration = event["duration_seconds"] / 60
-            detections = event["detections"]
+        for index in np.argsort(-streaks["duration_seconds"], kind="stable")[:limit_streaks].tolist():
+            start = _to_display(streaks["start"][index]).strftime("%a %Y-%m-%d %H:%M")
+            end = _to_display(streaks["end"][index]).strftime("%H:%M")
+            duration = streaks["duration_seconds"][index] / 60
+            detections_in_streak = int(streaks["detections"][index])
             lines.append(
-                f"- {start}–{end} (~{duration:.1f} min, {detections} detections)"
+                f"- {start}–{end} (~{duration:.1f} min, {detections_in_streak} detections)"
             )
 
     summary_text = "\n".join(lines)
@@ -317,8 +358,9 @@ def _normalize_output(path: Path) -> Path:
 def _generate_heatmap(args: argparse.Namespace) -> Path | None:
     if args.no_heatmap:
         return None
-    if not STATS_PATH.exists():
-        log(f"Stats file {STATS_PATH} not found; skipping heatmap")
+    db_path = stats_store.db_path()
+    if not db_path.exists() and not stats_store.LEGACY_JSON_PATH.exists():
+        log(f"Stats database {db_path} not found; skipping heatmap")
         return None
     script_path = ROOT / "plot_hotspots.py"
     if not script_path.exists():
@@ -330,8 +372,10 @@ def _generate_heatmap(args: argparse.Namespace) -> Path | None:
     cmd = [
         str(_resolve_python()),
         str(script_path),
+        "--db-path",
+        str(db_path),
         "--stats-path",
-        str(STATS_PATH),
+        str(stats_store.LEGACY_JSON_PATH),
         "--output",
         str(output_path),
         "--recent-days",
@@ -379,9 +423,8 @@ def _send_heatmap(path: Path, args: argparse.Namespace) -> None:
 def main() -> None:
     args = _parse_args()
     try:
-        paths = _iter_log_paths()
-        entries = _iter_entries(paths)
-        summary_text, summary_lines = build_summary(entries, args.top, args.min_checks, args.top_streaks)
+        ts, kinds = _load_columns()
+        summary_text, summary_lines = build_summary(ts, kinds, args.top, args.min_checks, args.top_streaks)
         heatmap_path = _generate_heatmap(args)
         for line in summary_lines:
             log(line)
@@ -4,28 +4,23 @@ from __future__ import annotations
 
 import argparse
 from collections import defaultdict
-from datetime import date, datetime, timedelta, timezone
+from datetime import date, datetime, timedelta
 import gzip
-import json
 from statistics import median
 from pathlib import Path
 import re
-import sys
 from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
 ROOT = Path(__file__).resolve().parent
-SRC_DIR = ROOT / "src"
-if str(SRC_DIR) not in sys.path:
-    sys.path.insert(0, str(SRC_DIR))
-
-from notifications import log, send_error_notification, send_success_notification  # type: ignore
-from timezone_utils import DISPLAY_TZ, DISPLAY_TZ_LABEL, to_display_timezone  # type: ignore
+from src import stats_store
+from src.events import describe, first_event_time, read_events
+from src.log_ingest import day_spool, ingest
+from src.notifications import log, send_error_notification, send_success_notification
+from src.timezone_utils import DISPLAY_TZ, DISPLAY_TZ_LABEL, to_display_timezone
 
 
 LOG_DIR = ROOT
 LOG_PATTERN = re.compile(r"^cron\.log(\..+)?$")
-STATS_DIR = ROOT / "stats"
-STATS_PATH = STATS_DIR / "slot_detection_stats.json"
 LINE_PATTERN = re.compile(r"^\[(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]\s*(?P<msg>.*)$")
 MAX_LINES = 8
 BUCKET_MINUTES = 30
@@ -34,6 +29,7 @@ DEFAULT_INTERVAL_SECONDS = 180
 MAX_HOTSPOTS = 3
 MIN_CHECKS_FOR_HOTSPOT = 10
 MAX_RECENT_EVENTS = 4
+SUMMARY_KINDS = {"check", "slots", "error"}
 
 
 def _parse_args() -> argparse.Namespace:
@@ -92,6 +88,50 @@ def _filter_entries(entries: Iterable[tuple[datetime, str]], target: date) -> li
     return [entry for entry in entries if entry[0].date() == target]
 
 
+def _day_log_paths(target: date) -> List[Path]:
+    """The day's spool after ingesting new cron.log bytes; all logs if ingestion fails."""
+    try:
+        added = ingest()
+    except OSError as exc:
+        log(f"Incremental log ingestion failed, scanning all logs: {exc}")
+        return _iter_log_paths()
+    log(f"Ingested {added} new log lines")
+    return [day_spool(target)]
+
+
+def _classify_line(message: str) -> str | None:
+    """Map a cron.log line to an event kind; only used for days before the event stream."""
+    if "Checking available slots" in message:
+        return "check"
+    if "available slots" in message and message.startswith("Found"):
+        return "slots"
+    if message.startswith("🚨"):
+        return "error"
+    return None
+
+
+def _load_records(target: date) -> list[tuple[datetime, str | None, str]]:
+    """(timestamp, kind, text) for ``target``, from events.jsonl and, where it has no coverage, cron.log."""
+    day_start = datetime.combine(target, datetime.min.time(), tzinfo=DISPLAY_TZ).timestamp()
+    day_end = datetime.combine(target + timedelta(days=1), datetime.min.time(), tzinfo=DISPLAY_TZ).timestamp()
+    stream_start = first_event_time()
+    records: list[tuple[datetime, str | None, str]] = []
+    if stream_start is None or stream_start > day_start:
+        legacy = _filter_entries(_iter_entries(_day_log_paths(target)), target)
+        records.extend(
+            (timestamp, _classify_line(message), message)
+            for timestamp, message in legacy
+            if stream_start is None or timestamp.timestamp() < stream_start
+        )
+    for record in read_events(since=day_start, until=day_end):
+        timestamp = datetime.fromtimestamp(record["ts"], DISPLAY_TZ)
+        if timestamp.date() != target:
+            continue
+        kind = record.get("kind")
+        records.append((timestamp, kind if kind in SUMMARY_KINDS else None, describe(record)))
+    return records
+
+
 def _split_summary_lines(prefix: str, rows: Sequence[tuple[datetime, str]]) -> List[str]:
     lines: List[str] = []
     if not rows:
@@ -117,43 +157,6 @@ def _bucket_key(timestamp: datetime) -> str:
     return f"{timestamp.strftime('%a')} {timestamp.hour:02d}:{bucket_minute:02d}"
 
 
-def _ensure_stats_dir() -> None:
-    STATS_DIR.mkdir(parents=True, exist_ok=True)
-
-
-def _default_stats() -> Dict[str, Any]:
-    return {
-        "version": 1,
-        "bucket_minutes": BUCKET_MINUTES,
-        "cluster_gap_minutes": CLUSTER_GAP_MINUTES,
-        "updated_at": None,
-        "buckets": {},
-        "events": [],
-    }
-
-
-def _load_stats() -> Dict[str, Any]:
-    if not STATS_PATH.exists():
-        return _default_stats()
-
-    try:
-        with STATS_PATH.open("r", encoding="utf-8") as handle:
-            data = json.load(handle)
-    except Exception as exc:  # pragma: no cover - defensive logging
-        log(f"Failed to load stats file: {exc}")
-        return _default_stats()
-
-    data.setdefault("buckets", {})
-    data.setdefault("events", [])
-    return data
-
-
-def _write_stats(data: Dict[str, Any]) -> None:
-    _ensure_stats_dir()
-    with STATS_PATH.open("w", encoding="utf-8") as handle:
-        json.dump(data, handle, indent=2, sort_keys=True)
-
-
 def _estimate_interval_seconds(run_times: Sequence[datetime]) -> int:
     if len(run_times) < 2:
         return DEFAULT_INTERVAL_SECONDS
@@ -217,41 +220,24 @@ def _collect_event_buckets(events: Sequence[Dict[str, Any]]) -> Dict[str, Dict[s
     return bucket_summary
 
 
-def _merge_bucket_counts(
-    stats_data: Dict[str, Any],
+def _day_buckets(
     bucket_counts: Dict[str, Dict[str, int]],
     bucket_bounds: Dict[str, Dict[str, datetime]],
     event_buckets: Dict[str, Dict[str, int]],
-) -> None:
-    buckets = stats_data.setdefault("buckets", {})
-    for key, counts in bucket_counts.items():
-        bounds = bucket_bounds.get(key)
-        if not bounds:
-            continue
-
-        first_iso = bounds["first"].isoformat()
-        last_iso = bounds["last"].isoformat()
-        state = buckets.setdefault(
-            key,
-            {
-                "checks": 0,
-                "detections": 0,
-                "first_seen": first_iso,
-                "last_seen": last_iso,
-                "streak_seconds": 0,
-                "streaks": 0,
-            },
-        )
-
-        state["checks"] += counts.get("checks", 0)
-        state["detections"] += counts.get("detections", 0)
-        state["first_seen"] = min(state.get("first_seen", first_iso), first_iso)
-        state["last_seen"] = max(state.get("last_seen", last_iso), last_iso)
-
-        event_stats = event_buckets.get(key)
-        if event_stats:
-            state["streak_seconds"] = state.get("streak_seconds", 0) + event_stats.get("streak_seconds", 0)
-            state["streaks"] = state.get("streaks", 0) + event_stats.get("streaks", 0)
+) -> Dict[str, Dict[str, Any]]:
+    buckets: Dict[str, Dict[str, Any]] = {}
+    for key, bounds in bucket_bounds.items():
+        counts = bucket_counts.get(key, {})
+        event_stats = event_buckets.get(key, {})
+        buckets[key] = {
+            "checks": counts.get("checks", 0),
+            "detections": counts.get("detections", 0),
+            "first_seen": bounds["first"].isoformat(),
+            "last_seen": bounds["last"].isoformat(),
+            "streak_seconds": event_stats.get("streak_seconds", 0),
+            "streaks": event_stats.get("streaks", 0),
+        }
+    return buckets
 
 
 def _format_hotspots(buckets: Dict[str, Any]) -> List[str]:
@@ -292,6 +278,7 @@ def _format_recent_events(events: Sequence[Dict[str, Any]]) -> List[str]:
 
 
 def _build_stats_section(
+    target: date,
     bucket_counts: Dict[str, Dict[str, int]],
     bucket_bounds: Dict[str, Dict[str, datetime]],
     run_times: Sequence[datetime],
@@ -305,31 +292,38 @@ def _build_stats_section(
     event_buckets = _collect_event_buckets(todays_events) if todays_events else {}
 
     try:
-        stats_data = _load_stats()
-        stats_data["bucket_minutes"] = BUCKET_MINUTES
-        stats_data["cluster_gap_minutes"] = CLUSTER_GAP_MINUTES
-        stats_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-        _merge_bucket_counts(stats_data, bucket_counts, bucket_bounds, event_buckets)
-
-        if todays_events:
-            serialized_events = [
-                {
-                    "start": event["start"].isoformat(),
-                    "end": event["end"].isoformat(),
-                    "detections": event["detections"],
-                    "duration_seconds": event["duration_seconds"],
-                }
-                for event in todays_events
-            ]
-            stats_data.setdefault("events", []).extend(serialized_events)
-
-        _write_stats(stats_data)
+        conn = stats_store.connect()
+        try:
+            recorded = stats_store.record_day(
+                conn,
+                target.isoformat(),
+                _day_buckets(bucket_counts, bucket_bounds, event_buckets),
+                [(ts.isoformat(), _bucket_key(ts)) for ts in run_times],
+                [(ts.isoformat(), _bucket_key(ts), message) for ts, message in slot_events],
+                [
+                    {
+                        "start": event["start"].isoformat(),
+                        "end": event["end"].isoformat(),
+                        "bucket": _bucket_key(event["start"]),
+                        "detections": event["detections"],
+                        "duration_seconds": event["duration_seconds"],
+                    }
+                    for event in todays_events
+                ],
+                BUCKET_MINUTES,
+                CLUSTER_GAP_MINUTES,
+            )
+            if not recorded:
+                log(f"{target} is already counted in the imported slot_detection_stats.json totals; not recording it again")
+            _, buckets = stats_store.bucket_stats(conn)
+        finally:
+            conn.close()
     except Exception as exc:  # pragma: no cover - persistence shouldn't break alerts
         log(f"Failed to update long-term stats: {exc}")
         return []
 
     lines: List[str] = []
-    hotspot_lines = _format_hotspots(stats_data.get("buckets", {}))
+    hotspot_lines = _format_hotspots(buckets)
     if hotspot_lines:
         lines.append("")
         lines.append(f"Historical detection hotspots ({BUCKET_MINUTES}-min buckets):")
@@ -345,14 +339,14 @@ def _build_stats_section(
     return lines
 
 
-def build_summary(entries: Sequence[tuple[datetime, str]], target: date) -> Tuple[str, List[str]]:
+def build_summary(records: Sequence[tuple[datetime, str | None, str]], target: date) -> Tuple[str, List[str]]:
     run_times: List[datetime] = []
     slot_events: List[tuple[datetime, str]] = []
     error_events: List[tuple[datetime, str]] = []
     bucket_counts: Dict[str, Dict[str, int]] = defaultdict(lambda: {"checks": 0, "detections": 0})
     bucket_bounds: Dict[str, Dict[str, datetime]] = {}
 
-    for timestamp, message in entries:
+    for timestamp, kind, message in records:
         bucket = _bucket_key(timestamp)
         bounds = bucket_bounds.setdefault(bucket, {"first": timestamp, "last": timestamp})
         if timestamp < bounds["first"]:
@@ -360,15 +354,15 @@ def build_summary(entries: Sequence[tuple[datetime, str]], target: date) -> Tupl
         if timestamp > bounds["last"]:
             bounds["last"] = timestamp
 
-        if "Checking available slots" in message:
+        if kind == "check":
             run_times.append(timestamp)
             bucket_counts[bucket]["checks"] += 1
             continue
-        if "available slots" in message and message.startswith("Found"):
+        if kind == "slots":
             slot_events.append((timestamp, message))
             bucket_counts[bucket]["detections"] += 1
             continue
-        if message.startswith("🚨"):
+        if kind == "error":
             error_events.append((timestamp, message))
 
     summary_lines: List[str] = [f"📝 RWTH monitor summary for {target:%Y-%m-%d}"]
@@ -388,7 +382,7 @@ def build_summary(entries: Sequence[tuple[datetime, str]], target: date) -> Tupl
     if error_events:
         summary_lines.extend(_split_summary_lines("Errors:", error_events))
 
-    stats_lines = _build_stats_section(bucket_counts, bucket_bounds, run_times, slot_events)
+    stats_lines = _build_stats_section(target, bucket_counts, bucket_bounds, run_times, slot_events)
     summary_lines.extend(stats_lines)
 
     return "\n".join(summary_lines), summary_lines
@@ -399,9 +393,8 @@ def main() -> None:
     target_date = _resolve_target_date(args.target_date)
 
     try:
-        log_paths = _iter_log_paths()
-        entries = _filter_entries(_iter_entries(log_paths), target_date)
-        summary_text, summary_lines = build_summary(entries, target_date)
+        records = _load_records(target_date)
+        summary_text, summary_lines = build_summary(records, target_date)
 
         for line in summary_lines:
             log(line)